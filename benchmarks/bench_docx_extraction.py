@@ -0,0 +1,73 @@
+"""DOCX extraction time and peak memory: streaming lxml fast path vs python-docx.
+
+Builds table-heavy synthetic CVs (each table row has a merged cell, like the
+experience tables of CV templates) and runs each extractor in a fresh process,
+reporting the best wall time, the peak RSS growth over the process baseline
+(includes libxml2 allocations) and the tracemalloc peak of Python objects. Both
+extractors run without a character budget so they read the whole document.
+
+    python -m benchmarks.bench_docx_extraction --rows 200 2000 10000 --repeat 5
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.cv_corpus import synthetic_cv_docx
+from services.extraction import _parse_docx_with_stats
+
+
+def _max_rss_mib() -> float:
+    # ru_maxrss tính bằng KiB trên Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(content: bytes, fast_path: bool, repeat: int):
+    """Chạy trong process riêng để peak RSS không bị ảnh hưởng bởi lần đo trước."""
+    # Nạp sẵn các module lazy-import để baseline không tính chúng
+    _parse_docx_with_stats(synthetic_cv_docx(1, jobs=1), 0, fast_path)
+    baseline = _max_rss_mib()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text, _ = _parse_docx_with_stats(content, 0, fast_path)
+        timings.append((time.perf_counter() - start) * 1000)
+    rss_mib = _max_rss_mib() - baseline
+
+    tracemalloc.start()
+    _parse_docx_with_stats(content, 0, fast_path)
+    python_mib = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return min(timings), rss_mib, python_mib, len(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[200, 2000, 10000], help="table rows per CV")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    for rows in args.rows:
+        content = synthetic_cv_docx(0, jobs=6, table_rows=rows)
+        print(f"{rows} table rows ({len(content) / 1024:.0f} KiB DOCX):")
+        results = {}
+        for name, fast_path in (("python-docx", False), ("lxml stream", True)):
+            with context.Pool(1) as pool:
+                results[name] = pool.apply(_measure, (content, fast_path, args.repeat))
+            best_ms, rss_mib, python_mib, chars = results[name]
+            print(
+                f"  {name:>12}: {best_ms:8.1f} ms, peak RSS +{rss_mib:6.1f} MiB, "
+                f"Python peak {python_mib:6.1f} MiB, {chars} chars"
+            )
+        slow, fast = results["python-docx"], results["lxml stream"]
+        print(f"  {'speedup':>12}: x{slow[0] / fast[0]:.1f} time, x{slow[2] / fast[2]:.1f} Python memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Micro-benchmark of services.info_extractor against the previous implementation.
+
+The legacy functions below are a verbatim copy of the regex-per-field version
+(uncompiled patterns, a full-text `re.sub` for phones and up to three
+`re.findall` scans). Both are run over the same synthetic corpus; the report
+shows time per CV, speedup and how often the shared fields agree.
+
+    python -m benchmarks.bench_info_extractor --count 5000 --jobs 8
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.cv_corpus import synthetic_cv_text
+from services.info_extractor import extract_info
+
+
+def legacy_extract_email(text: str) -> str:
+    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+    matches = re.findall(email_pattern, text)
+    if matches:
+        return matches[0]
+    return ""
+
+
+def legacy_extract_phone(text: str) -> str:
+    cleaned_text = re.sub(r'[^\d+\s\-()]', '', text)
+    vn_mobile_pattern = r'(?:0|\+84)[\s\-]?[3-9][\d\s\-]{8,9}'
+    intl_pattern = r'\+[\d\s\-]{10,}'
+    simple_pattern = r'\d{10,11}'
+
+    patterns = [
+        (vn_mobile_pattern, cleaned_text),
+        (intl_pattern, cleaned_text),
+        (simple_pattern, cleaned_text)
+    ]
+
+    for pattern, search_text in patterns:
+        matches = re.findall(pattern, search_text)
+        if matches:
+            phone = re.sub(r'[\s\-]', '', matches[0])
+            if 10 <= len(re.sub(r'[^\d]', '', phone)) <= 15:
+                return phone
+
+    return ""
+
+
+def legacy_extract_name(text: str) -> str:
+    lines = text.split('\n')
+
+    for line in lines[:10]:
+        line = line.strip()
+        if not line or len(line) < 3 or len(line) > 50:
+            continue
+        if '@' in line or re.search(r'\d{10,}', line):
+            continue
+        skip_keywords = ['cv', 'resume', 'curriculum vitae', 'phone', 'email', 'address',
+                        'địa chỉ', 'điện thoại', 'thư điện tử', 'kinh nghiệm', 'kỹ năng']
+        if any(keyword.lower() in line.lower() for keyword in skip_keywords):
+            continue
+        if re.match(r'^[A-Za-zÀ-ỹ\s]+$', line):
+            return line
+
+    return ""
+
+
+def legacy_extract_info(cv_text: str) -> Dict[str, str]:
+    return {
+        "name": legacy_extract_name(cv_text),
+        "phone": legacy_extract_phone(cv_text),
+        "email": legacy_extract_email(cv_text),
+        "location": ""
+    }
+
+
+def build_corpus(count: int, jobs: int) -> list:
+    rng = random.Random(0)
+    corpus = []
+    for seed in range(count):
+        lines = synthetic_cv_text(seed, jobs=jobs).split("\n")
+        # Một nửa CV có thêm GitHub / ngày sinh, số điện thoại viết liền
+        if seed % 2:
+            lines.insert(4, f"GitHub: github.com/user{seed}")
+            lines.insert(5, f"Ngày sinh: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1985, 2003)}")
+            lines = [line.replace(" ", "") if line.startswith("Điện thoại") else line for line in lines]
+        corpus.append("\n".join(lines))
+    return corpus
+
+
+def _time(func, corpus, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in corpus:
+            func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=2000, help="number of synthetic CVs")
+    parser.add_argument("--jobs", type=int, default=8, help="jobs per CV (controls CV length)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.count, args.jobs)
+    avg_chars = sum(len(text) for text in corpus) / len(corpus)
+    print(f"corpus: {len(corpus)} CVs, {avg_chars:.0f} chars on average")
+
+    legacy = _time(legacy_extract_info, corpus, args.repeat)
+    current = _time(extract_info, corpus, args.repeat)
+    print(f"  legacy: {legacy / len(corpus) * 1e6:8.1f} us/CV")
+    print(f" current: {current / len(corpus) * 1e6:8.1f} us/CV  ({legacy / current:.1f}x faster)")
+
+    agree = {"name": 0, "email": 0, "phone": 0}
+    found = {"phone": [0, 0], "linkedin": 0, "github": 0, "birth_year": 0}
+    for text in corpus:
+        old, new = legacy_extract_info(text), extract_info(text)
+        for key in agree:
+            agree[key] += old[key] == new[key]
+        found["phone"][0] += bool(old["phone"])
+        found["phone"][1] += bool(new["phone"])
+        for key in ("linkedin", "github", "birth_year"):
+            found[key] += bool(new[key])
+    print("agreement: " + ", ".join(f"{key} {value / len(corpus):.0%}" for key, value in agree.items()))
+    print(f"phone found: legacy {found['phone'][0]}, current {found['phone'][1]}")
+    print("new fields found: " + ", ".join(f"{key} {found[key]}" for key in ("linkedin", "github", "birth_year")))
+
+
+if __name__ == "__main__":
+    main()
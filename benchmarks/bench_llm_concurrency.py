@@ -0,0 +1,63 @@
+"""Throughput of LLMService against a local fake Gemini server.
+
+Compares the old blocking call (sync client inside the coroutine) with the
+async client bounded by LLM_MAX_CONCURRENCY.
+
+    python -m benchmarks.bench_llm_concurrency --requests 64 --latency-ms 300
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_gemini import FakeGeminiServer
+
+CV_TEXT = "Nguyễn Văn A\nBackend Developer\nKinh nghiệm: 2 năm Python, FastAPI, PostgreSQL.\n" * 5
+
+
+async def run_blocking(service, n: int) -> float:
+    from services.prompt_builder import build_cv_analysis_prompt
+
+    backend = service.backend_pool.primary
+
+    async def one():
+        backend.client.models.generate_content(
+            model=backend.model,
+            contents=build_cv_analysis_prompt(CV_TEXT),
+        )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    return time.perf_counter() - start
+
+
+async def run_async(service, n: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(service.analyze_cv_with_gemini(CV_TEXT) for _ in range(n)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--concurrency", type=int, default=32, help="LLM_MAX_CONCURRENCY for the async run")
+    args = parser.parse_args()
+
+    with FakeGeminiServer(latency_ms=args.latency_ms) as server:
+        os.environ["GEMINI_API_KEY"] = "fake-key"
+        os.environ["GEMINI_BASE_URL"] = server.base_url
+        os.environ["LLM_MAX_CONCURRENCY"] = str(args.concurrency)
+        from services.llm_service import LLMService
+
+        service = LLMService()
+        for name, runner in (("blocking", run_blocking), ("async", run_async)):
+            elapsed = asyncio.run(runner(service, args.requests))
+            print(f"{name:>9}: {args.requests} requests in {elapsed:.2f}s -> {args.requests / elapsed:.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Interactive latency while backfill saturates the LLM stage: priority scheduler vs FIFO.
+
+Runs LLMService.analyze_cv in-process against the fake LLM backend. A pool of
+backfill workers keeps many more analyses outstanding than LLM_MAX_CONCURRENCY
+(backing off on 503 like the job workers), while interactive uploads arrive as an
+open-loop Poisson stream. Reports interactive p50/p99/max and completed backfill
+throughput for:
+
+  idle       scheduler, no backfill (baseline)
+  fifo       every call shares one unbounded queue (the previous semaphore)
+  scheduler  interactive > backfill priority classes, bounded queue, load shedding
+
+    python -m benchmarks.bench_llm_scheduler --concurrency 8 --backfill-workers 64 --interactive-rps 4
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(mode: str, args: argparse.Namespace) -> Dict[str, float]:
+    from benchmarks.cv_corpus import synthetic_cv_text
+    from services.llm_service import LLMService
+    from services.scheduler import PRIORITY_BACKFILL, PRIORITY_INTERACTIVE, LLMOverloadedError, LLMScheduler, set_llm_priority
+
+    if mode == "fifo":
+        # Như semaphore cũ: một hàng đợi FIFO không giới hạn, không ai bị từ chối
+        scheduler = LLMScheduler(args.concurrency, max_queue=10**9, max_wait_seconds={p: 10**9 for p in range(3)})
+    else:
+        scheduler = LLMScheduler(
+            args.concurrency,
+            max_queue=args.queue_max,
+            max_wait_seconds={0: args.interactive_wait, 1: 120.0, 2: 600.0},
+        )
+    service = LLMService(scheduler=scheduler)
+    cv_text = synthetic_cv_text(0)
+    stop_at = time.monotonic() + args.duration
+    backfill_done = 0
+    interactive_ms: List[float] = []
+    interactive_rejected = 0
+
+    async def backfill_worker() -> None:
+        nonlocal backfill_done
+        set_llm_priority(PRIORITY_INTERACTIVE if mode == "fifo" else PRIORITY_BACKFILL)
+        while time.monotonic() < stop_at:
+            try:
+                await service.analyze_cv(cv_text)
+                backfill_done += 1
+            except LLMOverloadedError as e:
+                await asyncio.sleep(e.retry_after)
+
+    async def interactive_request() -> None:
+        nonlocal interactive_rejected
+        set_llm_priority(PRIORITY_INTERACTIVE)
+        start = time.perf_counter()
+        try:
+            await service.analyze_cv(cv_text)
+        except LLMOverloadedError:
+            interactive_rejected += 1
+            return
+        interactive_ms.append((time.perf_counter() - start) * 1000)
+
+    workers = [asyncio.create_task(backfill_worker()) for _ in range(0 if mode == "idle" else args.backfill_workers)]
+    # Để backfill lấp đầy hàng đợi trước khi đo
+    await asyncio.sleep(args.latency_ms / 1000)
+    rng = random.Random(0)
+    requests = []
+    while time.monotonic() < stop_at:
+        requests.append(asyncio.create_task(interactive_request()))
+        await asyncio.sleep(rng.expovariate(args.interactive_rps))
+    await asyncio.gather(*requests)
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+    return {
+        "p50": _percentile(interactive_ms, 0.5),
+        "p99": _percentile(interactive_ms, 0.99),
+        "max": max(interactive_ms),
+        "served": len(interactive_ms),
+        "rejected": interactive_rejected,
+        "backfill_rps": backfill_done / args.duration,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM_MAX_CONCURRENCY")
+    parser.add_argument("--backfill-workers", type=int, default=64)
+    parser.add_argument("--interactive-rps", type=float, default=4.0)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per mode")
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="fake LLM latency")
+    parser.add_argument("--queue-max", type=int, default=32, help="LLM_QUEUE_MAX for the scheduler run")
+    parser.add_argument("--interactive-wait", type=float, default=15.0, help="LLM_QUEUE_WAIT_INTERACTIVE_SECONDS")
+    args = parser.parse_args()
+
+    os.environ.update({
+        "LLM_BACKENDS": "fake:fake",
+        "FAKE_LLM_LATENCY_MS": str(args.latency_ms),
+        "FAKE_LLM_SEED": "0",
+        "LLM_HEDGE_ENABLED": "false",
+    })
+    capacity = args.concurrency / (args.latency_ms / 1000)
+    print(
+        f"capacity ~{capacity:.1f} req/s, interactive {args.interactive_rps} req/s, "
+        f"{args.backfill_workers} backfill workers, {args.duration:.0f}s per mode"
+    )
+    for mode in ("idle", "fifo", "scheduler"):
+        stats = asyncio.run(run(mode, args))
+        print(
+            f"{mode:>10}: interactive p50 {stats['p50']:7.0f} ms, p99 {stats['p99']:7.0f} ms, max {stats['max']:7.0f} ms, "
+            f"served {stats['served']}, rejected {stats['rejected']}; backfill {stats['backfill_rps']:.1f} req/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Tail latency of BackendPool against local fake backends (no network).
+
+Each fake backend has a lognormal latency around --latency-ms, and a fraction
+--slow-rate of calls take an extra --slow-ms. Compares:
+  - single:   one backend, no hedging, no retries (the old behaviour)
+  - hedged:   same backend, hedged request after the p95 delay
+  - failover: primary failing --error-rate of calls + healthy secondary, retries + hedging
+
+    python -m benchmarks.bench_llm_tail_latency --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_backends import BackendPool, FakeBackend, LLMBackendError
+
+
+def _percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(pool: BackendPool, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def one(i: int):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await pool.generate(f"CV {i}")
+            except LLMBackendError:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies, failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-ms", type=float, default=2000.0)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    args = parser.parse_args()
+    # Bỏ log warning của từng lần retry
+    logging.getLogger("services.llm_backends").setLevel(logging.ERROR)
+
+    def fake(name: str, seed: int, error_rate: float = 0.0) -> FakeBackend:
+        return FakeBackend(name, latency_ms=args.latency_ms, slow_rate=args.slow_rate,
+                           slow_ms=args.slow_ms, error_rate=error_rate, seed=seed)
+
+    # hedge_min_delay nhỏ để p95 quyết định thời điểm hedge
+    scenarios = {
+        "single": BackendPool([fake("a", 1)], max_retries=0, hedge_enabled=False),
+        "hedged": BackendPool([fake("a", 1)], max_retries=0, hedge_min_delay_seconds=0.01),
+        "failover": BackendPool(
+            [fake("a", 1, error_rate=args.error_rate), fake("b", 2)],
+            max_retries=2, backoff_seconds=0.05, hedge_min_delay_seconds=0.01,
+        ),
+    }
+
+    print(f"{'scenario':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'fail':>5} {'calls':>6} {'hedges':>6}   (ms)")
+    for name, pool in scenarios.items():
+        latencies, failures = asyncio.run(run(pool, args.requests, args.concurrency))
+        calls = sum(backend.calls for backend in pool.backends)
+        ms = [value * 1000 for value in latencies] or [0.0]
+        print(
+            f"{name:>9} {statistics.median(ms):>8.0f} {_percentile(ms, 0.95):>8.0f} {_percentile(ms, 0.99):>8.0f} "
+            f"{max(ms):>8.0f} {failures:>5} {calls:>6} {pool.hedges:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Lookup latency, memory and persistence of the near-duplicate SimHash index.
+
+The index is filled with N random 64-bit fingerprints (default 1M). Queries are
+half near-duplicates of stored entries (0..max-distance bits flipped) and half
+random misses. With --persist the same entries are written to a SQLite file and
+loaded back through NearDuplicateIndex, as happens after a restart.
+
+A small quality check on the synthetic CV corpus reports how many lightly
+edited CVs are detected and whether distinct CVs ever collide.
+
+    python -m benchmarks.bench_near_duplicate --entries 1000000 --queries 20000 --persist
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.cv_corpus import synthetic_cv_text
+from config import config
+from services.near_duplicate import SIMHASH_VERSION, NearDuplicateIndex, SimHashIndex, simhash
+
+
+def _percentile(values, q):
+    return sorted(values)[min(len(values) - 1, int(q * len(values)))]
+
+
+def _edit_cv(text: str, rng: random.Random) -> str:
+    """Sửa nhẹ một CV: đổi email/số điện thoại, thêm một câu, chèn một dòng."""
+    text = re.sub(r"@", f"{rng.randrange(10)}@", text, count=1)
+    text = re.sub(r"\d{3}(?=\d{4}\b)", str(rng.randrange(100, 1000)), text, count=1)
+    lines = text.split("\n")
+    i = rng.randrange(len(lines))
+    lines[i] += " và làm việc nhóm hiệu quả"
+    lines.insert(rng.randrange(len(lines)), "Sở thích: đọc sách, chạy bộ")
+    return "\n".join(lines)
+
+
+def bench_quality(count: int, max_distance: int) -> None:
+    rng = random.Random(0)
+    detected = 0
+    collisions = 0
+    hash_ms = []
+    for seed in range(count):
+        text = synthetic_cv_text(seed)
+        start = time.perf_counter()
+        fingerprint = simhash(text)
+        hash_ms.append((time.perf_counter() - start) * 1000)
+        detected += bin(fingerprint ^ simhash(_edit_cv(text, rng))).count("1") <= max_distance
+        collisions += bin(fingerprint ^ simhash(synthetic_cv_text(seed + count))).count("1") <= max_distance
+    print(
+        f"quality ({count} CVs, max distance {max_distance}): edited detected {detected / count:.1%}, "
+        f"distinct CVs matched {collisions}, simhash p50 {_percentile(hash_ms, 0.5):.2f} ms"
+    )
+
+
+def bench_lookup(fingerprints: np.ndarray, queries: int, max_distance: int) -> None:
+    index = SimHashIndex(max_distance)
+    start = time.perf_counter()
+    index.add_many(fingerprints, np.arange(1, len(fingerprints) + 1))
+    build_s = time.perf_counter() - start
+    print(f"index: {len(index)} entries, build {build_s:.2f}s, {index.nbytes / 2**20:.1f} MiB ({index.nbytes / len(index):.0f} B/entry)")
+
+    rng = np.random.default_rng(1)
+    near = fingerprints[rng.integers(0, len(fingerprints), queries // 2)].copy()
+    for i in range(len(near)):
+        for bit in rng.choice(64, size=int(rng.integers(0, max_distance + 1)), replace=False):
+            near[i] ^= np.uint64(1) << np.uint64(bit)
+    misses = rng.integers(0, 2**64, queries - len(near), dtype=np.uint64)
+
+    for name, batch in (("near-duplicate", near), ("random", misses)):
+        latencies = []
+        found = 0
+        for fingerprint in batch.tolist():
+            start = time.perf_counter()
+            found += bool(index.search(fingerprint))
+            latencies.append((time.perf_counter() - start) * 1e6)
+        print(
+            f"  {name:>14}: found {found}/{len(batch)}, p50 {_percentile(latencies, 0.5):.0f} us, "
+            f"p99 {_percentile(latencies, 0.99):.0f} us"
+        )
+
+    for _ in range(1000):
+        index.add(int(rng.integers(0, 2**63)), len(index) + 1)
+    latencies = []
+    for fingerprint in misses[:2000].tolist():
+        start = time.perf_counter()
+        index.search(fingerprint)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    print(f"  with 1000 buffered inserts: p50 {_percentile(latencies, 0.5):.0f} us, p99 {_percentile(latencies, 0.99):.0f} us")
+
+
+def bench_persistence(fingerprints: np.ndarray, max_distance: int) -> None:
+    with tempfile.TemporaryDirectory() as state_dir:
+        path = os.path.join(state_dir, "near_duplicates.sqlite3")
+        index = NearDuplicateIndex(path, max_distance)
+        start = time.perf_counter()
+        signed = fingerprints.view(np.int64).tolist()
+        with index._lock:
+            index._conn.execute("BEGIN")
+            index._conn.executemany(
+                "INSERT INTO near_duplicates (client_id, fingerprint, version, filename, result, total_tokens, created_at) "
+                "VALUES ('bench', ?, ?, 'cv.pdf', '{}', 0, '')",
+                ((fingerprint, f"{SIMHASH_VERSION}:bench") for fingerprint in signed),
+            )
+            index._conn.execute("COMMIT")
+        write_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reloaded = NearDuplicateIndex(path, max_distance)
+        load_s = time.perf_counter() - start
+        print(
+            f"persistence: write {write_s:.2f}s, load after restart {load_s:.2f}s "
+            f"({len(reloaded.index)} entries, {os.path.getsize(path) / 2**20:.0f} MiB on disk)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--max-distance", type=int, default=config.NEAR_DUPLICATE_MAX_DISTANCE)
+    parser.add_argument("--quality-count", type=int, default=300)
+    parser.add_argument("--persist", action="store_true", help="also measure SQLite write and reload time")
+    args = parser.parse_args()
+
+    bench_quality(args.quality_count, args.max_distance)
+    fingerprints = np.random.default_rng(0).integers(0, 2**64, args.entries, dtype=np.uint64)
+    bench_lookup(fingerprints, args.queries, args.max_distance)
+    if args.persist:
+        bench_persistence(fingerprints, args.max_distance)
+
+
+if __name__ == "__main__":
+    main()
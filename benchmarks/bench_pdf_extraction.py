@@ -0,0 +1,53 @@
+"""PDF extraction time versus document length, with and without a budget.
+
+Each document is a 4-page synthetic CV followed by portfolio pages (every
+third one image-only). "full" reads every page (the previous behaviour);
+"budget" uses EXTRACTION_MAX_CHARS / EXTRACTION_MAX_PAGES, so its time and
+text size should stay flat once the budget is reached.
+
+    python -m benchmarks.bench_pdf_extraction --pages 5 20 50 200 --repeat 5
+    EXTRACTION_MAX_CHARS=20000 python -m benchmarks.bench_pdf_extraction
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.cv_corpus import synthetic_portfolio_pdf
+from config import config
+from services.extraction import _parse_pdf_with_stats
+
+
+def _time(content: bytes, max_chars: int, max_pages: int, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text, stats = _parse_pdf_with_stats(content, max_chars, max_pages)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), len(text), stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 20, 50, 200])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"budget: EXTRACTION_MAX_CHARS={config.EXTRACTION_MAX_CHARS} EXTRACTION_MAX_PAGES={config.EXTRACTION_MAX_PAGES}")
+    print(f"{'pages':>6} {'size KB':>8} {'full ms':>9} {'full chars':>11} {'budget ms':>10} {'chars':>7} {'read':>5} {'skipped':>8} {'speedup':>8}")
+    for pages in args.pages:
+        content = synthetic_portfolio_pdf(pages, pages)
+        _parse_pdf_with_stats(content)
+        full_ms, full_chars, _ = _time(content, 0, 0, args.repeat)
+        budget_ms, budget_chars, stats = _time(content, config.EXTRACTION_MAX_CHARS, config.EXTRACTION_MAX_PAGES, args.repeat)
+        print(
+            f"{pages:>6} {len(content) / 1024:>8.0f} {full_ms:>9.1f} {full_chars:>11} {budget_ms:>10.1f} "
+            f"{budget_chars:>7} {stats['pages_read']:>5} {stats['pages_skipped']:>8} {full_ms / budget_ms:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Prompt-size reduction from services/text_compaction.py.
+
+Runs compact_cv_text over a corpus of CVs and reports the estimated prompt
+tokens before/after and the time spent. Uses synthetic CVs unless --corpus
+points at a directory of real PDF/DOCX files.
+
+    python -m benchmarks.bench_prompt_compaction --count 500
+    python -m benchmarks.bench_prompt_compaction --corpus ./sample_cvs --max-tokens 3000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.cv_corpus import synthetic_cv_text
+from services.text_compaction import CHARS_PER_TOKEN, compact_cv_text
+
+
+def load_corpus(directory: str):
+    from services.extraction import _parse_docx, _parse_pdf
+
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        with open(path, "rb") as f:
+            content = f.read()
+        if name.lower().endswith(".pdf"):
+            yield _parse_pdf(content)
+        elif name.lower().endswith(".docx"):
+            yield _parse_docx(content)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=200, help="number of synthetic CVs")
+    parser.add_argument("--corpus", help="directory of PDF/DOCX CVs instead of synthetic text")
+    parser.add_argument("--max-tokens", type=int, default=0, help="token budget (0 = no truncation)")
+    args = parser.parse_args()
+
+    texts = list(load_corpus(args.corpus)) if args.corpus else [synthetic_cv_text(i, jobs=3 + i % 6) for i in range(args.count)]
+
+    original_tokens = 0
+    compacted_tokens = 0
+    truncated = 0
+    start = time.perf_counter()
+    for text in texts:
+        _, stats = compact_cv_text(text, max_tokens=args.max_tokens)
+        original_tokens += stats.original_tokens
+        compacted_tokens += stats.compacted_tokens
+        truncated += stats.truncated
+    elapsed = time.perf_counter() - start
+
+    print(f"CVs:               {len(texts)}")
+    print(f"tokens before:     {original_tokens} (avg {original_tokens / len(texts):.0f})")
+    print(f"tokens after:      {compacted_tokens} (avg {compacted_tokens / len(texts):.0f})")
+    print(f"reduction:         {100 * (1 - compacted_tokens / original_tokens):.1f}%")
+    print(f"truncated CVs:     {truncated}")
+    print(f"compaction time:   {1000 * elapsed / len(texts):.3f} ms/CV")
+    print(f"(token counts are estimates: ~{CHARS_PER_TOKEN} characters per token)")
+
+
+if __name__ == "__main__":
+    main()
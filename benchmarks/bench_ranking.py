@@ -0,0 +1,146 @@
+"""Index build time and query latency of the BM25 ranking index behind /rank.
+
+Builds a BM25Index over N synthetic CVs (default 100k), then measures top-K query
+latency for job descriptions of different lengths, latency while new CVs are
+being added between queries, and snapshot save/load time. With --sqlite the
+full CVRankingIndex is used: CVs are written to SQLite and the index is rebuilt
+from the database (cold start without snapshot) and loaded from the snapshot.
+
+    python -m benchmarks.bench_ranking --cvs 100000 --queries 200 --sqlite
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.cv_corpus import CITIES, ROLES, SKILLS, synthetic_cv_text
+from services.ranking import BM25Index, CVRankingIndex, tokenize
+
+_JD_BODY = (
+    "Mô tả công việc: tham gia phát triển và vận hành hệ thống có hàng triệu người dùng, "
+    "phối hợp với các team sản phẩm, review code và cải thiện hiệu năng. "
+    "Yêu cầu: tốt nghiệp đại học chuyên ngành Công nghệ thông tin, kỹ năng giao tiếp và làm việc nhóm tốt. "
+    "Quyền lợi: lương cạnh tranh, bảo hiểm đầy đủ, môi trường trẻ trung năng động."
+)
+
+
+def _percentile(values, q):
+    return sorted(values)[min(len(values) - 1, int(q * len(values)))]
+
+
+def _job_description(rng: random.Random, long: bool) -> str:
+    skills = ", ".join(rng.sample(SKILLS, 4))
+    title = f"Tuyển {rng.choice(ROLES)} có kinh nghiệm {skills} tại {rng.choice(CITIES)}."
+    return f"{title} {_JD_BODY}" if long else title
+
+
+def _report(name: str, latencies) -> None:
+    print(
+        f"  {name:>28}: p50 {_percentile(latencies, 0.5):6.2f} ms, p95 {_percentile(latencies, 0.95):6.2f} ms, "
+        f"p99 {_percentile(latencies, 0.99):6.2f} ms"
+    )
+
+
+def bench_queries(index: BM25Index, queries: int, top_k: int) -> None:
+    rng = random.Random(1)
+    for long in (False, True):
+        latencies = []
+        for _ in range(queries):
+            tokens = tokenize(_job_description(rng, long))
+            start = time.perf_counter()
+            index.search(tokens, top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        _report(f"{'long' if long else 'short'} JD, top {top_k}", latencies)
+
+
+def bench_incremental(index: BM25Index, texts, queries: int, top_k: int) -> None:
+    rng = random.Random(2)
+    latencies = []
+    next_id = index.last_doc_id + 1
+    for i in range(queries):
+        # Mỗi query đi sau 5 CV mới: mỗi lần search phải gom pending thành segment
+        for _ in range(5):
+            index.add(next_id, tokenize(texts[next_id % len(texts)]))
+            next_id += 1
+        tokens = tokenize(_job_description(rng, True))
+        start = time.perf_counter()
+        index.search(tokens, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    _report("long JD, 5 inserts/query", latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cvs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--sqlite", action="store_true", help="also measure the SQLite-backed CVRankingIndex")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    texts = [synthetic_cv_text(seed) for seed in range(args.cvs)]
+    print(f"corpus: {args.cvs} CVs generated in {time.perf_counter() - start:.1f}s")
+
+    index = BM25Index()
+    start = time.perf_counter()
+    tokens = [tokenize(text) for text in texts]
+    tokenize_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for doc_id, doc_tokens in enumerate(tokens, 1):
+        index.add(doc_id, doc_tokens)
+    index.search([], 1)
+    build_s = time.perf_counter() - start
+    del tokens
+    print(
+        f"build: tokenize {tokenize_s:.1f}s, index {build_s:.1f}s, {len(index.vocabulary)} terms, "
+        f"{index.nbytes / 2**20:.0f} MiB"
+    )
+
+    bench_queries(index, args.queries, args.top_k)
+    bench_queries(index, args.queries, 100)
+    bench_incremental(index, texts, args.queries, args.top_k)
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        path = os.path.join(state_dir, "index.npz")
+        start = time.perf_counter()
+        index.save(path)
+        save_s = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = BM25Index.load(path)
+        load_s = time.perf_counter() - start
+        print(
+            f"snapshot: save {save_s:.2f}s, load {load_s:.2f}s ({len(loaded)} CVs, "
+            f"{os.path.getsize(path) / 2**20:.0f} MiB on disk)"
+        )
+
+        if args.sqlite:
+            db_path = os.path.join(state_dir, "rank.sqlite3")
+            ranking = CVRankingIndex(db_path, snapshot_every=10 * args.cvs)
+            start = time.perf_counter()
+            with ranking._lock:
+                ranking._conn.execute("BEGIN")
+                ranking._conn.executemany(
+                    "INSERT INTO cv_documents (client_id, text_hash, filename, cv_text, created_at) VALUES ('bench', ?, ?, ?, '')",
+                    ((str(i), f"cv_{i}.pdf", text) for i, text in enumerate(texts)),
+                )
+                ranking._conn.execute("COMMIT")
+            write_s = time.perf_counter() - start
+            start = time.perf_counter()
+            ranking.refresh()
+            rebuild_s = time.perf_counter() - start
+            ranking.save_snapshot()
+            start = time.perf_counter()
+            reloaded = CVRankingIndex(db_path)
+            reload_s = time.perf_counter() - start
+            print(
+                f"sqlite: write {write_s:.1f}s, rebuild from database {rebuild_s:.1f}s, "
+                f"restart with snapshot {reload_s:.2f}s ({len(reloaded)} CVs)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Replay recorded requests against the FastAPI app in-process.
+
+Every line of the requests file (JSONL) becomes one upload:
+  - {"file": "path/to/cv.pdf", "endpoint": "/upload-cv"}: upload that fixture
+  - any other record (e.g. the backlog entries in requests.jsonl): a synthetic
+    CV PDF seeded from the record, so the same file always replays the same CVs
+Files from --fixtures are appended as extra requests. Requests run through
+httpx.ASGITransport (no sockets) with the app lifespan started, and the LLM
+is replaced by the local fake backend (LLM_BACKENDS=fake) with configurable
+latency, so results are reproducible and free.
+
+Reported: throughput, client latency and per-stage p50/p95/p99 (from
+Metadata.stages_ms), event-loop lag, and the process memory high-water mark.
+
+    python -m benchmarks.bench_replay --repeat 5 --concurrency 16 --output benchmarks/results/replay.json
+    python -m benchmarks.bench_replay --repeat 5 --concurrency 16 --compare benchmarks/results/replay.json
+
+With --compare the run exits with status 1 when a metric is worse than the
+baseline by more than --tolerance.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# (filename, content, endpoint)
+Upload = Tuple[str, bytes, str]
+
+LOOP_LAG_INTERVAL = 0.01
+# Bỏ qua chênh lệch tuyệt đối nhỏ hơn mức này khi so sánh latency (nhiễu đo)
+LATENCY_SLACK_MS = 2.0
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 3)}
+
+
+def load_uploads(requests_file: Optional[str], fixtures: Optional[str], jobs: int) -> List[Upload]:
+    from benchmarks.cv_corpus import synthetic_cv_pdf
+
+    uploads: List[Upload] = []
+    if requests_file and os.path.exists(requests_file):
+        with open(requests_file, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                endpoint = record.get("endpoint", "/upload-cv")
+                if record.get("file"):
+                    path = os.path.join(os.path.dirname(os.path.abspath(requests_file)), record["file"])
+                    with open(path, "rb") as fixture:
+                        uploads.append((os.path.basename(path), fixture.read(), endpoint))
+                else:
+                    seed = int.from_bytes(hashlib.sha256(line.encode("utf-8")).digest()[:4], "big")
+                    uploads.append((f"replay-{len(uploads)}.pdf", synthetic_cv_pdf(seed, jobs=jobs), endpoint))
+    if fixtures:
+        for name in sorted(os.listdir(fixtures)):
+            if name.lower().endswith((".pdf", ".docx")):
+                with open(os.path.join(fixtures, name), "rb") as fixture:
+                    uploads.append((name, fixture.read(), "/upload-cv"))
+    return uploads
+
+
+async def _monitor_loop_lag(samples: List[float], stop: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        samples.append(max(0.0, loop.time() - start - LOOP_LAG_INTERVAL) * 1000)
+
+
+async def replay(uploads: List[Upload], concurrency: int, warmup: int) -> Dict:
+    import httpx
+
+    import main
+
+    app = main.app
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    statuses: Dict[str, int] = {}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=300) as client:
+
+            async def send(upload: Upload, record: bool) -> None:
+                filename, content, endpoint = upload
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post(endpoint, files={"file": (filename, content)})
+                    elapsed = (time.perf_counter() - start) * 1000
+                if not record:
+                    return
+                statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+                latencies.append(elapsed)
+                if response.status_code == 200:
+                    for name, value in (response.json()["metadata"].get("stages_ms") or {}).items():
+                        stages.setdefault(name, []).append(value)
+
+            await asyncio.gather(*(send(upload, False) for upload in uploads[:warmup]))
+
+            lag_samples: List[float] = []
+            stop = asyncio.Event()
+            monitor = asyncio.create_task(_monitor_loop_lag(lag_samples, stop))
+            start = time.perf_counter()
+            await asyncio.gather(*(send(upload, True) for upload in uploads))
+            wall = time.perf_counter() - start
+            stop.set()
+            await monitor
+
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if platform.system() == "Darwin":
+        max_rss_kb //= 1024
+    return {
+        "requests": len(uploads),
+        "statuses": statuses,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(uploads) / wall, 2),
+        "latency_ms": _percentiles(latencies),
+        "stages_ms": {name: _percentiles(values) for name, values in sorted(stages.items())},
+        "loop_lag_ms": _percentiles(lag_samples),
+        "max_rss_mb": round(max_rss_kb / 1024, 1),
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Danh sách metric bị regression so với baseline."""
+    regressions = []
+
+    def check_latency(name: str, now: Dict, before: Dict) -> None:
+        for key in ("p50", "p95", "p99"):
+            if key in now and key in before and now[key] > before[key] * (1 + tolerance) + LATENCY_SLACK_MS:
+                regressions.append(f"{name} {key}: {before[key]:.1f} -> {now[key]:.1f} ms")
+
+    check_latency("latency", current["latency_ms"], baseline["latency_ms"])
+    for stage, values in current["stages_ms"].items():
+        if stage in baseline["stages_ms"]:
+            check_latency(f"stage {stage}", values, baseline["stages_ms"][stage])
+    check_latency("loop lag", current["loop_lag_ms"], baseline["loop_lag_ms"])
+
+    if current["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput: {baseline['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s")
+    if current["max_rss_mb"] > baseline["max_rss_mb"] * (1 + tolerance):
+        regressions.append(f"max RSS: {baseline['max_rss_mb']:.0f} -> {current['max_rss_mb']:.0f} MB")
+    errors = sum(count for status, count in current["statuses"].items() if status != "200")
+    if errors > sum(count for status, count in baseline["statuses"].items() if status != "200"):
+        regressions.append(f"non-200 responses: {current['statuses']}")
+    return regressions
+
+
+def _print_summary(summary: Dict) -> None:
+    print(f"requests: {summary['requests']} {summary['statuses']} in {summary['wall_seconds']}s "
+          f"-> {summary['throughput_rps']} req/s, max RSS {summary['max_rss_mb']} MB")
+    print(f"{'':>14} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    rows = [("client", summary["latency_ms"])] + list(summary["stages_ms"].items()) + [("loop lag", summary["loop_lag_ms"])]
+    for name, values in rows:
+        print(f"{name:>14} {values['p50']:>9.1f} {values['p95']:>9.1f} {values['p99']:>9.1f} {values['max']:>9.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests-file", default=os.path.join(ROOT, "requests.jsonl"))
+    parser.add_argument("--fixtures", help="directory of PDF/DOCX files to replay as well")
+    parser.add_argument("--synthetic", type=int, default=0, help="extra synthetic CVs (used when there is nothing to replay)")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the request list this many times")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=4, help="requests sent before measuring")
+    parser.add_argument("--jobs", type=int, default=4, help="jobs per synthetic CV (controls CV length)")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="fake LLM latency")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of slow fake LLM calls")
+    parser.add_argument("--slow-ms", type=float, default=3000.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", default="none", help="CACHE_BACKEND for the run (default: none, also disables the near-duplicate index)")
+    parser.add_argument("--output", help="save results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    args = parser.parse_args()
+
+    state_dir = tempfile.mkdtemp(prefix="cv-replay-")
+    os.environ.update({
+        "LLM_BACKENDS": "fake:fake",
+        "FAKE_LLM_LATENCY_MS": str(args.latency_ms),
+        "FAKE_LLM_SLOW_RATE": str(args.slow_rate),
+        "FAKE_LLM_SLOW_MS": str(args.slow_ms),
+        "FAKE_LLM_SEED": str(args.seed),
+        "CACHE_BACKEND": args.cache,
+        "CACHE_SQLITE_PATH": os.path.join(state_dir, "cache.sqlite3"),
+        "JOB_STORE_PATH": os.path.join(state_dir, "jobs.sqlite3"),
+        # Near-duplicate index là một lớp cache nữa, bật cùng --cache
+        "NEAR_DUPLICATE_ENABLED": "false" if args.cache == "none" else "true",
+        "NEAR_DUPLICATE_PATH": os.path.join(state_dir, "near_duplicates.sqlite3"),
+        "RANKING_INDEX_PATH": os.path.join(state_dir, "rank_index.sqlite3"),
+        "RATE_LIMIT_PER_MINUTE": "0",
+        "METADATA_STAGE_TIMINGS": "true",
+    })
+
+    from benchmarks.cv_corpus import synthetic_cv_pdf
+
+    uploads = load_uploads(args.requests_file, args.fixtures, args.jobs)
+    uploads += [(f"synthetic-{i}.pdf", synthetic_cv_pdf(10_000 + i, jobs=args.jobs), "/upload-cv") for i in range(args.synthetic)]
+    if not uploads:
+        parser.error("nothing to replay: pass --requests-file, --fixtures or --synthetic")
+    uploads = uploads * max(1, args.repeat)
+
+    summary = asyncio.run(replay(uploads, args.concurrency, min(args.warmup, len(uploads))))
+    result = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "python": platform.python_version(),
+        "summary": summary,
+    }
+    _print_summary(summary)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"saved {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(summary, baseline["summary"], args.tolerance)
+        if regressions:
+            print("REGRESSIONS vs " + args.compare + ":")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"no regressions vs {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
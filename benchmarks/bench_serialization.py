@@ -0,0 +1,114 @@
+"""Serialization throughput of CVAnalysisResponse.
+
+Compares the paths a response can take from model to bytes:
+  - legacy: FastAPI default (re-validate against response_model, jsonable_encoder, json.dumps)
+  - encoder: jsonable_encoder + json.dumps without re-validation
+  - model_dump_json: pydantic-core serializer used by ModelResponse
+  - compact: model_dump_json without the `reason` strings (?compact=true)
+  - orjson: orjson.dumps(model_dump()), only when orjson is installed
+
+    python -m benchmarks.bench_serialization --iterations 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.schemas import CVAnalysisData, CVAnalysisResponse, CacheStatus, Metadata, TokenUsage
+from services.llm_backends import _fake_analysis
+from services.serialization import ModelResponse, dump_response, response_exclude
+
+_REASON = (
+    "Ứng viên có {years} năm kinh nghiệm phát triển backend với Python và FastAPI, "
+    "đã tham gia thiết kế hệ thống xử lý {count} request mỗi ngày, có dẫn chứng cụ thể trong CV."
+)
+
+
+def _response(seed: int) -> CVAnalysisResponse:
+    rng = random.Random(seed)
+    analysis = _fake_analysis(f"bench-{seed}")
+    for group in ("core_scores", "bonus_scores"):
+        for score in analysis[group].values():
+            score["reason"] = _REASON.format(years=rng.randint(1, 8), count=rng.randint(1, 99) * 1000)
+    analysis["info"] = {
+        "name": "Nguyễn Văn An",
+        "phone": "0901234567",
+        "email": "an.nguyen@example.com",
+        "location": "Hà Nội",
+        "linkedin": "https://linkedin.com/in/an-nguyen",
+        "github": "https://github.com/annguyen",
+        "birth_year": 1998,
+    }
+    metadata = Metadata(
+        filename=f"cv_{seed}.pdf",
+        upload_time="2026-01-01T00:00:00+00:00",
+        processing_time_ms=1234,
+        token_usage=TokenUsage(prompt_tokens=2500, completion_tokens=900, total_tokens=3400),
+        cache=CacheStatus(),
+    )
+    return CVAnalysisResponse(status="success", data=CVAnalysisData(**analysis), metadata=metadata)
+
+
+def _legacy(response: CVAnalysisResponse) -> bytes:
+    # FastAPI serialize_response: validate lại theo response_model rồi jsonable_encoder
+    validated = CVAnalysisResponse.model_validate(response.model_dump())
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _encoder(response: CVAnalysisResponse) -> bytes:
+    return json.dumps(jsonable_encoder(response), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _model_dump_json(response: CVAnalysisResponse) -> bytes:
+    return ModelResponse(response).body
+
+
+def _compact(response: CVAnalysisResponse) -> bytes:
+    return ModelResponse(response, exclude=response_exclude(True)).body
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--responses", type=int, default=100, help="distinct responses to cycle through")
+    args = parser.parse_args()
+
+    responses = [_response(seed) for seed in range(args.responses)]
+    paths = [("legacy", _legacy), ("encoder", _encoder), ("model_dump_json", _model_dump_json), ("compact", _compact)]
+    try:
+        import orjson
+
+        paths.append(("orjson", lambda response: orjson.dumps(response.model_dump())))
+    except ImportError:
+        print("orjson not installed, skipping")
+
+    # Cùng nội dung JSON (trừ compact) để so sánh công bằng
+    reference = json.loads(_legacy(responses[0]))
+    assert json.loads(_model_dump_json(responses[0])) == reference
+    assert json.loads(dump_response(responses[0], compact=False)) == reference
+
+    baseline = None
+    for name, serialize in paths:
+        for response in responses[:10]:
+            serialize(response)
+        start = time.perf_counter()
+        size = 0
+        for i in range(args.iterations):
+            size += len(serialize(responses[i % len(responses)]))
+        elapsed = time.perf_counter() - start
+        ops = args.iterations / elapsed
+        baseline = baseline or ops
+        print(
+            f"{name:>16}: {ops:9.0f} ops/s, {elapsed / args.iterations * 1e6:7.1f} us/op, "
+            f"{size / args.iterations:6.0f} B/response, x{ops / baseline:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
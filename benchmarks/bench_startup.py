@@ -0,0 +1,102 @@
+"""Startup time and first-request latency of server.py, with and without prewarm.
+
+Starts `python server.py` as a subprocess (one worker by default) against a local
+fake Gemini server, then measures:
+  - ready: process start -> first 200 from /health
+  - first: latency of the first /upload-cv request
+  - second: latency of the next /upload-cv request (steady state)
+
+    python -m benchmarks.bench_startup --runs 3 --workers 1
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.cv_corpus import synthetic_cv_pdf
+from benchmarks.fake_gemini import FakeGeminiServer
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _upload(client: httpx.Client, base_url: str, seed: int) -> float:
+    start = time.perf_counter()
+    response = client.post(
+        f"{base_url}/upload-cv",
+        files={"file": (f"cv{seed}.pdf", synthetic_cv_pdf(seed), "application/pdf")},
+    )
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def run_once(gemini_url: str, prewarm: bool, workers: int, state_dir: str) -> dict:
+    port = _free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(workers),
+        PREWARM_SERVICES="true" if prewarm else "false",
+        GEMINI_API_KEY="fake-key",
+        GEMINI_BASE_URL=gemini_url,
+        CACHE_BACKEND="none",
+        RATE_LIMIT_PER_MINUTE="0",
+        JOB_STORE_PATH=os.path.join(state_dir, f"jobs-{port}.sqlite3"),
+        NEAR_DUPLICATE_ENABLED="false",
+        RANKING_ENABLED="false",
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "server.py"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=60) as client:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError("server.py exited during startup")
+                try:
+                    if client.get(f"{base_url}/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.02)
+            ready = time.perf_counter() - start
+            first = _upload(client, base_url, 1)
+            second = _upload(client, base_url, 2)
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+    return {"ready": ready, "first": first, "second": second}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="fake Gemini latency")
+    args = parser.parse_args()
+
+    with FakeGeminiServer(latency_ms=args.latency_ms) as gemini, tempfile.TemporaryDirectory() as state_dir:
+        print(f"{'prewarm':>8} {'ready':>9} {'first':>9} {'second':>9}  (median of {args.runs} runs, ms)")
+        for prewarm in (False, True):
+            runs = [run_once(gemini.base_url, prewarm, args.workers, state_dir) for _ in range(args.runs)]
+            row = {key: statistics.median(run[key] for run in runs) * 1000 for key in ("ready", "first", "second")}
+            print(f"{str(prewarm):>8} {row['ready']:>9.0f} {row['first']:>9.0f} {row['second']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Time to first useful byte: /upload-cv vs the /upload-cv/stream SSE endpoint.
+
+Runs the app under uvicorn on a local port (httpx.ASGITransport buffers the whole
+body, so it cannot show streaming) with the fake LLM backend, which streams its
+JSON in chunks over the configured latency. Every request uploads a different
+synthetic CV and the result cache is off, so each one calls the LLM. Reports
+p50/p95 of the full /upload-cv response and, for the stream, the arrival of the
+`info` event (local extraction), the first score event (`core_scores`) and the
+final `result`.
+
+    python -m benchmarks.bench_stream_latency --requests 30 --latency-ms 2000
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(q * len(values)))]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _stream_timings(client, url: str, filename: str, content: bytes) -> Dict[str, float]:
+    """Thời điểm (ms) nhận được từng event đầu tiên theo tên."""
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    async with client.stream("POST", url, files={"file": (filename, content)}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                timings.setdefault(line[len("event:"):].strip(), (time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def run(requests: int, port: int) -> None:
+    import httpx
+    import uvicorn
+
+    from benchmarks.cv_corpus import synthetic_cv_pdf
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    base = f"http://127.0.0.1:{port}"
+    results: Dict[str, List[float]] = {"/upload-cv": [], "info": [], "core_scores": [], "result": []}
+    try:
+        async with httpx.AsyncClient(timeout=120) as client:
+            # Warm up extraction + LLM client
+            await client.post(f"{base}/upload-cv", files={"file": ("warmup.pdf", synthetic_cv_pdf(999_999))})
+            for i in range(requests):
+                content = synthetic_cv_pdf(2 * i)
+                start = time.perf_counter()
+                response = await client.post(f"{base}/upload-cv", files={"file": (f"cv-{i}.pdf", content)})
+                response.raise_for_status()
+                results["/upload-cv"].append((time.perf_counter() - start) * 1000)
+
+                timings = await _stream_timings(client, f"{base}/upload-cv/stream", f"cv-{i}.pdf", synthetic_cv_pdf(2 * i + 1))
+                for name in ("info", "core_scores", "result"):
+                    results[name].append(timings[name])
+    finally:
+        server.should_exit = True
+        await serve
+
+    labels = {
+        "/upload-cv": "/upload-cv response",
+        "info": "stream: info event",
+        "core_scores": "stream: core_scores",
+        "result": "stream: result",
+    }
+    for name, values in results.items():
+        print(f"{labels[name]:>22}: p50 {_percentile(values, 0.5):8.1f} ms, p95 {_percentile(values, 0.95):8.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=2000.0, help="fake LLM latency")
+    args = parser.parse_args()
+
+    state_dir = tempfile.mkdtemp(prefix="cv-stream-")
+    os.environ.update({
+        "LLM_BACKENDS": "fake:fake",
+        "FAKE_LLM_LATENCY_MS": str(args.latency_ms),
+        "FAKE_LLM_SEED": "0",
+        "LLM_HEDGE_ENABLED": "false",
+        "CACHE_BACKEND": "none",
+        "NEAR_DUPLICATE_ENABLED": "false",
+        "RANKING_ENABLED": "false",
+        "JOB_STORE_PATH": os.path.join(state_dir, "jobs.sqlite3"),
+        "RATE_LIMIT_PER_MINUTE": "0",
+        "EXTRACTION_EXECUTOR": "thread",
+    })
+    asyncio.run(run(args.requests, _free_port()))
+
+
+if __name__ == "__main__":
+    main()
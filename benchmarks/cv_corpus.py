@@ -0,0 +1,124 @@
+"""Synthetic CV generator shared by the benchmarks.
+
+Text mimics what services/extraction.py produces from real CVs: repeated
+page headers/footers, page numbers, whitespace runs and table rows whose
+merged cells are repeated.
+"""
+import io
+import random
+from typing import List
+
+from services.text_compaction import PAGE_BREAK
+
+FIRST_NAMES = ["An", "Bình", "Chi", "Dũng", "Hà", "Hùng", "Lan", "Minh", "Nam", "Phương", "Quân", "Thảo", "Trang", "Tuấn"]
+LAST_NAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Vũ", "Đặng", "Bùi", "Đỗ"]
+MIDDLE_NAMES = ["Văn", "Thị", "Minh", "Đức", "Thu", "Quang", "Ngọc"]
+COMPANIES = ["FPT Software", "Viettel", "VNG", "Tiki", "MoMo", "Shopee", "VNPT", "Grab Vietnam", "KMS Technology"]
+ROLES = ["Backend Developer", "Frontend Developer", "Data Engineer", "QA Engineer", "Mobile Developer", "DevOps Engineer"]
+SKILLS = ["Python", "Java", "Go", "TypeScript", "React", "FastAPI", "Django", "PostgreSQL", "MySQL", "Redis",
+          "Docker", "Kubernetes", "AWS", "GCP", "Kafka", "Spark", "Git", "Linux", "CI/CD", "GraphQL"]
+SCHOOLS = ["Đại học Bách Khoa Hà Nội", "Đại học Công nghệ - ĐHQGHN", "Đại học FPT", "Đại học Khoa học Tự nhiên TP.HCM"]
+CITIES = ["Hà Nội", "TP. Hồ Chí Minh", "Đà Nẵng", "Cần Thơ", "Hải Phòng"]
+
+
+def random_name(rng: random.Random) -> str:
+    return f"{rng.choice(LAST_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(FIRST_NAMES)}"
+
+
+def synthetic_cv_pages(seed: int, jobs: int = 4) -> List[str]:
+    rng = random.Random(seed)
+    name = random_name(rng)
+    email = f"{name.split()[-1].lower()}.{seed}@example.com".encode("ascii", "ignore").decode()
+    phone = "0" + str(rng.choice([3, 5, 7, 8, 9])) + "".join(str(rng.randint(0, 9)) for _ in range(8))
+    header = f"{name}    -    Curriculum Vitae"
+
+    body = [
+        name,
+        f"Email: {email}",
+        f"Điện thoại: {phone[:4]} {phone[4:7]} {phone[7:]}",
+        f"Địa chỉ:   {rng.choice(CITIES)}",
+        f"LinkedIn: linkedin.com/in/user{seed}",
+        "MỤC TIÊU NGHỀ NGHIỆP",
+        f"Trở thành {rng.choice(ROLES)} có kinh nghiệm,   đóng góp vào các sản phẩm có hàng triệu người dùng.",
+        "KINH NGHIỆM LÀM VIỆC",
+    ]
+    for i in range(jobs):
+        start = 2015 + i * 2
+        body.append(f"{rng.choice(ROLES)} - {rng.choice(COMPANIES)}    ({start} - {start + 2})")
+        for _ in range(rng.randint(3, 6)):
+            skill = rng.choice(SKILLS)
+            body.append(f"-   Phát triển và vận hành hệ thống sử dụng {skill}, cải thiện hiệu năng {rng.randint(10, 80)}%.")
+    body.append("KỸ NĂNG")
+    skills = rng.sample(SKILLS, 8)
+    body.append(" | ".join(s for skill in skills[:4] for s in (skill, skill)))
+    body.append(" | ".join(skills[4:]))
+    body += ["HỌC VẤN", f"{rng.choice(SCHOOLS)}  -  Kỹ sư Công nghệ thông tin   (2011 - 2015)", "GPA: 3.2/4"]
+    body += ["DỰ ÁN CÁ NHÂN", f"CV Parser - công cụ trích xuất CV viết bằng {rng.choice(SKILLS)}"]
+    body += ["SỞ THÍCH", "Đọc sách, chạy bộ, du lịch", "NGƯỜI THAM CHIẾU", f"Ông {random_name(rng)} - Trưởng phòng kỹ thuật"]
+
+    # Bảng kỹ năng lặp lại nội dung đoạn văn (giống DOCX có cả text box và bảng)
+    body += body[8:12]
+
+    per_page = max(10, len(body) // 3)
+    chunks = [body[i:i + per_page] for i in range(0, len(body), per_page)]
+    pages = []
+    for number, chunk in enumerate(chunks, 1):
+        pages.append("\n".join([header, ""] + chunk + ["", f"Trang {number}/{len(chunks)}"]))
+    return pages
+
+
+def synthetic_cv_text(seed: int, jobs: int = 4) -> str:
+    """Text giống output của extract_text cho một PDF nhiều trang."""
+    return ("\n" + PAGE_BREAK).join(synthetic_cv_pages(seed, jobs))
+
+
+def synthetic_cv_pdf(seed: int, jobs: int = 4) -> bytes:
+    import fitz
+
+    document = fitz.open()
+    for page_text in synthetic_cv_pages(seed, jobs):
+        page = document.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, 560, 800), page_text, fontsize=9, fontname="helv")
+    return document.tobytes()
+
+
+def synthetic_portfolio_pdf(seed: int, pages: int, image_every: int = 3) -> bytes:
+    """CV 4 trang, sau đó là các trang portfolio: cứ `image_every` trang có một trang chỉ có ảnh."""
+    import fitz
+
+    rng = random.Random(seed)
+    document = fitz.open(stream=synthetic_cv_pdf(seed), filetype="pdf")
+    image = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 600, 800), False)
+    image.clear_with(rng.randrange(256))
+    for i in range(max(0, pages - len(document))):
+        page = document.new_page()
+        if image_every and i % image_every == image_every - 1:
+            page.insert_image(page.rect, pixmap=image)
+            continue
+        project = rng.choice(COMPANIES)
+        text = "\n".join(
+            f"Project {i + 1} for {project}: {', '.join(rng.sample(SKILLS, 3))}, delivered with {rng.choice(ROLES)} team."
+            for _ in range(40)
+        )
+        page.insert_textbox(fitz.Rect(40, 40, 560, 800), text, fontsize=9, fontname="helv")
+    return document.tobytes()
+
+
+def synthetic_cv_docx(seed: int, jobs: int = 4, table_rows: int = 0) -> bytes:
+    from docx import Document
+
+    document = Document()
+    for page_text in synthetic_cv_pages(seed, jobs):
+        for line in page_text.splitlines():
+            document.add_paragraph(line)
+    if table_rows:
+        rng = random.Random(seed)
+        table = document.add_table(rows=table_rows, cols=4)
+        for row in table.rows:
+            row.cells[0].merge(row.cells[1])
+            row.cells[0].text = rng.choice(COMPANIES)
+            row.cells[2].text = rng.choice(ROLES)
+            row.cells[3].text = ", ".join(rng.sample(SKILLS, 3))
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
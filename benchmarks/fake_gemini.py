@@ -0,0 +1,126 @@
+"""Local stand-in for the Gemini REST API used by the benchmarks.
+
+Only the endpoints the service calls are implemented. Every response is the
+same canned CV analysis, returned after a configurable delay.
+"""
+import asyncio
+import json
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+
+SAMPLE_ANALYSIS = {
+    "overall_score": 70,
+    "level": "junior",
+    "field": "Phát triển phần mềm",
+    "info": {"location": "Hà Nội"},
+    "core_scores": {
+        "format": {"score": 75, "reason": "Bố cục rõ ràng, dễ đọc."},
+        "experience": {"score": 68, "reason": "2 năm kinh nghiệm backend full-time."},
+        "skills": {"score": 72, "reason": "Python, FastAPI, PostgreSQL ở mức intermediate."},
+        "soft_skills": {"score": 60, "reason": "Có đề cập làm việc nhóm."},
+        "education": {"score": 70, "reason": "Cử nhân CNTT, GPA 3.2."},
+        "field_match": {"score": 80, "reason": "Định hướng backend rõ ràng."},
+    },
+    "bonus_scores": {
+        "portfolio": {"score": 50, "reason": "Có link GitHub."},
+        "certificates": {"score": 35, "reason": "Không có chứng chỉ, điểm trung lập."},
+        "awards": {"score": 35, "reason": "Không có giải thưởng, điểm trung lập."},
+        "scholarships": {"score": 35, "reason": "Không có học bổng, điểm trung lập."},
+        "side_projects": {"score": 55, "reason": "Có một dự án cá nhân."},
+        "community": {"score": 35, "reason": "Không có hoạt động cộng đồng, điểm trung lập."},
+    },
+    "credibility_issues": [],
+    "strengths": ["Kinh nghiệm backend thực tế.", "Kỹ năng Python tốt."],
+    "weaknesses": ["Thiếu số liệu impact.", "Kỹ năng mềm mô tả sơ sài."],
+    "suggestions": ["Bổ sung kết quả định lượng.", "Thêm chứng chỉ cloud."],
+}
+
+
+def build_app(latency_ms: float = 500.0) -> FastAPI:
+    app = FastAPI()
+    app.state.latency_ms = latency_ms
+    app.state.calls = 0
+    app.state.caches = {}
+
+    def _payload(cached: bool) -> dict:
+        usage = {"promptTokenCount": 1200, "candidatesTokenCount": 600, "totalTokenCount": 1800}
+        if cached:
+            usage["cachedContentTokenCount"] = 900
+        return {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": json.dumps(SAMPLE_ANALYSIS, ensure_ascii=False)}]},
+                "finishReason": "STOP",
+            }],
+            "usageMetadata": usage,
+        }
+
+    def _cache_resource(name: str, ttl: str) -> dict:
+        expire_time = datetime.now(timezone.utc) + timedelta(seconds=float(ttl.rstrip("s")))
+        app.state.caches[name] = expire_time
+        return {"name": name, "expireTime": expire_time.isoformat().replace("+00:00", "Z")}
+
+    @app.post("/{api_version}/cachedContents")
+    async def create_cache(api_version: str, request: Request):
+        body = await request.json()
+        return _cache_resource(f"cachedContents/{uuid.uuid4().hex[:12]}", body.get("ttl", "3600s"))
+
+    @app.patch("/{api_version}/cachedContents/{cache_id}")
+    async def update_cache(api_version: str, cache_id: str, request: Request):
+        body = await request.json()
+        return _cache_resource(f"cachedContents/{cache_id}", body.get("ttl", "3600s"))
+
+    @app.post("/{api_version}/models/{model_action}")
+    async def generate(api_version: str, model_action: str, request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        await asyncio.sleep(app.state.latency_ms / 1000)
+        return _payload(cached=bool(body.get("cachedContent")))
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeGeminiServer:
+    """Runs the fake API with uvicorn in a background thread."""
+
+    def __init__(self, latency_ms: float = 500.0, port: int = 0):
+        self.app = build_app(latency_ms)
+        self.port = port or _free_port()
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "FakeGeminiServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a fake Gemini API server")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    args = parser.parse_args()
+    uvicorn.run(build_app(args.latency_ms), host="127.0.0.1", port=args.port, log_level="info")
@@ -8,12 +8,138 @@ load_dotenv()
 class Config:
     GEMINI_API_KEY: Optional[str] = os.getenv("GEMINI_API_KEY")
     RATE_LIMIT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "10"))
+    # memory: mỗi process một bucket | redis: dùng chung giữa các worker/replica (cần REDIS_URL)
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    REDIS_URL: Optional[str] = os.getenv("REDIS_URL")
+    # API key hợp lệ (phân tách bằng dấu phẩy), gửi qua header X-API-Key
+    API_KEYS: set = {key.strip() for key in os.getenv("API_KEYS", "").split(",") if key.strip()}
+    API_KEY_RATE_LIMIT_PER_MINUTE: int = int(os.getenv("API_KEY_RATE_LIMIT_PER_MINUTE", "60"))
+    # Quota token LLM mỗi giờ (theo TokenUsage.total_tokens), 0 = không giới hạn
+    TOKEN_QUOTA_PER_HOUR: int = int(os.getenv("TOKEN_QUOTA_PER_HOUR", "0"))
+    API_KEY_TOKEN_QUOTA_PER_HOUR: int = int(os.getenv("API_KEY_TOKEN_QUOTA_PER_HOUR", "0"))
     ALLOWED_EXTENSIONS: set = {".pdf", ".docx"}
     PORT: int = int(os.getenv("PORT", "3001"))
+    # Số uvicorn worker của server.py, 0 = theo số CPU
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "0"))
+    # Thời gian tối đa chờ request/job đang chạy hoàn thành khi shutdown
+    SHUTDOWN_GRACE_SECONDS: float = float(os.getenv("SHUTDOWN_GRACE_SECONDS", "30"))
+    # Khởi tạo trước LLM client, extraction pool, regex trong lifespan
+    PREWARM_SERVICES: bool = os.getenv("PREWARM_SERVICES", "true").lower() == "true"
+    MAX_UPLOAD_SIZE_BYTES: int = int(float(os.getenv("MAX_UPLOAD_SIZE_MB", "10")) * 1024 * 1024)
+    MAX_BATCH_UPLOAD_SIZE_BYTES: int = int(float(os.getenv("MAX_BATCH_UPLOAD_SIZE_MB", "200")) * 1024 * 1024)
+    GEMINI_BASE_URL: Optional[str] = os.getenv("GEMINI_BASE_URL")
+    GEMINI_CONTEXT_CACHE_ENABLED: bool = os.getenv("GEMINI_CONTEXT_CACHE_ENABLED", "true").lower() == "true"
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS: int = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+    # structured: response_schema + parse thẳng vào Pydantic model | text: tách JSON bằng regex
+    GEMINI_RESPONSE_MODE: str = os.getenv("GEMINI_RESPONSE_MODE", "structured").lower()
+    GEMINI_REPAIR_ATTEMPTS: int = int(os.getenv("GEMINI_REPAIR_ATTEMPTS", "1"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+    # Hàng đợi ưu tiên trước LLM_MAX_CONCURRENCY slot LLM: interactive (upload/rank) > batch > backfill (job).
+    # Hàng đợi đầy hoặc chờ quá thời gian tối đa của lớp -> 503 + Retry-After
+    LLM_QUEUE_MAX: int = int(os.getenv("LLM_QUEUE_MAX", "256"))
+    LLM_QUEUE_WAIT_INTERACTIVE_SECONDS: float = float(os.getenv("LLM_QUEUE_WAIT_INTERACTIVE_SECONDS", "15"))
+    LLM_QUEUE_WAIT_BATCH_SECONDS: float = float(os.getenv("LLM_QUEUE_WAIT_BATCH_SECONDS", "120"))
+    LLM_QUEUE_WAIT_BACKFILL_SECONDS: float = float(os.getenv("LLM_QUEUE_WAIT_BACKFILL_SECONDS", "600"))
+    # Chu kỳ kiểm tra client đã ngắt kết nối khi đang chờ kết quả phân tích
+    CLIENT_DISCONNECT_POLL_SECONDS: float = float(os.getenv("CLIENT_DISCONNECT_POLL_SECONDS", "0.5"))
+    # Danh sách backend `type:model[@base_url]` theo thứ tự ưu tiên, rỗng = gemini mặc định.
+    # type: gemini | fake (giả lập local, dùng cho test/benchmark)
+    LLM_BACKENDS: str = os.getenv("LLM_BACKENDS", "")
+    LLM_DEADLINE_SECONDS: float = float(os.getenv("LLM_DEADLINE_SECONDS", "60"))
+    LLM_ATTEMPT_TIMEOUT_SECONDS: float = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "30"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_RETRY_BACKOFF_SECONDS: float = float(os.getenv("LLM_RETRY_BACKOFF_SECONDS", "0.5"))
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1"))
+    # Tỉ lệ tối đa request được hedge
+    LLM_HEDGE_MAX_RATIO: float = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))
+    LLM_BREAKER_FAILURES: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    LLM_BREAKER_RESET_SECONDS: float = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+    FAKE_LLM_LATENCY_MS: float = float(os.getenv("FAKE_LLM_LATENCY_MS", "500"))
+    FAKE_LLM_SLOW_RATE: float = float(os.getenv("FAKE_LLM_SLOW_RATE", "0"))
+    FAKE_LLM_SLOW_MS: float = float(os.getenv("FAKE_LLM_SLOW_MS", "5000"))
+    FAKE_LLM_ERROR_RATE: float = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+    # Seed cho latency/lỗi giả lập, để trống = ngẫu nhiên
+    FAKE_LLM_SEED: Optional[int] = int(os.environ["FAKE_LLM_SEED"]) if os.getenv("FAKE_LLM_SEED") else None
+    PROMPT_COMPACTION_ENABLED: bool = os.getenv("PROMPT_COMPACTION_ENABLED", "true").lower() == "true"
+    # Giới hạn token (ước lượng) của cv_text trong prompt, 0 = không giới hạn
+    PROMPT_MAX_CV_TOKENS: int = int(os.getenv("PROMPT_MAX_CV_TOKENS", "6000"))
+    # process | thread | inline
+    EXTRACTION_EXECUTOR: str = os.getenv("EXTRACTION_EXECUTOR", "process").lower()
+    EXTRACTION_WORKERS: int = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+    EXTRACTION_TIMEOUT_SECONDS: float = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "30"))
+    EXTRACTION_MAX_JOBS_PER_WORKER: int = int(os.getenv("EXTRACTION_MAX_JOBS_PER_WORKER", "50"))
+    # Budget trích xuất: dừng đọc PDF/DOCX khi đủ số ký tự / số trang, 0 = không giới hạn.
+    # Mặc định ~15k token, đủ rộng để compaction vẫn chọn lọc được theo PROMPT_MAX_CV_TOKENS
+    EXTRACTION_MAX_CHARS: int = int(os.getenv("EXTRACTION_MAX_CHARS", "60000"))
+    EXTRACTION_MAX_PAGES: int = int(os.getenv("EXTRACTION_MAX_PAGES", "20"))
+    # Đọc DOCX bằng cách stream-parse XML (lxml), python-docx chỉ dùng khi fast path lỗi
+    DOCX_FAST_PATH: bool = os.getenv("DOCX_FAST_PATH", "true").lower() == "true"
+    # OCR (Tesseract qua PyMuPDF) cho trang PDF không có text layer, cần cài tesseract-ocr
+    OCR_ENABLED: bool = os.getenv("OCR_ENABLED", "false").lower() == "true"
+    OCR_LANGUAGES: str = os.getenv("OCR_LANGUAGES", "vie+eng")
+    OCR_DPI: int = int(os.getenv("OCR_DPI", "200"))
+    # Pool riêng cho OCR (process | thread | inline), số trang OCR đồng thời = OCR_WORKERS
+    OCR_EXECUTOR: str = os.getenv("OCR_EXECUTOR", "process").lower()
+    OCR_WORKERS: int = int(os.getenv("OCR_WORKERS", "1"))
+    OCR_PAGE_TIMEOUT_SECONDS: float = float(os.getenv("OCR_PAGE_TIMEOUT_SECONDS", "20"))
+    # Số trang tối đa được OCR trong một file
+    OCR_MAX_PAGES: int = int(os.getenv("OCR_MAX_PAGES", "5"))
+    # Thư mục tessdata, để trống = tự tìm (TESSDATA_PREFIX hoặc bản cài tesseract)
+    OCR_TESSDATA: str = os.getenv("OCR_TESSDATA", "")
+    # Trả lại kết quả của CV đã chấm khi CV mới gần trùng (SimHash 64-bit, khoảng cách Hamming 0-8)
+    NEAR_DUPLICATE_ENABLED: bool = os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() == "true"
+    NEAR_DUPLICATE_MAX_DISTANCE: int = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "6"))
+    NEAR_DUPLICATE_PATH: str = os.getenv("NEAR_DUPLICATE_PATH", "cv_near_duplicates.sqlite3")
+    # Entry (kết quả chấm, không kèm thông tin liên hệ, tách theo client) bị xóa sau N ngày hoặc khi
+    # vượt số entry tối đa (cũ nhất trước), 0 = không giới hạn
+    NEAR_DUPLICATE_TTL_DAYS: float = float(os.getenv("NEAR_DUPLICATE_TTL_DAYS", "30"))
+    NEAR_DUPLICATE_MAX_ENTRIES: int = int(os.getenv("NEAR_DUPLICATE_MAX_ENTRIES", "100000"))
+    # Index BM25 cho /rank (xếp hạng theo job description). Chỉ CV gửi qua /rank/index được lưu
+    # (cv_text + kết quả chấm, tách theo client), nên mặc định tắt
+    RANKING_ENABLED: bool = os.getenv("RANKING_ENABLED", "false").lower() == "true"
+    RANKING_INDEX_PATH: str = os.getenv("RANKING_INDEX_PATH", "cv_rank_index.sqlite3")
+    # Ghi snapshot index (.npz) sau mỗi N CV mới để restart không phải tokenize lại
+    RANKING_SNAPSHOT_EVERY: int = int(os.getenv("RANKING_SNAPSHOT_EVERY", "10000"))
+    # Thêm thời gian từng stage (ms) vào Metadata.stages_ms
+    METADATA_STAGE_TIMINGS: bool = os.getenv("METADATA_STAGE_TIMINGS", "true").lower() == "true"
+    # memory | sqlite | none
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory").lower()
+    CACHE_TTL_SECONDS: float = float(os.getenv("CACHE_TTL_SECONDS", "86400"))
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+    CACHE_MAX_BYTES: int = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    CACHE_SQLITE_PATH: str = os.getenv("CACHE_SQLITE_PATH", "cv_cache.sqlite3")
+    # Gộp các request phân tích cùng một file đang chạy đồng thời.
+    # memory: gộp trong một process | redis: thêm lock dùng chung giữa các worker/replica (cần REDIS_URL) | none: tắt
+    SINGLEFLIGHT_BACKEND: str = os.getenv("SINGLEFLIGHT_BACKEND", "memory").lower()
+    # Thời gian giữ lock tối đa, worker khác chờ không quá mức này
+    SINGLEFLIGHT_LOCK_TTL_SECONDS: float = float(os.getenv("SINGLEFLIGHT_LOCK_TTL_SECONDS", "120"))
+    SINGLEFLIGHT_POLL_SECONDS: float = float(os.getenv("SINGLEFLIGHT_POLL_SECONDS", "0.2"))
+    BATCH_MAX_CONCURRENCY: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+    BATCH_MAX_FILES: int = int(os.getenv("BATCH_MAX_FILES", "200"))
+    # Tổng dung lượng sau giải nén của các file trong ZIP của một batch (chống zip bomb)
+    BATCH_MAX_UNCOMPRESSED_BYTES: int = int(float(os.getenv("BATCH_MAX_UNCOMPRESSED_MB", "500")) * 1024 * 1024)
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_STORE_PATH: str = os.getenv("JOB_STORE_PATH", "cv_jobs.sqlite3")
+    JOB_CALLBACK_TIMEOUT_SECONDS: float = float(os.getenv("JOB_CALLBACK_TIMEOUT_SECONDS", "10"))
+    JOB_CALLBACK_RETRIES: int = int(os.getenv("JOB_CALLBACK_RETRIES", "3"))
+    # Host được nhận callback (phân tách bằng dấu phẩy, ".example.com" = mọi subdomain). Để trống thì
+    # chấp nhận mọi host resolve ra địa chỉ public, chặn loopback/private/link-local (SSRF)
+    JOB_CALLBACK_ALLOWED_HOSTS: set = {
+        host.strip().lower() for host in os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "").split(",") if host.strip()
+    }
+    # Lease của job đang chạy (gia hạn định kỳ); process chết thì job được worker khác nhận lại sau khi hết hạn
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+    # Job bị scheduler LLM từ chối (503) được thử lại có giới hạn, sau đó trả về hàng đợi
+    JOB_OVERLOAD_RETRIES: int = int(os.getenv("JOB_OVERLOAD_RETRIES", "5"))
+    JOB_OVERLOAD_MAX_WAIT_SECONDS: float = float(os.getenv("JOB_OVERLOAD_MAX_WAIT_SECONDS", "300"))
     
     @classmethod
     def validate(cls) -> None:
-        if not cls.GEMINI_API_KEY:
+        uses_gemini = not cls.LLM_BACKENDS.strip() or any(
+            item.strip().lower().startswith("gemini") for item in cls.LLM_BACKENDS.split(",")
+        )
+        if uses_gemini and not cls.GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY is required")
 
 
@@ -1,18 +1,37 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi import Depends, FastAPI, UploadFile, File, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-import os
+from typing import Any, AsyncIterator, List, Optional, Tuple
+import asyncio
+import json
+import logging
 import time
 
 from config import config
-from models.schemas import CVAnalysisResponse, CVAnalysisData, Metadata, TokenUsage
-from services.extraction import extract_text
-from services.llm_service import get_llm_service
+from services.batch import BatchItem, expand_zip, index_batch_items, stream_batch_results, too_many_files_error
+from models.schemas import CVAnalysisResponse, JobSubmitResponse, JobStatusResponse, RankIndexResponse, RankRequest, RankResponse, StreamError
+from services.extraction_pool import shutdown_extraction_executor
+from services.jobs import get_job_manager, shutdown_job_manager, validate_callback_url
+from services.metrics import METRICS_CONTENT_TYPE, MetricsMiddleware, render_metrics, stage, start_stage_timings
+from services.ocr import shutdown_ocr_service
+from services.pipeline import analyze_cv_file, analyze_cv_file_stream, validate_filename
+from services.ranking import rank_cvs, shutdown_ranking_index
+from services.rate_limit import charge_token_usage, rate_limit
+from services.serialization import (
+    COMPACT_JOB_EXCLUDE,
+    COMPACT_RANK_EXCLUDE,
+    ModelResponse,
+    compact_scores,
+    dump_response,
+    response_exclude,
+    sse_event,
+)
+from services.upload import RequestSizeLimitMiddleware, cancel_on_disconnect, read_upload
+from services.warmup import prewarm_services
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
@@ -21,7 +40,16 @@ async def lifespan(app: FastAPI):
         config.validate()
     except ValueError as e:
         print(f"Warning: {str(e)}")
+    if config.PREWARM_SERVICES:
+        timings = await prewarm_services()
+        logger.info(f"Services prewarmed: {timings}")
+    await get_job_manager().start()
     yield
+    # uvicorn đã ngừng nhận request mới; cho job đang chạy thời gian hoàn thành
+    await shutdown_job_manager(drain_timeout=config.SHUTDOWN_GRACE_SECONDS)
+    shutdown_extraction_executor()
+    shutdown_ocr_service()
+    shutdown_ranking_index()
 
 
 app = FastAPI(
@@ -38,75 +66,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+app.add_middleware(MetricsMiddleware)
+
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    max_bytes=config.MAX_UPLOAD_SIZE_BYTES,
+    path_limits={
+        "/upload-cv/batch": config.MAX_BATCH_UPLOAD_SIZE_BYTES,
+        "/rank/index": config.MAX_BATCH_UPLOAD_SIZE_BYTES,
+    },
+)
 
 @app.post(
     "/upload-cv",
     tags=["CV Analysis"],
     summary="Upload and analyze CV",
+    response_model=CVAnalysisResponse,
 )
-@limiter.limit(f"{config.RATE_LIMIT_PER_MINUTE}/minute")
 async def upload_cv(
-    request: Request,
-    file: UploadFile = File(..., description="CV file to analyze (PDF or DOCX format)")
+    http_request: Request,
+    file: UploadFile = File(..., description="CV file to analyze (PDF or DOCX format)"),
+    force_rescore: bool = Form(False, description="Ignore stored results (exact and near-duplicate) and always call the LLM"),
+    compact: bool = Query(False, description="Omit the reason of every score"),
+    client_id: str = Depends(rate_limit),
 ):
     start_time = time.time()
     upload_time = datetime.now(timezone.utc).isoformat()
+    timings = start_stage_timings()
     
     try:
         filename = file.filename or ""
-        file_ext = os.path.splitext(filename)[1].lower()
-        
-        if file_ext not in config.ALLOWED_EXTENSIONS:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported file format. Allowed formats: {', '.join(config.ALLOWED_EXTENSIONS)}"
-            )
-        
-        file_content = await file.read()
-        file_size = len(file_content)
-        
-        if file_size > 10 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File size exceeds maximum allowed size of 10MB"
-            )
-        
-        cv_text = await extract_text(file_content, filename)
+        validate_filename(filename)
         
-        if not cv_text or len(cv_text.strip()) < 50:
-            raise HTTPException(
-                status_code=400,
-                detail="CV text is too short or empty. Please ensure the file contains readable text."
-            )
-        
-        llm_service = get_llm_service()
-        analysis_result = await llm_service.analyze_cv(cv_text)
-        
-        processing_time_ms = int((time.time() - start_time) * 1000)
-        
-        token_usage_data = analysis_result.pop("_token_usage", None)
-        token_usage = None
-        if token_usage_data:
-            token_usage = TokenUsage(**token_usage_data)
-        
-        try:
-            data = CVAnalysisData(**analysis_result)
-            metadata = Metadata(
-                filename=filename,
-                upload_time=upload_time,
-                processing_time_ms=processing_time_ms,
-                token_usage=token_usage
-            )
-            response = CVAnalysisResponse(status="success", data=data, metadata=metadata)
-            return response
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Invalid response format from LLM: {str(e)}"
-            )
+        with stage("upload"):
+            file_content = await read_upload(file)
+        response = await cancel_on_disconnect(http_request, analyze_cv_file(
+            file_content, filename, upload_time=upload_time, start_time=start_time, timings=timings,
+            force_rescore=force_rescore, client_id=client_id,
+        ))
+        await charge_token_usage(client_id, response)
+        # Response đã được validate khi tạo, serialize thẳng thay vì để FastAPI validate lại
+        return ModelResponse(response, exclude=response_exclude(compact))
     
     except HTTPException:
         raise
@@ -117,7 +117,220 @@ async def upload_cv(
         )
 
 
+async def stream_analysis_events(
+    first: Tuple[str, Any],
+    events: AsyncIterator[Tuple[str, Any]],
+    client_id: Optional[str] = None,
+    compact: bool = False,
+) -> AsyncIterator[str]:
+    """Format các event của analyze_cv_file_stream thành Server-Sent Events.
+
+    Lỗi sau khi stream đã bắt đầu được gửi thành event `error` (StreamError)."""
+    try:
+        event = first
+        while True:
+            name, value = event
+            if name == "result":
+                await charge_token_usage(client_id, value)
+                yield sse_event(name, dump_response(value, compact))
+            else:
+                if compact and name in ("core_scores", "bonus_scores"):
+                    value = compact_scores(value)
+                yield sse_event(name, json.dumps(value, ensure_ascii=False))
+            try:
+                event = await events.__anext__()
+            except StopAsyncIteration:
+                break
+    except HTTPException as e:
+        yield sse_event("error", StreamError(status_code=e.status_code, detail=str(e.detail)).model_dump_json())
+    except Exception as e:
+        yield sse_event("error", StreamError(status_code=500, detail=f"Internal server error: {str(e)}").model_dump_json())
+    finally:
+        # Client ngắt kết nối: dừng luôn lời gọi LLM đang stream
+        await events.aclose()
+
+
+@app.post(
+    "/upload-cv/stream",
+    tags=["CV Analysis"],
+    summary="Upload and analyze CV, streaming partial results",
+    response_description=(
+        "Server-sent events: `info` (contact info extracted locally), then `level`, `field`, `core_scores`, "
+        "`bonus_scores`, `credibility_issues`, `strengths`, `weaknesses`, `suggestions` as the LLM finishes "
+        "each one, `overall_score` (computed by the backend) and finally `result` (CVAnalysisResponse). "
+        "Failures after the stream started are sent as an `error` event."
+    ),
+)
+async def upload_cv_stream(
+    file: UploadFile = File(..., description="CV file to analyze (PDF or DOCX format)"),
+    force_rescore: bool = Form(False, description="Ignore stored results (exact and near-duplicate) and always call the LLM"),
+    compact: bool = Query(False, description="Omit the reason of every score"),
+    client_id: str = Depends(rate_limit),
+):
+    start_time = time.time()
+    upload_time = datetime.now(timezone.utc).isoformat()
+    timings = start_stage_timings()
+
+    filename = file.filename or ""
+    validate_filename(filename)
+
+    with stage("upload"):
+        file_content = await read_upload(file)
+    events = analyze_cv_file_stream(
+        file_content, filename, upload_time=upload_time, start_time=start_time, timings=timings,
+        force_rescore=force_rescore, client_id=client_id,
+    )
+    # Chạy tới event đầu tiên (sau bước trích xuất text) để lỗi file vẫn trả về đúng status code
+    try:
+        first = await events.__anext__()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+    return StreamingResponse(
+        stream_analysis_events(first, events, client_id, compact),
+        media_type="text/event-stream",
+        # Tắt buffer của proxy (nginx) để event tới client ngay
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def read_batch_items(files: List[UploadFile]) -> List[BatchItem]:
+    """Đọc các file upload (PDF, DOCX hoặc ZIP chứa CV) thành danh sách BatchItem."""
+    items = []
+    uncompressed_left = config.BATCH_MAX_UNCOMPRESSED_BYTES
+    for file in files:
+        filename = file.filename or ""
+        archive = None
+        try:
+            if filename.lower().endswith(".zip"):
+                archive = await read_upload(file, config.MAX_BATCH_UPLOAD_SIZE_BYTES)
+            else:
+                items.append((filename, await read_upload(file), None))
+        except HTTPException as e:
+            items.append((filename, None, e))
+
+        if archive is not None:
+            # Giới hạn số file và dung lượng giải nén tính cho cả batch, kiểm tra trước khi đọc từng entry.
+            # Giải nén trong thread để không chặn event loop (request khác, /health, SSE)
+            entries = await asyncio.to_thread(
+                expand_zip, archive, filename, config.BATCH_MAX_FILES - len(items), uncompressed_left
+            )
+            uncompressed_left -= sum(len(content) for _, content, _ in entries if content is not None)
+            items.extend(entries)
+
+        if len(items) > config.BATCH_MAX_FILES:
+            raise too_many_files_error()
+    
+    if not items:
+        raise HTTPException(
+            status_code=400,
+            detail="No PDF or DOCX files found in the batch."
+        )
+    return items
+
+
+@app.post(
+    "/upload-cv/batch",
+    tags=["CV Analysis"],
+    summary="Upload and analyze many CVs",
+    response_description="NDJSON stream: one CVAnalysisResponse (or error item) per CV, in completion order",
+)
+async def upload_cv_batch(
+    files: List[UploadFile] = File(..., description="CV files (PDF or DOCX) and/or ZIP archives of CVs"),
+    compact: bool = Query(False, description="Omit the reason of every score"),
+    client_id: str = Depends(rate_limit),
+):
+    items = await read_batch_items(files)
+    return StreamingResponse(stream_batch_results(items, client_id, compact), media_type="application/x-ndjson")
+
+
+@app.post(
+    "/jobs",
+    tags=["Jobs"],
+    summary="Submit a CV for asynchronous analysis",
+    status_code=202,
+    response_model=JobSubmitResponse,
+)
+async def submit_job(
+    file: UploadFile = File(..., description="CV file to analyze (PDF or DOCX format)"),
+    callback_url: Optional[str] = Form(None, description="URL that receives the CVAnalysisResponse via POST when the job finishes"),
+    client_id: str = Depends(rate_limit),
+):
+    filename = file.filename or ""
+    validate_filename(filename)
+    
+    if callback_url:
+        await validate_callback_url(callback_url)
+    
+    file_content = await read_upload(file)
+    job_id = get_job_manager().submit(file_content, filename, callback_url, client_id)
+    return JobSubmitResponse(job_id=job_id, status="queued")
+
+
+@app.get(
+    "/jobs/{job_id}",
+    tags=["Jobs"],
+    summary="Get job status and result",
+    response_model=JobStatusResponse,
+)
+async def get_job(
+    job_id: str,
+    compact: bool = Query(False, description="Omit the reason of every score in the result"),
+):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return ModelResponse(job, exclude=COMPACT_JOB_EXCLUDE if compact else None)
+
+
+@app.post(
+    "/rank",
+    tags=["Ranking"],
+    summary="Rank indexed CVs against a job description",
+    response_model=RankResponse,
+)
+async def rank(
+    request: RankRequest,
+    http_request: Request,
+    compact: bool = Query(False, description="Omit the reason of every score"),
+    client_id: str = Depends(rate_limit),
+):
+    response = await cancel_on_disconnect(http_request, rank_cvs(request.job_description, request.top_k, request.shortlist, client_id))
+    await charge_token_usage(client_id, response)
+    return ModelResponse(response, exclude=COMPACT_RANK_EXCLUDE if compact else None)
+
+
+@app.post(
+    "/rank/index",
+    tags=["Ranking"],
+    summary="Add CVs to the ranking index without scoring them",
+    response_model=RankIndexResponse,
+)
+async def rank_index(
+    files: List[UploadFile] = File(..., description="CV files (PDF or DOCX) and/or ZIP archives of CVs"),
+    client_id: str = Depends(rate_limit),
+):
+    items = await read_batch_items(files)
+    return ModelResponse(await index_batch_items(items, client_id))
+
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    # Lifespan (prewarm) chạy xong trước khi server nhận request, nên trả 200 nghĩa là đã sẵn sàng
+    return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
+    # Chế độ dev (auto reload). Production: python server.py
     import uvicorn
     uvicorn.run(
         "main:app",
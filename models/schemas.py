@@ -35,6 +35,28 @@ class CVInfo(BaseModel):
     phone: str = Field(default="", description="Số điện thoại (để trống nếu không tìm thấy)")
     email: str = Field(default="", description="Email (để trống nếu không tìm thấy)")
     location: str = Field(default="", description="Địa chỉ/Thành phố (để trống nếu không tìm thấy)")
+    linkedin: str = Field(default="", description="URL LinkedIn (để trống nếu không tìm thấy)")
+    github: str = Field(default="", description="URL GitHub (để trống nếu không tìm thấy)")
+    birth_year: Optional[int] = Field(default=None, description="Năm sinh (null nếu không tìm thấy)")
+
+
+class LLMInfo(BaseModel):
+    """Information the LLM extracts (name/phone/email are extracted locally)"""
+    location: str = Field(..., description="Địa chỉ/Thành phố, để '' nếu không có")
+
+
+class LLMCVAnalysis(BaseModel):
+    """JSON returned by the LLM, used as Gemini response_schema (no default values allowed)"""
+    overall_score: int = Field(..., ge=0, le=100, description="Điểm tổng thể CV (0-100)")
+    level: str = Field(..., description="'intern', 'fresher', 'junior', 'mid' hoặc 'senior'")
+    field: str = Field(..., description="Lĩnh vực chuyên môn (tiếng Việt)")
+    info: LLMInfo = Field(..., description="Thông tin cơ bản")
+    core_scores: CoreScores = Field(..., description="Core Criteria (0-100)")
+    bonus_scores: BonusScores = Field(..., description="Bonus Criteria (0-100, không có → 30-40 điểm)")
+    credibility_issues: List[str] = Field(..., description="Vấn đề độ tin cậy, không có → []")
+    strengths: List[str] = Field(..., description="3-5 điểm mạnh (tiếng Việt)")
+    weaknesses: List[str] = Field(..., description="3-5 điểm yếu (tiếng Việt)")
+    suggestions: List[str] = Field(..., description="3-5 gợi ý cải thiện (tiếng Việt)")
 
 
 class CVAnalysisData(BaseModel):
@@ -54,8 +76,44 @@ class CVAnalysisData(BaseModel):
 class TokenUsage(BaseModel):
     """Token usage information"""
     prompt_tokens: int = Field(..., description="Number of tokens in the prompt")
+    cached_prompt_tokens: int = Field(0, description="Prompt tokens served from Gemini context cache")
+    fresh_prompt_tokens: Optional[int] = Field(None, description="Prompt tokens not served from cache")
     completion_tokens: int = Field(..., description="Number of tokens in the completion")
     total_tokens: int = Field(..., description="Total tokens used")
+    prompt_tokens_saved: Optional[int] = Field(None, description="Estimated prompt tokens removed by CV text compaction")
+
+
+class CacheStatus(BaseModel):
+    """Cache hit/miss information for a request"""
+    text: str = Field("miss", description="Extracted text cache: 'hit', 'miss' or 'disabled'")
+    analysis: str = Field("miss", description="Analysis result cache: 'hit', 'miss', 'disabled', or 'coalesced' when shared with an identical request in flight")
+    saved_tokens: int = Field(0, description="LLM tokens saved by serving the analysis from cache or an identical in-flight request")
+
+
+class NearDuplicateInfo(BaseModel):
+    """Set when the result was reused from a previously scored, almost identical CV"""
+    distance: int = Field(..., description="Hamming distance between the 64-bit SimHash fingerprints")
+    similarity: float = Field(..., description="1 - distance / 64")
+    filename: str = Field(..., description="Filename of the CV the result was scored for")
+    scored_at: str = Field(..., description="When that CV was scored, ISO format")
+
+
+class ExtractionInfo(BaseModel):
+    """How much of the uploaded file was read"""
+    source: str = Field(..., description="'pdf' or 'docx'")
+    pages_total: Optional[int] = Field(None, description="Number of pages in the PDF (None for DOCX)")
+    pages_read: Optional[int] = Field(None, description="Pages visited before the extraction budget was reached")
+    pages_skipped: Optional[int] = Field(None, description="Visited pages without text (image-only or blank)")
+    pages_ocr: Optional[int] = Field(None, description="Image-only pages whose text came from OCR")
+    chars: int = Field(..., description="Characters of extracted text")
+    truncated: bool = Field(False, description="True if extraction stopped at EXTRACTION_MAX_CHARS / EXTRACTION_MAX_PAGES")
+
+
+class LLMParseInfo(BaseModel):
+    """How the LLM response was parsed"""
+    mode: str = Field(..., description="'structured' (response_schema) or 'text' (regex JSON extraction)")
+    parse_time_ms: float = Field(..., description="Time spent parsing and validating the LLM output")
+    repair_attempts: int = Field(0, description="Number of partial-repair requests sent for invalid fields")
 
 
 class Metadata(BaseModel):
@@ -64,10 +122,89 @@ class Metadata(BaseModel):
     upload_time: str = Field(..., description="Upload timestamp in ISO format")
     processing_time_ms: int = Field(..., description="Processing time in milliseconds")
     token_usage: Optional[TokenUsage] = Field(None, description="Token usage information from LLM")
+    cache: Optional[CacheStatus] = Field(None, description="Cache hit/miss information")
+    llm_parse: Optional[LLMParseInfo] = Field(None, description="LLM response parsing information")
+    extraction: Optional[ExtractionInfo] = Field(None, description="Page and character counts of the extracted text")
+    near_duplicate: Optional[NearDuplicateInfo] = Field(None, description="Present when the analysis was reused from a near-duplicate CV (use force_rescore to re-score)")
+    stages_ms: Optional[Dict[str, float]] = Field(None, description="Per-stage processing time in milliseconds (upload, extraction, extract_info, llm, scoring; llm_queue is the part of llm spent waiting for an LLM slot)")
 
 
 class CVAnalysisResponse(BaseModel):
     """Response model for CV analysis"""
     status: str = Field(..., description="Status of the response")
     data: CVAnalysisData = Field(..., description="CV analysis data")
-    metadata: Metadata = Field(..., description="Metadata for benchmarking and tracking")
\ No newline at end of file
+    metadata: Metadata = Field(..., description="Metadata for benchmarking and tracking")
+
+class BatchItemError(BaseModel):
+    """Per-item error in a batch response"""
+    status: str = Field("error", description="Always 'error'")
+    index: int = Field(..., description="Position of the item in the batch")
+    filename: str = Field(..., description="Filename of the failed item")
+    status_code: int = Field(..., description="HTTP status code the single-file endpoint would return")
+    detail: str = Field(..., description="Error message")
+
+
+class StreamError(BaseModel):
+    """`error` event of /upload-cv/stream, sent when analysis fails after the stream started"""
+    status: str = Field("error", description="Always 'error'")
+    status_code: int = Field(..., description="HTTP status code /upload-cv would return")
+    detail: str = Field(..., description="Error message")
+
+
+class JobSubmitResponse(BaseModel):
+    """Response returned when a job is submitted"""
+    job_id: str = Field(..., description="Job identifier")
+    status: str = Field(..., description="Job status: 'queued', 'running', 'succeeded' or 'failed'")
+
+
+class JobStatusResponse(BaseModel):
+    """Status and result of an analysis job"""
+    job_id: str = Field(..., description="Job identifier")
+    status: str = Field(..., description="Job status: 'queued', 'running', 'succeeded' or 'failed'")
+    filename: str = Field(..., description="Original filename of uploaded CV")
+    created_at: str = Field(..., description="Submission timestamp in ISO format")
+    updated_at: str = Field(..., description="Last status change timestamp in ISO format")
+    result: Optional[CVAnalysisResponse] = Field(None, description="Analysis result when the job succeeded")
+    error: Optional[str] = Field(None, description="Error message when the job failed")
+    error_status_code: Optional[int] = Field(None, description="HTTP status code the synchronous endpoint would return")
+
+
+class RankRequest(BaseModel):
+    """Job description to rank the indexed CVs against"""
+    job_description: str = Field(..., min_length=1, description="Job description text")
+    top_k: int = Field(20, ge=1, le=500, description="Number of CVs to return")
+    shortlist: int = Field(10, ge=0, le=50, description="Top results that get a full analysis; CVs without a stored analysis are scored by the LLM")
+
+
+class RankedCV(BaseModel):
+    """A CV in a ranking result"""
+    rank: int = Field(..., description="Position in the result, starting at 1")
+    cv_id: int = Field(..., description="Identifier of the CV in the ranking index")
+    filename: str = Field(..., description="Filename the CV was indexed with")
+    relevance: float = Field(..., description="BM25 score of the CV text against the job description")
+    indexed_at: str = Field(..., description="When the CV was added to the index, ISO format")
+    analysis: Optional[CVAnalysisData] = Field(None, description="Full analysis, present for the shortlist and for CVs scored before")
+    rescored: bool = Field(False, description="True if the analysis was produced by this request")
+    error: Optional[str] = Field(None, description="Why a shortlisted CV could not be scored")
+
+
+class RankResponse(BaseModel):
+    """Top-K CVs for a job description"""
+    results: List[RankedCV] = Field(..., description="CVs ordered by relevance")
+    indexed: int = Field(..., description="Number of CVs the caller has in the ranking index")
+    search_time_ms: float = Field(..., description="Time spent in the BM25 search")
+    processing_time_ms: int = Field(..., description="Total processing time including shortlist scoring")
+    token_usage: Optional[TokenUsage] = Field(None, description="LLM tokens spent scoring the shortlist")
+
+
+class IndexedCV(BaseModel):
+    """A CV added to the ranking index"""
+    cv_id: int = Field(..., description="Identifier of the CV in the ranking index")
+    filename: str = Field(..., description="Filename of the CV")
+
+
+class RankIndexResponse(BaseModel):
+    """Result of adding CVs to the ranking index"""
+    indexed: List[IndexedCV] = Field(..., description="CVs added (or already present) in the index")
+    errors: List[BatchItemError] = Field(default_factory=list, description="Files that could not be indexed")
+    total: int = Field(..., description="Number of CVs the caller has in the ranking index")
@@ -0,0 +1,43 @@
+"""Entry point production: nhiều uvicorn worker, không auto reload.
+
+    python server.py
+
+Số worker lấy từ WEB_CONCURRENCY (mặc định = số CPU). Mỗi worker chạy lifespan riêng
+(prewarm LLM client, extraction pool, regex) trước khi nhận traffic. Khi nhận SIGTERM,
+uvicorn ngừng nhận kết nối mới và chờ request đang chạy tối đa SHUTDOWN_GRACE_SECONDS.
+"""
+import os
+import tempfile
+
+import uvicorn
+
+from config import config
+
+
+def _worker_count() -> int:
+    return config.WEB_CONCURRENCY if config.WEB_CONCURRENCY > 0 else (os.cpu_count() or 1)
+
+
+def _prepare_worker_env(workers: int) -> None:
+    # Chia CPU cho extraction pool của các worker thay vì mỗi worker tạo min(4, cpu) process
+    os.environ.setdefault("EXTRACTION_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+    # Gom metrics Prometheus của các worker (xem services/metrics.py)
+    if workers > 1 and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="cv-metrics-")
+
+
+def main() -> None:
+    workers = _worker_count()
+    _prepare_worker_env(workers)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=config.PORT,
+        workers=workers,
+        timeout_graceful_shutdown=int(config.SHUTDOWN_GRACE_SECONDS),
+        log_level="info",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import asyncio
+import io
+import os
+import zipfile
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+
+from config import config
+from models.schemas import BatchItemError, IndexedCV, RankIndexResponse
+from services.pipeline import analyze_cv_file, load_cv_text, validate_file_size
+from services.ranking import CVRankingIndex, get_ranking_index
+from services.rate_limit import charge_token_usage
+from services.scheduler import PRIORITY_BATCH, set_llm_priority
+from services.serialization import dump_response
+
+# (filename, content, error) - error != None nếu item bị loại trước khi xử lý
+BatchItem = Tuple[str, Optional[bytes], Optional[HTTPException]]
+
+_batch_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_batch_semaphore() -> asyncio.Semaphore:
+    # Dùng chung cho mọi batch request trong process
+    global _batch_semaphore
+    if _batch_semaphore is None:
+        _batch_semaphore = asyncio.Semaphore(max(1, config.BATCH_MAX_CONCURRENCY))
+    return _batch_semaphore
+
+
+def too_many_files_error() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"Too many files in batch. Maximum allowed: {config.BATCH_MAX_FILES}"
+    )
+
+
+def _uncompressed_too_large_error() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Batch too large after decompression. Maximum allowed: {config.BATCH_MAX_UNCOMPRESSED_BYTES // (1024 * 1024)}MB"
+    )
+
+
+def _read_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+    # Không tin file_size trong header: đọc tối đa giới hạn + 1 byte
+    with archive.open(info) as member:
+        data = member.read(config.MAX_UPLOAD_SIZE_BYTES + 1)
+    validate_file_size(len(data))
+    return data
+
+
+def expand_zip(content: bytes, archive_name: str, max_files: int, max_bytes: int) -> List[BatchItem]:
+    """Giải nén các file CV trong ZIP thành BatchItem.
+
+    `max_files` và `max_bytes` là phần còn lại của giới hạn số file và tổng dung lượng giải nén
+    của cả batch; vượt giới hạn thì dừng ngay (HTTPException) trước khi đọc thêm entry nào.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(content))
+    except zipfile.BadZipFile:
+        return [(archive_name, None, HTTPException(status_code=400, detail="Invalid ZIP archive"))]
+
+    items: List[BatchItem] = []
+    with archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+                continue
+            if os.path.splitext(name)[1].lower() not in config.ALLOWED_EXTENSIONS:
+                continue
+            if len(items) >= max_files:
+                raise too_many_files_error()
+            if info.file_size > max_bytes:
+                raise _uncompressed_too_large_error()
+            try:
+                # Kiểm tra kích thước trước khi giải nén để tránh zip bomb
+                validate_file_size(info.file_size)
+                data = _read_member(archive, info)
+            except HTTPException as e:
+                items.append((name, None, e))
+                continue
+            except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+                items.append((name, None, HTTPException(status_code=400, detail=f"Error reading {name} from ZIP archive: {str(e)}")))
+                continue
+            # file_size trong header có thể khai sai, trừ theo số byte thực đọc
+            max_bytes -= len(data)
+            if max_bytes < 0:
+                raise _uncompressed_too_large_error()
+            items.append((name, data, None))
+    return items
+
+
+async def _process_item(index: int, item: BatchItem, client_id: Optional[str] = None, compact: bool = False) -> str:
+    filename, content, error = item
+    if error is None:
+        # Mỗi item chạy trong task riêng: chỉ các lời gọi LLM của batch nhường cho upload đơn lẻ
+        set_llm_priority(PRIORITY_BATCH)
+        async with _get_batch_semaphore():
+            try:
+                response = await analyze_cv_file(content, filename, client_id=client_id)
+                await charge_token_usage(client_id, response)
+                return dump_response(response, compact)
+            except HTTPException as e:
+                error = e
+            except Exception as e:
+                error = HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    return BatchItemError(
+        index=index,
+        filename=filename,
+        status_code=error.status_code,
+        detail=str(error.detail),
+    ).model_dump_json()
+
+
+async def stream_batch_results(
+    items: List[BatchItem], client_id: Optional[str] = None, compact: bool = False
+) -> AsyncIterator[str]:
+    """Chạy các item song song (giới hạn bởi BATCH_MAX_CONCURRENCY) và trả từng dòng
+    NDJSON theo thứ tự hoàn thành."""
+    tasks = [asyncio.create_task(_process_item(i, item, client_id, compact)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done + "\n"
+    finally:
+        # Client ngắt kết nối giữa chừng: hủy các item còn lại
+        for task in tasks:
+            task.cancel()
+
+
+async def _index_item(position: int, item: BatchItem, ranking_index: CVRankingIndex, client_id: str) -> Union[IndexedCV, BatchItemError]:
+    filename, content, error = item
+    if error is None:
+        async with _get_batch_semaphore():
+            try:
+                cv_text, _ = await load_cv_text(content, filename)
+                return IndexedCV(cv_id=ranking_index.add(cv_text, filename, client_id), filename=filename)
+            except HTTPException as e:
+                error = e
+            except Exception as e:
+                error = HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    return BatchItemError(
+        index=position,
+        filename=filename,
+        status_code=error.status_code,
+        detail=str(error.detail),
+    )
+
+
+async def index_batch_items(items: List[BatchItem], client_id: str) -> RankIndexResponse:
+    """Trích xuất text và thêm các CV vào ranking index của `client_id` (không gọi LLM)."""
+    ranking_index = get_ranking_index()
+    if ranking_index is None:
+        raise HTTPException(
+            status_code=503,
+            detail="CV ranking is disabled (RANKING_ENABLED=false)"
+        )
+
+    outcomes = await asyncio.gather(*(_index_item(i, item, ranking_index, client_id) for i, item in enumerate(items)))
+    # Tokenize ngay các CV vừa thêm để request /rank kế tiếp không phải chờ
+    await asyncio.to_thread(ranking_index.refresh)
+    return RankIndexResponse(
+        indexed=[outcome for outcome in outcomes if isinstance(outcome, IndexedCV)],
+        errors=[outcome for outcome in outcomes if isinstance(outcome, BatchItemError)],
+        total=ranking_index.count(client_id),
+    )
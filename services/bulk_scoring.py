@@ -0,0 +1,292 @@
+"""Tính lại overall_score hàng loạt bằng NumPy, không gọi LLM.
+
+Dùng khi thay đổi LEVEL_WEIGHTS / BONUS_CAP và cần chấm lại các kết quả đã lưu:
+
+    python -m services.bulk_scoring results.jsonl -o rescored.jsonl
+    python -m services.bulk_scoring results.jsonl -o rescored.jsonl --weights new_weights.json
+
+Mỗi dòng input là một CVAnalysisResponse (output của /upload-cv, /upload-cv/batch, /jobs)
+hoặc một CVAnalysisData. Dòng không có điểm (ví dụ item lỗi của batch) được giữ nguyên.
+Kết quả giống hệt calculate_overall_score (cùng thứ tự cộng dồn và cách làm tròn).
+"""
+import argparse
+import json
+import logging
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+import numpy as np
+
+from services.scoring import (
+    BONUS_CAP,
+    BONUS_KEY_ORDER,
+    CORE_KEY_ORDER,
+    LEVEL_WEIGHTS,
+    NEUTRAL_BONUS_SCORE,
+    _normalize_level,
+    apply_credibility_penalty,
+    calculate_overall_score,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+@dataclass
+class WeightTables:
+    """LEVEL_WEIGHTS / BONUS_CAP dạng ma trận, mỗi hàng là một level."""
+
+    levels: Tuple[str, ...]
+    core_weights: np.ndarray
+    total_core_weights: np.ndarray
+    bonus_caps: np.ndarray
+
+    def level_index(self, level: str) -> int:
+        norm_level = _normalize_level(level)
+        if norm_level not in self.levels:
+            norm_level = "junior"
+        return self.levels.index(norm_level)
+
+
+def build_weight_tables(
+    level_weights: Optional[Dict[str, Dict[str, float]]] = None,
+    bonus_cap: Optional[Dict[str, float]] = None,
+) -> WeightTables:
+    # Override chỉ cần chứa các level thay đổi
+    level_weights = {**LEVEL_WEIGHTS, **(level_weights or {})}
+    bonus_cap = {**BONUS_CAP, **(bonus_cap or {})}
+    levels = tuple(LEVEL_WEIGHTS)
+    core_weights = np.zeros((len(levels), len(CORE_KEY_ORDER)), dtype=np.float64)
+    total_core_weights = np.zeros(len(levels), dtype=np.float64)
+    bonus_caps = np.zeros(len(levels), dtype=np.float64)
+    for i, level in enumerate(levels):
+        weights = level_weights[level]
+        # Cộng theo đúng thứ tự của calculate_overall_score (bỏ qua trọng số <= 0)
+        total = 0.0
+        for j, key in enumerate(CORE_KEY_ORDER):
+            weight = weights.get(key, 0)
+            if weight > 0:
+                core_weights[i, j] = weight
+                total += weight
+        total_core_weights[i] = total
+        bonus_caps[i] = bonus_cap[level]
+    return WeightTables(levels, core_weights, total_core_weights, bonus_caps)
+
+
+@dataclass
+class ScoreBatch:
+    """Điểm của nhiều CV: level_index (N,), core/bonus (N, 6) đã clamp về 0-100, penalty (N,)."""
+
+    level_index: np.ndarray
+    core: np.ndarray
+    bonus: np.ndarray
+    penalty: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.level_index)
+
+
+def _coerce_score(value: Any, invalid: int) -> int:
+    try:
+        value = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return invalid
+    return value if 0 <= value <= 100 else (0 if value < 0 else 100)
+
+
+def _pack_row(scores: Any, keys: Tuple[str, ...], missing: int, invalid: int, out: List[int]) -> None:
+    # Tương đương vòng lặp trong calculate_overall_score, tối ưu cho trường hợp phổ biến (score là int)
+    get = scores.get if isinstance(scores, dict) else {}.get
+    for key in keys:
+        comp = get(key)
+        if type(comp) is not dict or not comp:
+            out.append(missing)
+            continue
+        value = comp.get("score", 0)
+        if type(value) is int and 0 <= value <= 100:
+            out.append(value)
+        else:
+            out.append(_coerce_score(value, invalid))
+
+
+def pack_scores(analyses: Sequence[Dict[str, Any]], tables: WeightTables) -> ScoreBatch:
+    """Chuyển các dict CVAnalysisData (level, core_scores, bonus_scores, credibility_issues) thành mảng."""
+    n = len(analyses)
+    level_index: List[int] = []
+    core: List[int] = []
+    bonus: List[int] = []
+    penalty: List[int] = []
+    level_cache: Dict[str, int] = {}
+    penalty_cache: Dict[Tuple, int] = {}
+
+    for analysis in analyses:
+        level = analysis.get("level") or ""
+        index = level_cache.get(level)
+        if index is None:
+            index = level_cache[level] = tables.level_index(level)
+        level_index.append(index)
+
+        _pack_row(analysis.get("core_scores"), CORE_KEY_ORDER, 0, 0, core)
+        _pack_row(analysis.get("bonus_scores"), BONUS_KEY_ORDER, NEUTRAL_BONUS_SCORE, NEUTRAL_BONUS_SCORE, bonus)
+
+        issues = analysis.get("credibility_issues")
+        if not issues or not isinstance(issues, list):
+            penalty.append(0)
+            continue
+        key = tuple(str(issue) for issue in issues)
+        if key not in penalty_cache:
+            penalty_cache[key] = apply_credibility_penalty(issues)
+        penalty.append(penalty_cache[key])
+
+    return ScoreBatch(
+        np.array(level_index, dtype=np.intp),
+        np.array(core, dtype=np.int64).reshape(n, len(CORE_KEY_ORDER)),
+        np.array(bonus, dtype=np.int64).reshape(n, len(BONUS_KEY_ORDER)),
+        np.array(penalty, dtype=np.int64),
+    )
+
+
+def score_batch(batch: ScoreBatch, tables: WeightTables) -> np.ndarray:
+    """overall_score (N,) cho cả batch."""
+    weights = tables.core_weights[batch.level_index]
+    # Cộng từng cột theo thứ tự để khớp từng bit với phép cộng dồn của bản scalar
+    core_sum = np.zeros(len(batch), dtype=np.float64)
+    for j in range(batch.core.shape[1]):
+        core_sum += batch.core[:, j] * weights[:, j]
+    total_weight = tables.total_core_weights[batch.level_index]
+    valid = total_weight > 0
+    core_score = np.divide(core_sum, total_weight, out=np.zeros_like(core_sum), where=valid)
+
+    bonus_sum = np.zeros(len(batch), dtype=np.float64)
+    for j in range(batch.bonus.shape[1]):
+        bonus_sum += batch.bonus[:, j]
+    bonus_avg = bonus_sum / batch.bonus.shape[1]
+
+    cap = tables.bonus_caps[batch.level_index]
+    overall = core_score * (1 - cap) + bonus_avg * cap
+    overall += batch.penalty
+    # np.rint làm tròn half-to-even giống round() của Python
+    final = np.clip(np.rint(overall), 0, 100).astype(np.int64)
+    final[~valid] = 0
+    return final
+
+
+def calculate_overall_scores(
+    analyses: Sequence[Dict[str, Any]],
+    tables: Optional[WeightTables] = None,
+) -> List[int]:
+    tables = tables or build_weight_tables()
+    return score_batch(pack_scores(analyses, tables), tables).tolist()
+
+
+def _analysis_of(record: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(record, dict):
+        return None
+    data = record.get("data") if isinstance(record.get("data"), dict) else record
+    if isinstance(data.get("core_scores"), dict) and isinstance(data.get("bonus_scores"), dict):
+        return data
+    return None
+
+
+def _chunks(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def rescore_jsonl(
+    source: TextIO,
+    target: TextIO,
+    tables: WeightTables,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    verify: bool = False,
+) -> Dict[str, int]:
+    """Đọc JSONL theo từng chunk, ghi lại với overall_score mới. Trả về thống kê."""
+    stats = {"lines": 0, "rescored": 0, "changed": 0, "skipped": 0, "mismatches": 0}
+    for chunk in _chunks(source, chunk_size):
+        records = []
+        analyses = []
+        for line in chunk:
+            if not line.strip():
+                continue
+            stats["lines"] += 1
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            analysis = _analysis_of(record)
+            records.append((line, record, analysis))
+            if analysis is not None:
+                analyses.append(analysis)
+
+        scores = iter(score_batch(pack_scores(analyses, tables), tables).tolist()) if analyses else iter(())
+        for line, record, analysis in records:
+            if analysis is None:
+                stats["skipped"] += 1
+                target.write(line if line.endswith("\n") else line + "\n")
+                continue
+            score = next(scores)
+            if verify:
+                expected = calculate_overall_score(
+                    analysis.get("level") or "",
+                    analysis["core_scores"],
+                    analysis["bonus_scores"],
+                    credibility_issues=analysis.get("credibility_issues") if isinstance(analysis.get("credibility_issues"), list) else [],
+                )
+                stats["mismatches"] += expected != score
+            stats["rescored"] += 1
+            stats["changed"] += analysis.get("overall_score") != score
+            analysis["overall_score"] = score
+            target.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return stats
+
+
+def _load_weights(path: str) -> Tuple[Optional[Dict], Optional[Dict]]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("level_weights"), data.get("bonus_cap")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m services.bulk_scoring",
+        description="Re-score a JSONL archive of CV analysis results without calling the LLM.",
+    )
+    parser.add_argument("input", help="JSONL file, '-' for stdin")
+    parser.add_argument("-o", "--output", default="-", help="output JSONL file, '-' for stdout (default)")
+    parser.add_argument("--weights", help='JSON file with {"level_weights": {...}, "bonus_cap": {...}} overrides')
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--verify", action="store_true", help="also run the scalar scorer and count mismatches")
+    args = parser.parse_args(argv)
+
+    if args.verify and args.weights:
+        parser.error("--verify compares against the built-in weights and cannot be combined with --weights")
+    # calculate_overall_score log từng CV ở mức INFO
+    logging.getLogger("services.scoring").setLevel(logging.ERROR)
+
+    level_weights, bonus_cap = _load_weights(args.weights) if args.weights else (None, None)
+    tables = build_weight_tables(level_weights, bonus_cap)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    target = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = rescore_jsonl(source, target, tables, chunk_size=max(1, args.chunk_size), verify=args.verify)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    print(", ".join(f"{key}: {value}" for key, value in stats.items()), file=sys.stderr)
+    return 1 if stats["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCache:
+    """LRU cache trong memory, có TTL và giới hạn theo số entry lẫn tổng số byte."""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 86400):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._size += size
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._size -= len(value)
+
+
+class SQLiteCache:
+    """Cache lưu trên đĩa (SQLite), dùng chung giữa nhiều worker trên cùng máy."""
+
+    _EVICT_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed_at ON cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now + self.ttl_seconds, now),
+            )
+            self._writes += 1
+            if self._writes % self._EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Xóa entry ít được truy cập nhất cho đến khi thỏa cả hai giới hạn
+        rows = self._conn.execute("SELECT key, size FROM cache ORDER BY accessed_at").fetchall()
+        stale = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            stale.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", stale)
+
+
+def normalize_cv_text(cv_text: str) -> str:
+    return " ".join(cv_text.split())
+
+
+class ResultCache:
+    """Cache text trích xuất (theo SHA-256 của file) và kết quả phân tích
+    (theo hash của cv_text đã chuẩn hóa + phiên bản prompt/model)."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def text_key(content: bytes, budget: str = "") -> str:
+        # budget: cấu hình giới hạn trích xuất, text cắt theo budget khác nhau không dùng chung
+        key = "text:" + hashlib.sha256(content).hexdigest()
+        return f"{key}:{budget}" if budget else key
+
+    @staticmethod
+    def analysis_key(cv_text: str, version: str) -> str:
+        digest = hashlib.sha256(f"{version}\n{normalize_cv_text(cv_text)}".encode("utf-8")).hexdigest()
+        return "analysis:" + digest
+
+    def _get(self, key: str) -> Optional[str]:
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Cache read failed for {key}: {e}")
+            return None
+
+    def _set(self, key: str, value: str) -> None:
+        try:
+            self.backend.set(key, value)
+        except Exception as e:
+            logger.warning(f"Cache write failed for {key}: {e}")
+
+    def get_text(self, key: str) -> Optional[Tuple[str, Optional[Dict]]]:
+        """Trả về (cv_text, extraction stats)."""
+        value = self._get(key)
+        if value is None:
+            return None
+        entry = json.loads(value)
+        return entry["text"], entry.get("stats")
+
+    def set_text(self, key: str, cv_text: str, stats: Optional[Dict] = None) -> None:
+        self._set(key, json.dumps({"text": cv_text, "stats": stats}, ensure_ascii=False))
+
+    def get_ocr_text(self, key: str) -> Optional[str]:
+        return self._get(key)
+
+    def set_ocr_text(self, key: str, text: str) -> None:
+        self._set(key, text)
+
+    def get_analysis(self, key: str) -> Optional[Dict]:
+        value = self._get(key)
+        return json.loads(value) if value is not None else None
+
+    def set_analysis(self, key: str, analysis: Dict) -> None:
+        self._set(key, json.dumps(analysis, ensure_ascii=False))
+
+
+_result_cache_instance: Optional[ResultCache] = None
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Trả về None khi CACHE_BACKEND=none."""
+    global _result_cache_instance
+    if _result_cache_instance is None and config.CACHE_BACKEND != "none":
+        if config.CACHE_BACKEND == "sqlite":
+            backend = SQLiteCache(
+                config.CACHE_SQLITE_PATH,
+                max_entries=config.CACHE_MAX_ENTRIES,
+                max_bytes=config.CACHE_MAX_BYTES,
+                ttl_seconds=config.CACHE_TTL_SECONDS,
+            )
+        else:
+            backend = MemoryCache(
+                max_entries=config.CACHE_MAX_ENTRIES,
+                max_bytes=config.CACHE_MAX_BYTES,
+                ttl_seconds=config.CACHE_TTL_SECONDS,
+            )
+        _result_cache_instance = ResultCache(backend)
+    return _result_cache_instance
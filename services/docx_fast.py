@@ -0,0 +1,144 @@
+"""Đọc text DOCX bằng cách stream-parse XML trong file zip (lxml iterparse).
+
+python-docx dựng toàn bộ cây Document và `cell.text` trả lại nội dung ô gộp (gridSpan,
+vMerge) một lần cho mỗi cột/hàng mà ô chiếm, nên bảng lớn tốn O(hàng x cột) và text bị
+lặp. Ở đây mỗi <w:tc> chỉ được đọc một lần, phần tử đã xử lý được giải phóng ngay và
+caller có thể dừng sớm khi đủ budget ký tự.
+
+Thứ tự block: header, thân văn bản (đoạn văn và từng hàng bảng theo đúng thứ tự trong
+văn bản, kể cả text box), footer.
+"""
+import re
+import zipfile
+from io import BytesIO
+from typing import IO, Iterator, List
+
+from lxml import etree
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+_P = _W + "p"
+_T = _W + "t"
+_TAB = _W + "tab"
+_BR = _W + "br"
+_CR = _W + "cr"
+_NO_BREAK_HYPHEN = _W + "noBreakHyphen"
+_TR = _W + "tr"
+_TC = _W + "tc"
+# Text box có cả bản DrawingML (mc:Choice) và bản VML (mc:Fallback) cùng nội dung
+_FALLBACK = _MC + "Fallback"
+
+# Chỉ nhận event của các tag cần dùng, bỏ qua rPr/pPr/sectPr... ngay trong libxml2
+_TAGS = (_P, _T, _TAB, _BR, _CR, _NO_BREAK_HYPHEN, _TR, _TC, _FALLBACK)
+
+_CELL_SEPARATOR = " | "
+_DOCUMENT_PART = "word/document.xml"
+_HEADER_FOOTER_PART = re.compile(r"^word/(header|footer)(\d*)\.xml$")
+
+# Chặn file zip bomb: XML giải nén lớn hơn mức này bị từ chối
+MAX_PART_BYTES = 200 * 1024 * 1024
+
+
+def _iter_part_blocks(stream: IO[bytes]) -> Iterator[str]:
+    """Yield đoạn văn và hàng bảng (các ô nối bằng " | ") của một part theo thứ tự xuất hiện."""
+    # Đoạn văn lồng nhau khi đoạn chứa text box: mỗi phần tử là các mảnh text của một <w:p>
+    paragraphs: List[List[str]] = []
+    # Ô bảng đang mở (các dòng của ô) nhận block vừa xong; không có ô nào mở thì block ra output
+    containers: List[List[str]] = []
+    rows: List[List[str]] = []
+    output: List[str] = []
+    fallback_depth = 0
+
+    for event, element in etree.iterparse(
+        stream, events=("start", "end"), tag=_TAGS, resolve_entities=False, no_network=True, huge_tree=False
+    ):
+        tag = element.tag
+        if tag == _FALLBACK:
+            fallback_depth += 1 if event == "start" else -1
+            continue
+        if fallback_depth:
+            continue
+
+        if event == "start":
+            if tag == _P:
+                paragraphs.append([])
+            elif tag == _TR:
+                rows.append([])
+            elif tag == _TC:
+                containers.append([])
+            continue
+
+        if tag == _T:
+            if paragraphs and element.text:
+                paragraphs[-1].append(element.text)
+        elif tag == _TAB:
+            if paragraphs:
+                paragraphs[-1].append("\t")
+        elif tag in (_BR, _CR):
+            if paragraphs:
+                paragraphs[-1].append("\n")
+        elif tag == _NO_BREAK_HYPHEN:
+            if paragraphs:
+                paragraphs[-1].append("-")
+        elif tag == _P:
+            text = "".join(paragraphs.pop())
+            if text.strip():
+                (containers[-1] if containers else output).append(text)
+        elif tag == _TC:
+            cell = "\n".join(containers.pop()).strip()
+            row = rows[-1]
+            # Ô rỗng (kể cả ô nối tiếp của vMerge) bị bỏ, ô trùng ô liền trước chỉ giữ một lần
+            if cell and (not row or row[-1] != cell):
+                row.append(cell)
+        elif tag == _TR:
+            cells = rows.pop()
+            if cells:
+                (containers[-1] if containers else output).append(_CELL_SEPARATOR.join(cells))
+        else:
+            continue
+
+        if not paragraphs and not containers:
+            # Block cấp cao nhất đã xong: giải phóng phần cây đã đọc
+            element.clear()
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
+        if output:
+            yield from output
+            output.clear()
+
+
+def _open_part(archive: zipfile.ZipFile, name: str) -> IO[bytes]:
+    info = archive.getinfo(name)
+    if info.file_size > MAX_PART_BYTES:
+        raise ValueError(f"{name} is too large ({info.file_size} bytes uncompressed)")
+    return archive.open(info)
+
+
+def _part_order(name: str) -> int:
+    number = _HEADER_FOOTER_PART.match(name).group(2)
+    return int(number) if number else 0
+
+
+def iter_docx_blocks(content: bytes) -> Iterator[str]:
+    """Yield các block text của file DOCX theo thứ tự header, thân văn bản, footer.
+
+    Dòng header/footer trùng nhau (header trang đầu, trang chẵn/lẻ) chỉ xuất hiện một lần.
+    Raise zipfile.BadZipFile, KeyError hoặc etree.XMLSyntaxError nếu file không đọc được.
+    """
+    with zipfile.ZipFile(BytesIO(content)) as archive:
+        parts = [name for name in archive.namelist() if _HEADER_FOOTER_PART.match(name)]
+        headers = sorted((name for name in parts if "/header" in name), key=_part_order)
+        footers = sorted((name for name in parts if "/footer" in name), key=_part_order)
+
+        seen = set()
+        for names in (headers, [_DOCUMENT_PART], footers):
+            for name in names:
+                with _open_part(archive, name) as stream:
+                    for block in _iter_part_blocks(stream):
+                        if name != _DOCUMENT_PART:
+                            if block in seen:
+                                continue
+                            seen.add(block)
+                        yield block
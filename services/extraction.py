@@ -1,84 +1,229 @@
 import io
+import logging
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
 from fastapi import HTTPException
 import fitz  # PyMuPDF
 from docx import Document
 
+from config import config
+from services.docx_fast import iter_docx_blocks
+from services.extraction_pool import get_extraction_executor
+from services.metrics import stage
+from services.ocr import PageImage, extract_page, get_ocr_service, page_content_hash
+from services.text_compaction import PAGE_BREAK
 
-async def extract_text_from_pdf(content: bytes) -> str:
+logger = logging.getLogger(__name__)
+
+
+# Các hàm _parse_* chạy trong extraction executor (process/thread pool),
+# nên phải là hàm sync ở module level để pickle được.
+def _new_stats(source: str) -> Dict[str, Any]:
+    return {
+        "source": source,
+        "pages_total": None,
+        "pages_read": None,
+        "pages_skipped": None,
+        "pages_ocr": None,
+        "chars": 0,
+        "truncated": False,
+    }
+
+
+def _cut_text(text: str, limit: int) -> str:
+    """Cắt text về tối đa `limit` ký tự, ưu tiên cắt ở cuối dòng."""
+    if len(text) <= limit:
+        return text
+    cut = text.rfind("\n", 0, limit + 1)
+    return (text[:cut] if cut > limit // 2 else text[:limit]).rstrip()
+
+
+def iter_pdf_pages(
+    content: bytes,
+    max_chars: int = 0,
+    max_pages: int = 0,
+    stats: Optional[Dict[str, Any]] = None,
+    image_pages: Optional[List[PageImage]] = None,
+    max_image_pages: int = 0,
+) -> Iterator[Tuple[int, str]]:
+    """Yield (số trang, text đã strip) của từng trang PDF có chữ, theo thứ tự trang.
+
+    Dừng khi đã đủ `max_chars` ký tự hoặc đã duyệt `max_pages` trang (0 = không giới hạn),
+    nên thời gian và memory phụ thuộc vào budget chứ không phải số trang của file.
+    Trang không dùng font nào (chỉ có ảnh) bị bỏ qua mà không cần chạy get_text; nếu truyền
+    `image_pages`, tối đa `max_image_pages` trang có ảnh như vậy được thêm vào để OCR.
+    `stats` (nếu truyền) được cập nhật trong lúc duyệt.
+    """
+    if stats is None:
+        stats = _new_stats("pdf")
+    stats.update(pages_read=0, pages_skipped=0, pages_ocr=0 if image_pages is not None else None)
+    # fitz đọc trực tiếp từ bytes, không cần copy thêm qua BytesIO
+    pdf_document = fitz.open(stream=content, filetype="pdf")
     try:
-        pdf_file = io.BytesIO(content)
-        pdf_document = fitz.open(stream=pdf_file, filetype="pdf")
-        
-        # Check if PDF is encrypted
         if pdf_document.is_encrypted:
-            pdf_document.close()
             raise HTTPException(
                 status_code=400,
                 detail="PDF file is encrypted. Please provide an unencrypted PDF."
             )
-        
-        text_parts = []
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
-            text = page.get_text()
-            if text and text.strip():
-                text_parts.append(text.strip())
-        
+        stats["pages_total"] = pdf_document.page_count
+
+        for page in pdf_document:
+            if max_pages and stats["pages_read"] >= max_pages:
+                break
+            stats["pages_read"] += 1
+            if not page.get_fonts():
+                stats["pages_skipped"] += 1
+                if image_pages is not None and len(image_pages) < max_image_pages and page.get_images():
+                    image_pages.append((page.number, page_content_hash(pdf_document, page), extract_page(pdf_document, page.number)))
+                continue
+            text = page.get_text().strip()
+            if not text:
+                stats["pages_skipped"] += 1
+                continue
+            if max_chars and stats["chars"] + len(text) > max_chars:
+                text = _cut_text(text, max_chars - stats["chars"])
+                stats["truncated"] = True
+            stats["chars"] += len(text)
+            if text:
+                yield page.number, text
+            if max_chars and stats["chars"] >= max_chars:
+                break
+
+        if stats["pages_read"] < stats["pages_total"]:
+            stats["truncated"] = True
+    finally:
         pdf_document.close()
-        
-        if not text_parts:
-            raise HTTPException(
-                status_code=400,
-                detail="Could not extract text from PDF. The file might be empty, corrupted, or contain only images."
-            )
-        
-        return "\n".join(text_parts)
-    
+
+
+def _pdf_read_error(e: Exception) -> HTTPException:
+    error_msg = str(e)
+    # Provide more helpful error messages
+    if "'/Root'" in error_msg or "Root" in error_msg:
+        return HTTPException(
+            status_code=400,
+            detail="Unable to read PDF structure. The PDF may be corrupted or in an unsupported format. Please try converting it to a different PDF version or use DOCX format instead."
+        )
+    return HTTPException(
+        status_code=400,
+        detail=f"Error reading PDF file: {error_msg}. Please ensure the PDF is not corrupted and contains readable text."
+    )
+
+
+def _parse_pdf_pages(
+    content: bytes,
+    max_chars: int = 0,
+    max_pages: int = 0,
+    max_image_pages: int = 0,
+) -> Tuple[List[Tuple[int, str]], List[PageImage], Dict[str, Any]]:
+    """Trả về (các trang có text, các trang cần OCR, stats)."""
+    stats = _new_stats("pdf")
+    image_pages: Optional[List[PageImage]] = [] if max_image_pages else None
+    try:
+        pages = list(iter_pdf_pages(content, max_chars, max_pages, stats, image_pages, max_image_pages))
     except HTTPException:
         raise
     except Exception as e:
-        error_msg = str(e)
-        # Provide more helpful error messages
-        if "'/Root'" in error_msg or "Root" in error_msg:
-            raise HTTPException(
-                status_code=400,
-                detail="Unable to read PDF structure. The PDF may be corrupted or in an unsupported format. Please try converting it to a different PDF version or use DOCX format instead."
-            )
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Error reading PDF file: {error_msg}. Please ensure the PDF is not corrupted and contains readable text."
-            )
+        raise _pdf_read_error(e)
+    return pages, image_pages or [], stats
 
 
-async def extract_text_from_docx(content: bytes) -> str:
+def _join_pages(pages: List[Tuple[int, str]]) -> str:
+    if not pages:
+        raise HTTPException(
+            status_code=400,
+            detail="Could not extract text from PDF. The file might be empty, corrupted, or contain only images."
+        )
+    # Giữ ranh giới trang để bước compaction nhận diện header/footer
+    return ("\n" + PAGE_BREAK).join(text for _, text in pages)
+
+
+def _parse_pdf_with_stats(content: bytes, max_chars: int = 0, max_pages: int = 0) -> Tuple[str, Dict[str, Any]]:
+    pages, _, stats = _parse_pdf_pages(content, max_chars, max_pages)
+    return _join_pages(pages), stats
+
+
+def _parse_pdf(content: bytes) -> str:
+    return _parse_pdf_with_stats(content)[0]
+
+
+def _merge_ocr_pages(
+    pages: List[Tuple[int, str]],
+    ocr_pages: List[Tuple[int, str]],
+    max_chars: int,
+    stats: Dict[str, Any],
+) -> List[Tuple[int, str]]:
+    """Ghép text OCR vào đúng vị trí trang rồi áp lại budget ký tự."""
+    merged: List[Tuple[int, str]] = []
+    chars = 0
+    for number, text in sorted(pages + ocr_pages):
+        if max_chars and chars + len(text) > max_chars:
+            text = _cut_text(text, max_chars - chars)
+            stats["truncated"] = True
+        if text:
+            merged.append((number, text))
+            chars += len(text)
+        if max_chars and chars >= max_chars:
+            break
+    stats["chars"] = chars
+    stats["pages_ocr"] = len(ocr_pages)
+    stats["pages_skipped"] -= len(ocr_pages)
+    return merged
+
+
+def _iter_python_docx_blocks(content: bytes) -> Iterator[str]:
+    """Đoạn văn rồi tới các hàng bảng, đọc qua object model của python-docx."""
+    doc = Document(io.BytesIO(content))
+    for paragraph in doc.paragraphs:
+        if paragraph.text.strip():
+            yield paragraph.text
+
+    for table in doc.tables:
+        for row in table.rows:
+            row_text = []
+            for cell in row.cells:
+                if cell.text.strip():
+                    row_text.append(cell.text.strip())
+            if row_text:
+                yield " | ".join(row_text)
+
+
+def _collect_docx_blocks(blocks: Iterator[str], max_chars: int, stats: Dict[str, Any]) -> str:
+    """Ghép các block text cho tới khi hết budget ký tự."""
+    text_parts = []
+    for text in blocks:
+        if max_chars and stats["chars"] + len(text) > max_chars:
+            text = _cut_text(text, max_chars - stats["chars"])
+            stats["truncated"] = True
+        if text:
+            text_parts.append(text)
+            stats["chars"] += len(text)
+        if stats["truncated"]:
+            break
+
+    if not text_parts:
+        raise HTTPException(
+            status_code=400,
+            detail="Could not extract text from DOCX. The file might be empty or corrupted."
+        )
+    return "\n".join(text_parts)
+
+
+def _parse_docx_with_stats(content: bytes, max_chars: int = 0, fast_path: bool = True) -> Tuple[str, Dict[str, Any]]:
+    if fast_path:
+        stats = _new_stats("docx")
+        try:
+            return _collect_docx_blocks(iter_docx_blocks(content), max_chars, stats), stats
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.warning(f"DOCX fast path failed, falling back to python-docx: {e}")
+
+    stats = _new_stats("docx")
     try:
-        docx_file = io.BytesIO(content)
-        doc = Document(docx_file)
-        
-        text_parts = []
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                text_parts.append(paragraph.text)
-        
-        # Also extract text from tables
-        for table in doc.tables:
-            for row in table.rows:
-                row_text = []
-                for cell in row.cells:
-                    if cell.text.strip():
-                        row_text.append(cell.text.strip())
-                if row_text:
-                    text_parts.append(" | ".join(row_text))
-        
-        if not text_parts:
-            raise HTTPException(
-                status_code=400,
-                detail="Could not extract text from DOCX. The file might be empty or corrupted."
-            )
-        
-        return "\n".join(text_parts)
-    
+        return _collect_docx_blocks(_iter_python_docx_blocks(content), max_chars, stats), stats
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -86,16 +231,87 @@ async def extract_text_from_docx(content: bytes) -> str:
         )
 
 
-async def extract_text(content: bytes, filename: str) -> str:
+def _parse_docx(content: bytes) -> str:
+    return _parse_docx_with_stats(content)[0]
+
+
+def warm_up_extraction() -> int:
+    """Parse một PDF/DOCX nhỏ để nạp sẵn PyMuPDF/python-docx (chạy trong từng worker)."""
+    pdf_document = fitz.open()
+    page = pdf_document.new_page()
+    page.insert_text((72, 72), "Warm up")
+    pdf_bytes = pdf_document.tobytes()
+    pdf_document.close()
+    _parse_pdf(pdf_bytes)
+
+    doc = Document()
+    doc.add_paragraph("Warm up")
+    docx_file = io.BytesIO()
+    doc.save(docx_file)
+    _parse_docx(docx_file.getvalue())
+    return os.getpid()
+
+
+async def extract_pdf_with_stats(content: bytes) -> Tuple[str, Dict[str, Any]]:
+    executor = get_extraction_executor()
+    ocr_service = get_ocr_service()
+    if ocr_service is None:
+        return await executor.run(
+            _parse_pdf_with_stats, content, config.EXTRACTION_MAX_CHARS, config.EXTRACTION_MAX_PAGES
+        )
+
+    pages, image_pages, stats = await executor.run(
+        _parse_pdf_pages, content, config.EXTRACTION_MAX_CHARS, config.EXTRACTION_MAX_PAGES, config.OCR_MAX_PAGES
+    )
+    if image_pages:
+        with stage("ocr"):
+            texts = await ocr_service.ocr_pages(image_pages)
+        ocr_pages = [(page[0], text) for page, text in zip(image_pages, texts) if text]
+        pages = _merge_ocr_pages(pages, ocr_pages, config.EXTRACTION_MAX_CHARS, stats)
+    return _join_pages(pages), stats
+
+
+async def extract_docx_with_stats(content: bytes) -> Tuple[str, Dict[str, Any]]:
+    return await get_extraction_executor().run(
+        _parse_docx_with_stats, content, config.EXTRACTION_MAX_CHARS, config.DOCX_FAST_PATH
+    )
+
+
+async def extract_text_from_pdf(content: bytes) -> str:
+    return (await extract_pdf_with_stats(content))[0]
+
+
+async def extract_text_from_docx(content: bytes) -> str:
+    return (await extract_docx_with_stats(content))[0]
+
+
+def extraction_budget_tag() -> str:
+    """Phân biệt text cache giữa các cấu hình budget khác nhau."""
+    tag = f"{config.EXTRACTION_MAX_CHARS}:{config.EXTRACTION_MAX_PAGES}"
+    if config.OCR_ENABLED:
+        tag += f":ocr{config.OCR_MAX_PAGES}:{config.OCR_LANGUAGES}:{config.OCR_DPI}"
+    return tag
+
+
+async def extract_text_with_stats(content: bytes, filename: str) -> Tuple[str, Dict[str, Any]]:
+    """Trích xuất text trong giới hạn EXTRACTION_MAX_CHARS / EXTRACTION_MAX_PAGES.
+
+    Trả về (text, stats) với stats gồm source, pages_total, pages_read, pages_skipped
+    (trang chỉ có ảnh/trống), pages_ocr, chars và truncated; các trường pages_* là None với DOCX.
+    Khi bật OCR, trang PDF chỉ có ảnh được OCR trong pool riêng (services/ocr.py).
+    """
     filename_lower = filename.lower()
     
     if filename_lower.endswith('.pdf'):
-        return await extract_text_from_pdf(content)
+        return await extract_pdf_with_stats(content)
     elif filename_lower.endswith('.docx'):
-        return await extract_text_from_docx(content)
+        return await extract_docx_with_stats(content)
     else:
         raise HTTPException(
             status_code=400,
             detail=f"Unsupported file format. Only PDF and DOCX files are supported."
         )
 
+
+async def extract_text(content: bytes, filename: str) -> str:
+    return (await extract_text_with_stats(content, filename))[0]
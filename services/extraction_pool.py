@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_MODES = {"process", "thread", "inline"}
+
+
+class _WorkerHTTPError(Exception):
+    """HTTPException không pickle được qua process boundary, nên được đóng gói lại."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _call_in_worker(func: Callable[..., Any], *args: Any) -> Any:
+    try:
+        return func(*args)
+    except HTTPException as e:
+        raise _WorkerHTTPError(e.status_code, e.detail) from None
+
+
+class ExtractionExecutor:
+    """Chạy các hàm parse PDF/DOCX (CPU-bound) ngoài event loop.
+
+    - process: ProcessPoolExecutor, worker được thay mới sau `max_jobs_per_worker` job
+      để giới hạn memory growth của PyMuPDF.
+    - thread: ThreadPoolExecutor.
+    - inline: chạy trực tiếp trong event loop (hành vi cũ), dùng khi không tạo được pool.
+    """
+
+    def __init__(
+        self,
+        mode: str = "process",
+        max_workers: int = 2,
+        timeout: float = 30.0,
+        max_jobs_per_worker: int = 50,
+    ):
+        if mode not in EXECUTOR_MODES:
+            logger.warning(f"Unknown extraction executor '{mode}', using inline extraction")
+            mode = "inline"
+        self.mode = mode
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._pool: Optional[Executor] = None
+        self._isolated_slots: Optional[asyncio.Semaphore] = None
+
+    def _create_pool(self) -> Optional[Executor]:
+        if self.mode == "process":
+            try:
+                return ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    max_tasks_per_child=self.max_jobs_per_worker or None,
+                )
+            except (OSError, ValueError, NotImplementedError, ImportError) as e:
+                logger.warning(f"Process pool unavailable ({e}), falling back to thread pool")
+                self.mode = "thread"
+        if self.mode == "thread":
+            try:
+                return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="extraction")
+            except RuntimeError as e:
+                logger.warning(f"Thread pool unavailable ({e}), falling back to inline extraction")
+                self.mode = "inline"
+        return None
+
+    def _get_pool(self) -> Optional[Executor]:
+        if self._pool is None and self.mode != "inline":
+            self._pool = self._create_pool()
+        return self._pool
+
+    def _retire_pool(self, pool: Executor) -> None:
+        """Bỏ pool hiện tại; job mới sẽ chạy trên pool mới.
+
+        Job khác đã gửi vào pool cũ (đang chạy hoặc đang chờ) không bị hủy mà được thêm `timeout`
+        giây để hoàn thành, sau đó process còn sót lại (ví dụ bị treo khi parse) sẽ bị terminate.
+        Job bị ảnh hưởng khi đó nhận BrokenProcessPool và được `run` chạy lại.
+        """
+        if self._pool is not pool:
+            # Đã được retire bởi lời gọi khác
+            return
+        self._pool = None
+        self._shutdown_pool(pool, grace=self.timeout)
+
+    @staticmethod
+    def _shutdown_pool(pool: Executor, grace: float) -> None:
+        processes = []
+        if isinstance(pool, ProcessPoolExecutor):
+            processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=False)
+        if processes:
+            def _terminate():
+                for process in processes:
+                    if process.is_alive():
+                        process.terminate()
+
+            timer = threading.Timer(grace, _terminate)
+            timer.daemon = True
+            timer.start()
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        pool = self._get_pool()
+        if pool is None:
+            return func(*args)
+        try:
+            return await self._run_on(pool, func, *args)
+        except BrokenProcessPool:
+            self._retire_pool(pool)
+        # Pool hỏng (một worker crash, hoặc bị terminate khi retire sau timeout) làm mọi job trên
+        # pool lỗi theo. Chạy lại một lần trong process riêng: file hợp lệ không bị trả lỗi, còn
+        # nếu chính file này làm crash thì không kéo theo job khác trên pool mới
+        return await self._run_isolated(func, *args)
+
+    async def _run_isolated(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self._isolated_slots is None:
+            self._isolated_slots = asyncio.Semaphore(self.max_workers)
+        async with self._isolated_slots:
+            pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+            try:
+                return await self._run_on(pool, func, *args)
+            except BrokenProcessPool:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Error processing file: the extraction worker crashed. The file may be corrupted."
+                )
+            finally:
+                self._shutdown_pool(pool, grace=0)
+
+    async def _run_on(self, pool: Executor, func: Callable[..., Any], *args: Any) -> Any:
+        """Chạy trên `pool`; BrokenProcessPool được raise lại để `run` quyết định chạy lại."""
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(pool, _call_in_worker, func, *args)
+        except RuntimeError as e:
+            # Pool vừa bị shutdown (retire) bởi request khác
+            raise BrokenProcessPool(str(e)) from None
+
+        try:
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except _WorkerHTTPError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail) from None
+        except asyncio.TimeoutError:
+            if isinstance(pool, ProcessPoolExecutor):
+                self._retire_pool(pool)
+            raise HTTPException(
+                status_code=400,
+                detail=f"File processing timed out after {self.timeout:g} seconds. The file may be too large or complex."
+            )
+
+    async def warm_up(self, func: Callable[[], Any]) -> int:
+        """Tạo sẵn pool và chạy `func` trên mỗi worker, để request đầu tiên không phải
+        chờ spawn process và import thư viện. Trả về số process đã warm up (0 nếu inline)."""
+        pool = self._get_pool()
+        if pool is None:
+            func()
+            return 0
+
+        loop = asyncio.get_running_loop()
+        # Submit đồng thời max_workers job để pool spawn đủ số process
+        futures = [loop.run_in_executor(pool, _call_in_worker, func) for _ in range(self.max_workers)]
+        results = await asyncio.wait_for(asyncio.gather(*futures), timeout=self.timeout * 2)
+        return len(set(results))
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_extraction_executor_instance: Optional[ExtractionExecutor] = None
+
+
+def get_extraction_executor() -> ExtractionExecutor:
+    global _extraction_executor_instance
+    if _extraction_executor_instance is None:
+        _extraction_executor_instance = ExtractionExecutor(
+            mode=config.EXTRACTION_EXECUTOR,
+            max_workers=config.EXTRACTION_WORKERS,
+            timeout=config.EXTRACTION_TIMEOUT_SECONDS,
+            max_jobs_per_worker=config.EXTRACTION_MAX_JOBS_PER_WORKER,
+        )
+    return _extraction_executor_instance
+
+
+def shutdown_extraction_executor() -> None:
+    global _extraction_executor_instance
+    if _extraction_executor_instance is not None:
+        _extraction_executor_instance.shutdown()
+        _extraction_executor_instance = None
@@ -1,61 +1,153 @@
 import re
-from typing import Dict
+from datetime import datetime
+from typing import Dict, List, Optional
 
+# Tăng khi thay đổi logic trích xuất để invalidate cache kết quả phân tích
+INFO_EXTRACTOR_VERSION = "2"
 
-def extract_email(text: str) -> str:
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    matches = re.findall(email_pattern, text)
-    if matches:
-        return matches[0]
-    return ""
+# Pattern được compile một lần khi import; extract_info duyệt CV theo từng dòng đúng một
+# lượt, chỉ chạy regex trên dòng có ký tự gợi ý ('@', chữ số, 'linkedin'...) và dừng
+# ngay khi đã tìm đủ các trường.
+_EMAIL = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
 
+# Thứ tự ưu tiên: số di động VN > số quốc tế > dãy 10-11 chữ số
+_VN_MOBILE = re.compile(r'(?<![\d+])\(?(?:\+84|0)\)?[\s.\-]?[3-9](?:[\s.\-]?\d){8}(?!\d)')
+_INTL_PHONE = re.compile(r'(?<![\d+])\+\d(?:[\s.\-]?\d){8,14}(?!\d)')
+_SIMPLE_PHONE = re.compile(r'(?<!\d)\d{10,11}(?!\d)')
+_PHONE_PATTERNS = (_VN_MOBILE, _INTL_PHONE, _SIMPLE_PHONE)
+_NON_PHONE_CHARS = re.compile(r'[^\d+]')
+_DIGIT = re.compile(r'\d')
 
-def extract_phone(text: str) -> str:
-    cleaned_text = re.sub(r'[^\d+\s\-()]', '', text)
-    vn_mobile_pattern = r'(?:0|\+84)[\s\-]?[3-9][\d\s\-]{8,9}'
-    intl_pattern = r'\+[\d\s\-]{10,}'
-    simple_pattern = r'\d{10,11}'
-    
-    patterns = [
-        (vn_mobile_pattern, cleaned_text),
-        (intl_pattern, cleaned_text),
-        (simple_pattern, cleaned_text)
-    ]
-    
-    for pattern, search_text in patterns:
-        matches = re.findall(pattern, search_text)
-        if matches:
-            phone = re.sub(r'[\s\-]', '', matches[0])
-            if 10 <= len(re.sub(r'[^\d]', '', phone)) <= 15:
-                return phone
-    
-    return ""
+_NAME_LINES = 10
+_NAME_CHARS = re.compile(r'[A-Za-zÀ-ỹ\s]+')
+_NAME_SKIP = re.compile(
+    r'cv|resume|curriculum vitae|phone|email|address|địa chỉ|điện thoại|thư điện tử|kinh nghiệm|kỹ năng'
+)
 
+_LINKEDIN = re.compile(r'(?:https?://)?(?:[a-z]{2,3}\.)?linkedin\.com/(?:in|pub)/[\w\-%.]+', re.IGNORECASE)
+_GITHUB = re.compile(r'(?:https?://)?(?:www\.)?github\.com/[A-Za-z0-9](?:[A-Za-z0-9\-]{0,38})', re.IGNORECASE)
 
-def extract_name(text: str) -> str:
-    lines = text.split('\n')
-    
-    for line in lines[:10]:
-        line = line.strip()
-        if not line or len(line) < 3 or len(line) > 50:
-            continue
-        if '@' in line or re.search(r'\d{10,}', line):
-            continue
-        skip_keywords = ['cv', 'resume', 'curriculum vitae', 'phone', 'email', 'address', 
-                        'địa chỉ', 'điện thoại', 'thư điện tử', 'kinh nghiệm', 'kỹ năng']
-        if any(keyword.lower() in line.lower() for keyword in skip_keywords):
-            continue
-        if re.match(r'^[A-Za-zÀ-ỹ\s]+$', line):
-            return line
-    
+_BIRTH_KEYWORDS = re.compile(r'ngày sinh|năm sinh|sinh năm|sinh ngày|birth|\bdob\b|d\.o\.b')
+_YEAR = re.compile(r'(?<!\d)(19[4-9]\d|20[0-2]\d)(?!\d)')
+_MIN_AGE = 14
+_MAX_AGE = 80
+
+_FIELDS = ("name", "email", "phone", "linkedin", "github", "birth_year")
+
+
+def _normalize_phone(match: str) -> str:
+    return _NON_PHONE_CHARS.sub('', match)
+
+
+def _is_valid_phone(phone: str) -> bool:
+    return 10 <= len(phone.lstrip('+')) <= 15
+
+
+def _match_phone(line: str, pattern: re.Pattern) -> str:
+    for match in pattern.finditer(line):
+        phone = _normalize_phone(match.group(0))
+        if _is_valid_phone(phone):
+            return phone
     return ""
 
 
-def extract_info(cv_text: str) -> Dict[str, str]:
+def _match_name(line: str) -> str:
+    line = line.strip()
+    if len(line) < 3 or len(line) > 50:
+        return ""
+    if not _NAME_CHARS.fullmatch(line) or _NAME_SKIP.search(line.lower()):
+        return ""
+    return line
+
+
+def _with_scheme(url: str) -> str:
+    return url if url.lower().startswith("http") else "https://" + url
+
+
+def _match_birth_year(line: str) -> Optional[int]:
+    current_year = datetime.now().year
+    for match in _YEAR.finditer(line):
+        year = int(match.group(1))
+        if _MIN_AGE <= current_year - year <= _MAX_AGE:
+            return year
+    return None
+
+
+def extract_info(cv_text: str) -> Dict:
+    """Trích xuất thông tin liên hệ trong một lượt duyệt CV.
+
+    Trả về name, phone, email, location (luôn rỗng, LLM điền sau), linkedin, github
+    và birth_year (None nếu không tìm thấy).
+    """
+    found: Dict = {}
+    # Số điện thoại ưu tiên thấp hơn chỉ được dùng nếu không có số ưu tiên cao hơn
+    phone_candidates: List[str] = ["", "", ""]
+    birth_line_pending = False
+
+    for index, line in enumerate(cv_text.split('\n')):
+        if "name" not in found and index < _NAME_LINES:
+            name = _match_name(line)
+            if name:
+                found["name"] = name
+
+        if "email" not in found and '@' in line:
+            match = _EMAIL.search(line)
+            if match:
+                found["email"] = match.group(0)
+
+        if "phone" not in found and _DIGIT.search(line):
+            for priority, pattern in enumerate(_PHONE_PATTERNS):
+                if phone_candidates[priority]:
+                    continue
+                phone = _match_phone(line, pattern)
+                if phone:
+                    phone_candidates[priority] = phone
+            if phone_candidates[0]:
+                found["phone"] = phone_candidates[0]
+
+        lower = line.lower() if len(found) < len(_FIELDS) else ""
+        if "linkedin" not in found and "linkedin" in lower:
+            match = _LINKEDIN.search(line)
+            if match:
+                found["linkedin"] = _with_scheme(match.group(0))
+        if "github" not in found and "github" in lower:
+            match = _GITHUB.search(line)
+            if match:
+                found["github"] = _with_scheme(match.group(0))
+
+        if "birth_year" not in found and (birth_line_pending or _BIRTH_KEYWORDS.search(lower)):
+            year = _match_birth_year(line)
+            if year:
+                found["birth_year"] = year
+            # Năm có thể nằm ở dòng ngay sau nhãn (ví dụ CV dạng bảng)
+            birth_line_pending = year is None and not birth_line_pending
+
+        # Tên chỉ tìm trong _NAME_LINES dòng đầu, sau đó coi như đã xong
+        name_done = "name" in found or index >= _NAME_LINES - 1
+        if name_done and len(found) + ("name" not in found) == len(_FIELDS):
+            break
+
+    if "phone" not in found:
+        found["phone"] = next((phone for phone in phone_candidates if phone), "")
+
     return {
-        "name": extract_name(cv_text),
-        "phone": extract_phone(cv_text),
-        "email": extract_email(cv_text),
-        "location": ""
+        "name": found.get("name", ""),
+        "phone": found["phone"],
+        "email": found.get("email", ""),
+        "location": "",
+        "linkedin": found.get("linkedin", ""),
+        "github": found.get("github", ""),
+        "birth_year": found.get("birth_year"),
     }
 
+
+def extract_email(text: str) -> str:
+    return extract_info(text)["email"]
+
+
+def extract_phone(text: str) -> str:
+    return extract_info(text)["phone"]
+
+
+def extract_name(text: str) -> str:
+    return extract_info(text)["name"]
@@ -0,0 +1,445 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import HTTPException
+
+from config import config
+from models.schemas import CVAnalysisResponse, JobStatusResponse
+from services.pipeline import analyze_cv_file
+from services.rate_limit import charge_token_usage
+from services.scheduler import PRIORITY_BACKFILL, LLMOverloadedError, set_llm_priority
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobStore:
+    """Interface lưu trữ job. Job phải được lưu bền vững để không mất khi restart."""
+
+    def create(self, job_id: str, filename: str, content: bytes, callback_url: Optional[str], client_id: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def get_content(self, job_id: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Nhận job để chạy, nguyên tử giữa các process: job đang queued, hoặc running nhưng lease
+        đã hết hạn (worker trước đã chết). False nếu worker khác đang giữ hoặc job đã xong."""
+        raise NotImplementedError
+
+    def renew_lease(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Gia hạn lease; False nếu `owner` không còn giữ job."""
+        raise NotImplementedError
+
+    def release(self, job_id: str, owner: str) -> None:
+        """Trả job đang giữ về queued (ví dụ khi shutdown)."""
+        raise NotImplementedError
+
+    def mark_succeeded(self, job_id: str, owner: str, result_json: str) -> bool:
+        """Lưu kết quả nếu `owner` vẫn giữ lease; False nếu job đã bị worker khác nhận lại."""
+        raise NotImplementedError
+
+    def mark_failed(self, job_id: str, owner: str, status_code: int, error: str) -> bool:
+        """Như mark_succeeded nhưng ghi lỗi."""
+        raise NotImplementedError
+
+    def list_unfinished(self) -> List[str]:
+        """Job có thể nhận: queued hoặc running đã hết lease."""
+        raise NotImplementedError
+
+
+class SQLiteJobStore(JobStore):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT NOT NULL, "
+            "content BLOB, callback_url TEXT, result TEXT, error TEXT, error_status_code INTEGER, "
+            "created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+        self._migrate()
+
+    def _migrate(self) -> None:
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "client_id" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN client_id TEXT")
+        if "lease_until" not in columns:
+            # Job running từ trước khi có lease (lease_until NULL) được coi là đã hết hạn
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN lease_owner TEXT")
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def create(self, job_id: str, filename: str, content: bytes, callback_url: Optional[str], client_id: Optional[str] = None) -> None:
+        now = _now()
+        self._execute(
+            "INSERT INTO jobs (id, status, filename, content, callback_url, client_id, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, JOB_QUEUED, filename, content, callback_url, client_id, now, now),
+        )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._execute(
+            "SELECT id, status, filename, callback_url, client_id, result, error, error_status_code, created_at, updated_at "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def get_content(self, job_id: str) -> Optional[bytes]:
+        row = self._execute("SELECT content FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["content"] if row else None
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        now = time.time()
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, lease_owner = ?, lease_until = ?, updated_at = ? "
+            "WHERE id = ? AND (status = ? OR (status = ? AND (lease_until IS NULL OR lease_until < ?)))",
+            (JOB_RUNNING, owner, now + lease_seconds, _now(), job_id, JOB_QUEUED, JOB_RUNNING, now),
+        )
+        return cursor.rowcount == 1
+
+    def renew_lease(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        cursor = self._execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+            (time.time() + lease_seconds, job_id, JOB_RUNNING, owner),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, job_id: str, owner: str) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, lease_owner = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND status = ? AND lease_owner = ?",
+            (JOB_QUEUED, _now(), job_id, JOB_RUNNING, owner),
+        )
+
+    def mark_succeeded(self, job_id: str, owner: str, result_json: str) -> bool:
+        # File CV không cần giữ lại sau khi xử lý xong
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, result = ?, content = NULL, lease_owner = NULL, lease_until = NULL, "
+            "updated_at = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+            (JOB_SUCCEEDED, result_json, _now(), job_id, JOB_RUNNING, owner),
+        )
+        return cursor.rowcount == 1
+
+    def mark_failed(self, job_id: str, owner: str, status_code: int, error: str) -> bool:
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, error = ?, error_status_code = ?, content = NULL, lease_owner = NULL, "
+            "lease_until = NULL, updated_at = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+            (JOB_FAILED, error, status_code, _now(), job_id, JOB_RUNNING, owner),
+        )
+        return cursor.rowcount == 1
+
+    def list_unfinished(self) -> List[str]:
+        rows = self._execute(
+            "SELECT id FROM jobs WHERE status = ? OR (status = ? AND (lease_until IS NULL OR lease_until < ?)) "
+            "ORDER BY created_at",
+            (JOB_QUEUED, JOB_RUNNING, time.time()),
+        ).fetchall()
+        return [row["id"] for row in rows]
+
+
+def _callback_host_allowed(host: str) -> bool:
+    # "example.com" chỉ khớp đúng host, ".example.com" khớp mọi subdomain
+    return any(
+        host == allowed or (allowed.startswith(".") and host.endswith(allowed))
+        for allowed in config.JOB_CALLBACK_ALLOWED_HOSTS
+    )
+
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def validate_callback_url(url: str) -> None:
+    """Chặn SSRF qua callback_url: phải là URL http(s). Nếu cấu hình JOB_CALLBACK_ALLOWED_HOSTS thì
+    host phải nằm trong danh sách; ngược lại mọi địa chỉ host resolve ra phải là địa chỉ public
+    (không phải loopback, private, link-local như 169.254.169.254...). Lỗi raise HTTPException 400."""
+    try:
+        parsed = urlsplit(url)
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="callback_url is not a valid URL")
+    host = parsed.hostname
+    if parsed.scheme not in ("http", "https") or not host:
+        raise HTTPException(status_code=400, detail="callback_url must be an http(s) URL")
+
+    if config.JOB_CALLBACK_ALLOWED_HOSTS:
+        if not _callback_host_allowed(host):
+            raise HTTPException(status_code=400, detail="callback_url host is not in the allowed list")
+        return
+
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise HTTPException(status_code=400, detail="callback_url host cannot be resolved")
+    if not infos or not all(_is_public_address(info[4][0]) for info in infos):
+        raise HTTPException(status_code=400, detail="callback_url must resolve to a public address")
+
+
+def job_status_from_record(record: Dict) -> JobStatusResponse:
+    return JobStatusResponse(
+        job_id=record["id"],
+        status=record["status"],
+        filename=record["filename"],
+        created_at=record["created_at"],
+        updated_at=record["updated_at"],
+        result=CVAnalysisResponse.model_validate_json(record["result"]) if record["result"] else None,
+        error=record["error"],
+        error_status_code=record["error_status_code"],
+    )
+
+
+class JobManager:
+    """Hàng đợi job chạy trong process với một pool worker (asyncio task).
+
+    Mỗi uvicorn worker có một JobManager dùng chung store. Job chỉ chạy sau khi `store.claim`
+    thành công (nguyên tử), lease được gia hạn trong lúc chạy. Khi khởi động và định kỳ mỗi nửa
+    lease, các job có thể nhận (queued, hoặc running đã hết lease do process chết) được đưa vào
+    hàng đợi; process nào claim trước thì chạy.
+    """
+
+    def __init__(self, store: JobStore, workers: int = 4, lease_seconds: float = 60):
+        self.store = store
+        self.workers = max(1, workers)
+        self.lease_seconds = lease_seconds
+        self._owner = uuid.uuid4().hex
+        self._enqueued: Set[str] = set()
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._callbacks: Set[asyncio.Task] = set()
+        self._busy: Set[asyncio.Task] = set()
+        self._stopping = False
+        self._stop_event = asyncio.Event()
+
+    async def start(self) -> None:
+        self._enqueue_unfinished()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self, drain_timeout: float = 0) -> None:
+        """Dừng các worker. Job đang chạy được chờ tối đa `drain_timeout` giây; job bị hủy
+        được trả về queued để process khác (hoặc lần start tiếp theo) chạy lại."""
+        self._stopping = True
+        self._stop_event.set()
+        busy = [task for task in self._tasks if task in self._busy]
+        for task in self._tasks:
+            if task not in self._busy:
+                task.cancel()
+        if busy and drain_timeout > 0:
+            await asyncio.wait(busy, timeout=drain_timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._callbacks:
+            await asyncio.wait(self._callbacks, timeout=config.JOB_CALLBACK_TIMEOUT_SECONDS)
+
+    def submit(self, content: bytes, filename: str, callback_url: Optional[str] = None, client_id: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, filename, content, callback_url, client_id)
+        self._enqueue(job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[JobStatusResponse]:
+        record = self.store.get(job_id)
+        return job_status_from_record(record) if record else None
+
+    def _enqueue(self, job_id: str) -> None:
+        if job_id not in self._enqueued:
+            self._enqueued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    def _enqueue_unfinished(self) -> None:
+        for job_id in self.store.list_unfinished():
+            self._enqueue(job_id)
+
+    async def _sweep(self) -> None:
+        # Nhặt lại job của process đã chết (lease hết hạn) và job đang chờ ở process khác
+        while True:
+            await asyncio.sleep(self.lease_seconds / 2)
+            try:
+                self._enqueue_unfinished()
+            except Exception as e:
+                logger.warning(f"Could not list unfinished jobs: {e}")
+
+    async def _keep_lease(self, job_id: str) -> None:
+        """Gia hạn lease định kỳ; chỉ return khi đã mất lease (worker khác nhận lại job)."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = self.store.renew_lease(job_id, self._owner, self.lease_seconds)
+            except Exception as e:
+                # Lỗi tạm thời của store: thử lại ở lượt sau, lease còn hạn
+                logger.warning(f"Could not renew lease on job {job_id}: {e}")
+                continue
+            if not renewed:
+                logger.warning(f"Lost lease on job {job_id}")
+                return
+
+    async def _worker(self) -> None:
+        current = asyncio.current_task()
+        # Job nền chỉ dùng slot LLM còn trống sau request interactive và batch
+        set_llm_priority(PRIORITY_BACKFILL)
+        while not self._stopping:
+            job_id = await self._queue.get()
+            self._enqueued.discard(job_id)
+            self._busy.add(current)
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} crashed: {e}")
+            finally:
+                self._busy.discard(current)
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        if not self.store.claim(job_id, self._owner, self.lease_seconds):
+            # Process khác đã nhận job, hoặc job đã xong
+            return
+        record = self.store.get(job_id)
+        content = self.store.get_content(job_id)
+        if content is None:
+            self.store.mark_failed(job_id, self._owner, 500, "Job content is missing")
+            return
+
+        work = asyncio.create_task(self._analyze_with_backoff(job_id, record, content))
+        heartbeat = asyncio.create_task(self._keep_lease(job_id))
+        try:
+            await asyncio.wait({work, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+            if not work.done():
+                # Mất lease: worker khác đã nhận lại job, dừng lần chạy này
+                work.cancel()
+                await asyncio.gather(work, return_exceptions=True)
+                return
+            response = work.result()
+            if response is None:
+                # LLM vẫn quá tải: trả job về queued, sweeper nhận lại ở lượt sau
+                self.store.release(job_id, self._owner)
+                return
+            result_json = response.model_dump_json()
+            stored = self.store.mark_succeeded(job_id, self._owner, result_json)
+            await charge_token_usage(record["client_id"], response)
+            callback_payload = result_json
+        except HTTPException as e:
+            stored = self.store.mark_failed(job_id, self._owner, e.status_code, str(e.detail))
+            callback_payload = None
+        except Exception as e:
+            stored = self.store.mark_failed(job_id, self._owner, 500, f"Internal server error: {str(e)}")
+            callback_payload = None
+        except asyncio.CancelledError:
+            work.cancel()
+            self.store.release(job_id, self._owner)
+            raise
+        finally:
+            heartbeat.cancel()
+
+        if not stored:
+            # Lease hết hạn ngay trước khi ghi: kết quả và callback thuộc về worker đã nhận lại job
+            logger.warning(f"Lost lease on job {job_id} before saving the result, discarding it")
+            return
+        if record["callback_url"]:
+            if callback_payload is None:
+                callback_payload = self.get(job_id).model_dump_json()
+            # Gửi callback ở task riêng để worker nhận job tiếp theo ngay
+            task = asyncio.create_task(self._send_callback(job_id, record["callback_url"], callback_payload))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    async def _analyze_with_backoff(self, job_id: str, record: Dict, content: bytes) -> Optional[CVAnalysisResponse]:
+        """Phân tích CV; khi scheduler LLM từ chối (503) thì lùi lại theo Retry-After với backoff
+        lũy thừa. Trả về None khi hết `JOB_OVERLOAD_RETRIES` lần thử, quá `JOB_OVERLOAD_MAX_WAIT_SECONDS`
+        hoặc manager đang dừng."""
+        deadline = time.monotonic() + config.JOB_OVERLOAD_MAX_WAIT_SECONDS
+        for attempt in range(config.JOB_OVERLOAD_RETRIES + 1):
+            try:
+                return await analyze_cv_file(
+                    content, record["filename"], upload_time=record["created_at"], client_id=record["client_id"]
+                )
+            except LLMOverloadedError as e:
+                delay = max(e.retry_after, 2 ** attempt)
+                if attempt == config.JOB_OVERLOAD_RETRIES or self._stopping or time.monotonic() + delay > deadline:
+                    logger.info(f"Job {job_id} deferred by LLM scheduler {attempt + 1} times, returning it to the queue")
+                    return None
+                logger.info(f"Job {job_id} deferred by LLM scheduler, retrying in {delay}s")
+                # stop() đánh thức ngay để drain không phải chờ hết backoff
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        return None
+
+    async def _send_callback(self, job_id: str, url: str, payload: str) -> None:
+        headers = {"Content-Type": "application/json", "X-Job-Id": job_id}
+        async with httpx.AsyncClient(timeout=config.JOB_CALLBACK_TIMEOUT_SECONDS) as client:
+            for attempt in range(1, config.JOB_CALLBACK_RETRIES + 1):
+                try:
+                    # Kiểm tra lại trước mỗi lần gửi: DNS của host có thể đã đổi sang địa chỉ nội bộ
+                    await validate_callback_url(url)
+                except HTTPException as e:
+                    logger.error(f"Refusing callback for job {job_id} to {url}: {e.detail}")
+                    return
+                try:
+                    response = await client.post(url, content=payload.encode("utf-8"), headers=headers)
+                    if response.status_code < 500:
+                        return
+                    logger.warning(f"Callback for job {job_id} returned {response.status_code} (attempt {attempt})")
+                except httpx.HTTPError as e:
+                    logger.warning(f"Callback for job {job_id} failed: {e} (attempt {attempt})")
+                if attempt < config.JOB_CALLBACK_RETRIES:
+                    await asyncio.sleep(2 ** attempt)
+        logger.error(f"Giving up callback for job {job_id} to {url}")
+
+
+_job_manager_instance: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    global _job_manager_instance
+    if _job_manager_instance is None:
+        _job_manager_instance = JobManager(
+            SQLiteJobStore(config.JOB_STORE_PATH),
+            workers=config.JOB_WORKERS,
+            lease_seconds=config.JOB_LEASE_SECONDS,
+        )
+    return _job_manager_instance
+
+
+async def shutdown_job_manager(drain_timeout: float = 0) -> None:
+    global _job_manager_instance
+    if _job_manager_instance is not None:
+        await _job_manager_instance.stop(drain_timeout)
+        _job_manager_instance = None
@@ -0,0 +1,115 @@
+"""Parse dần một JSON object đang được stream về, trả từng trường cấp cao nhất ngay khi đủ.
+
+LLM sinh JSON theo thứ tự các trường trong schema, nên `core_scores` có thể gửi cho client
+trong khi model vẫn đang viết `suggestions`. Parser chỉ theo dõi độ sâu ngoặc và chuỗi
+(O(độ dài) cho cả stream), giá trị của từng trường được json.loads một lần khi đã đóng.
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+# Trạng thái ở cấp cao nhất của object
+_BEFORE_OBJECT = 0
+_EXPECT_KEY = 1
+_IN_KEY = 2
+_EXPECT_COLON = 3
+_EXPECT_VALUE = 4
+_IN_VALUE = 5
+_DONE = 6
+
+
+class IncrementalJSONObjectParser:
+    """Nhận text theo từng mảnh qua `feed`, trả về các cặp (key, value) vừa hoàn chỉnh.
+
+    Text trước dấu `{` đầu tiên (ví dụ ```json) bị bỏ qua. Trường có value không parse được
+    cũng bị bỏ qua; caller vẫn nên parse/validate lại toàn bộ text khi stream kết thúc.
+    """
+
+    def __init__(self):
+        self._state = _BEFORE_OBJECT
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_chars: List[str] = []
+        self._key: Optional[str] = None
+        self._value_chars: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        return self._state == _DONE
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        completed: List[Tuple[str, Any]] = []
+        for char in chunk:
+            state = self._state
+            if state == _IN_VALUE:
+                self._feed_value(char, completed)
+            elif state == _IN_KEY:
+                if self._escape:
+                    self._escape = False
+                    self._key_chars.append(char)
+                elif char == "\\":
+                    self._escape = True
+                    self._key_chars.append(char)
+                elif char == '"':
+                    self._key = json.loads('"' + "".join(self._key_chars) + '"')
+                    self._key_chars = []
+                    self._state = _EXPECT_COLON
+                else:
+                    self._key_chars.append(char)
+            elif state == _BEFORE_OBJECT:
+                if char == "{":
+                    self._state = _EXPECT_KEY
+            elif state == _EXPECT_KEY:
+                if char == '"':
+                    self._state = _IN_KEY
+                elif char == "}":
+                    self._state = _DONE
+            elif state == _EXPECT_COLON:
+                if char == ":":
+                    self._state = _EXPECT_VALUE
+            elif state == _EXPECT_VALUE:
+                if not char.isspace():
+                    self._state = _IN_VALUE
+                    self._feed_value(char, completed)
+        return completed
+
+    def _feed_value(self, char: str, completed: List[Tuple[str, Any]]) -> None:
+        if self._in_string:
+            self._value_chars.append(char)
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    self._finish_value(completed)
+            return
+
+        if self._depth == 0 and char in ",}":
+            # Kết thúc value dạng số/true/false/null
+            self._finish_value(completed)
+            self._state = _DONE if char == "}" else _EXPECT_KEY
+            return
+
+        self._value_chars.append(char)
+        if char == '"':
+            self._in_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self._finish_value(completed)
+
+    def _finish_value(self, completed: List[Tuple[str, Any]]) -> None:
+        text = "".join(self._value_chars).strip()
+        self._value_chars = []
+        if self._state != _IN_VALUE:
+            return
+        # Value dạng chuỗi/object/array đóng xong: chờ dấu phẩy hoặc `}` của object ngoài
+        self._state = _EXPECT_KEY
+        try:
+            completed.append((self._key, json.loads(text)))
+        except (json.JSONDecodeError, TypeError):
+            pass
@@ -0,0 +1,677 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types
+
+from config import config
+from models.schemas import BonusScores, CoreScores
+from services.metrics import LLM_BACKEND_CALLS, LLM_HEDGED_REQUESTS
+from services.prompt_builder import CV_ANALYSIS_SYSTEM_INSTRUCTION, PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GEMINI_MODEL = "gemini-2.5-flash-lite"
+
+
+@dataclass
+class LLMResponse:
+    """Kết quả một lần gọi LLM, không phụ thuộc provider."""
+
+    text: str
+    usage: Dict[str, int] = field(default_factory=dict)
+    backend: str = ""
+
+
+class LLMBackendError(Exception):
+    """Lỗi từ backend. `retryable=False` nghĩa là retry/failover cũng không giúp được."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class LLMBackend:
+    """Một model/endpoint LLM."""
+
+    name: str = ""
+    model: str = ""
+
+    async def generate(self, prompt: str, response_schema=None) -> LLMResponse:
+        raise NotImplementedError
+
+    async def generate_stream(self, prompt: str, response_schema=None) -> AsyncIterator[LLMResponse]:
+        """Trả kết quả theo từng mảnh: `text` là phần text mới, `usage` (nếu có) là tổng tới mảnh đó.
+
+        Mặc định một mảnh duy nhất từ generate, cho backend không hỗ trợ streaming."""
+        yield await self.generate(prompt, response_schema)
+
+    def warm_up(self) -> None:
+        pass
+
+
+class RubricContextCache:
+    """Quản lý Gemini explicit context cache chứa CV_ANALYSIS_SYSTEM_INSTRUCTION.
+
+    Cache được tạo lần đầu khi cần, gia hạn TTL khi sắp hết hạn và tạo lại nếu bị mất.
+    Nếu tạo cache thất bại (ví dụ rubric ngắn hơn số token tối thiểu của model), tạm
+    dùng system_instruction thông thường trong `retry_after_seconds`.
+    """
+
+    def __init__(
+        self,
+        client: genai.Client,
+        model: str,
+        ttl_seconds: int = 3600,
+        refresh_margin_seconds: int = 300,
+        retry_after_seconds: int = 600,
+    ):
+        self.client = client
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.name: Optional[str] = None
+        self.expires_at = 0.0
+        self.created_count = 0
+        self.refreshed_count = 0
+        self.failed_count = 0
+        self._disabled_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self, now: float) -> bool:
+        return self.name is not None and now < self.expires_at - self.refresh_margin_seconds
+
+    def _expire_time(self, cached_content, now: float) -> float:
+        expire_time = getattr(cached_content, "expire_time", None)
+        if isinstance(expire_time, datetime):
+            if expire_time.tzinfo is None:
+                expire_time = expire_time.replace(tzinfo=timezone.utc)
+            return expire_time.timestamp()
+        return now + self.ttl_seconds
+
+    async def get_name(self) -> Optional[str]:
+        now = time.time()
+        if self._is_fresh(now):
+            return self.name
+        if now < self._disabled_until:
+            return None
+
+        async with self._lock:
+            now = time.time()
+            if self._is_fresh(now):
+                return self.name
+            ttl = f"{self.ttl_seconds}s"
+            try:
+                if self.name is not None and now < self.expires_at:
+                    cached_content = await self.client.aio.caches.update(
+                        name=self.name,
+                        config=types.UpdateCachedContentConfig(ttl=ttl),
+                    )
+                    self.refreshed_count += 1
+                    logger.info(f"Refreshed Gemini context cache {self.name}")
+                else:
+                    cached_content = await self.client.aio.caches.create(
+                        model=self.model,
+                        config=types.CreateCachedContentConfig(
+                            system_instruction=CV_ANALYSIS_SYSTEM_INSTRUCTION,
+                            display_name=f"cv-rubric-{PROMPT_VERSION}",
+                            ttl=ttl,
+                        ),
+                    )
+                    self.name = cached_content.name
+                    self.created_count += 1
+                    logger.info(f"Created Gemini context cache {self.name}")
+                self.expires_at = self._expire_time(cached_content, now)
+                return self.name
+            except Exception as e:
+                self.failed_count += 1
+                stale = self.name
+                self.invalidate()
+                self._disabled_until = now + self.retry_after_seconds
+                logger.warning(f"Gemini context cache unavailable, using system_instruction: {e}")
+                if stale is not None:
+                    # Gia hạn lỗi nhưng cache cũ có thể vẫn còn (và vẫn tính phí) tới hết TTL
+                    await self._delete(stale)
+                return None
+
+    async def _delete(self, name: str) -> None:
+        try:
+            await self.client.aio.caches.delete(name=name)
+            logger.info(f"Deleted Gemini context cache {name}")
+        except Exception as e:
+            logger.warning(f"Could not delete Gemini context cache {name}: {e}")
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Bỏ cache hiện tại; truyền `name` để chỉ bỏ khi đó vẫn là cache đang dùng
+        (request khác có thể đã tạo cache mới)."""
+        if name is None or name == self.name:
+            self.name = None
+            self.expires_at = 0.0
+
+
+def _is_missing_cache_error(error: genai_errors.ClientError) -> bool:
+    """Lỗi do context cache không còn (hết hạn hoặc bị xóa phía server): 404, hoặc 403 trên
+    resource cachedContents. Lỗi khác (429, 400, safety block...) không liên quan tới cache."""
+    if error.code == 404:
+        return True
+    return error.code == 403 and "cache" in str(error).lower()
+
+
+class GeminiBackend(LLMBackend):
+    def __init__(self, name: str, model: str = DEFAULT_GEMINI_MODEL, base_url: Optional[str] = None):
+        if not config.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY is required")
+
+        http_options = types.HttpOptions(base_url=base_url) if base_url else None
+        self.name = name
+        self.model = model
+        self.client = genai.Client(api_key=config.GEMINI_API_KEY, http_options=http_options)
+        self.rubric_cache: Optional[RubricContextCache] = None
+        if config.GEMINI_CONTEXT_CACHE_ENABLED:
+            self.rubric_cache = RubricContextCache(
+                self.client,
+                self.model,
+                ttl_seconds=config.GEMINI_CONTEXT_CACHE_TTL_SECONDS,
+            )
+
+    def warm_up(self) -> None:
+        # Tạo sẵn async client
+        self.client.aio
+
+    def _generation_config(self, cache_name: Optional[str], response_schema=None) -> types.GenerateContentConfig:
+        kwargs = {}
+        if cache_name:
+            kwargs["cached_content"] = cache_name
+        else:
+            kwargs["system_instruction"] = CV_ANALYSIS_SYSTEM_INSTRUCTION
+        if response_schema is not None:
+            kwargs["response_mime_type"] = "application/json"
+            kwargs["response_schema"] = response_schema
+        return types.GenerateContentConfig(**kwargs)
+
+    async def _generate_content(self, prompt: str, response_schema=None):
+        """Gọi Gemini với rubric qua context cache nếu có, ngược lại qua system_instruction."""
+        cache_name = await self.rubric_cache.get_name() if self.rubric_cache else None
+        if cache_name:
+            try:
+                return await self.client.aio.models.generate_content(
+                    model=self.model,
+                    contents=prompt,
+                    config=self._generation_config(cache_name, response_schema),
+                )
+            except genai_errors.ClientError as e:
+                # Chỉ thử lại khi cache đã mất; lỗi khác để BackendPool retry/circuit breaker xử lý
+                if not _is_missing_cache_error(e):
+                    raise
+                logger.warning(f"Context cache {cache_name} is gone, retrying without it: {e}")
+                self.rubric_cache.invalidate(cache_name)
+
+        return await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=prompt,
+            config=self._generation_config(None, response_schema),
+        )
+
+    async def _generate_content_stream(self, prompt: str, response_schema=None) -> AsyncIterator:
+        """Như _generate_content nhưng stream; chỉ thử lại không dùng context cache khi lỗi
+        xảy ra trước chunk đầu tiên."""
+        cache_name = await self.rubric_cache.get_name() if self.rubric_cache else None
+        if cache_name:
+            started = False
+            try:
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=self.model,
+                    contents=prompt,
+                    config=self._generation_config(cache_name, response_schema),
+                )
+                async for chunk in stream:
+                    started = True
+                    yield chunk
+                return
+            except genai_errors.ClientError as e:
+                if started or not _is_missing_cache_error(e):
+                    raise
+                logger.warning(f"Context cache {cache_name} is gone, retrying stream without it: {e}")
+                self.rubric_cache.invalidate(cache_name)
+
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=prompt,
+            config=self._generation_config(None, response_schema),
+        )
+        async for chunk in stream:
+            yield chunk
+
+    @staticmethod
+    def _usage(response) -> Dict[str, int]:
+        usage_metadata = getattr(response, "usage_metadata", None)
+        if not usage_metadata:
+            return {}
+        return {
+            "prompt_tokens": usage_metadata.prompt_token_count or 0,
+            "cached_prompt_tokens": usage_metadata.cached_content_token_count or 0,
+            "completion_tokens": usage_metadata.candidates_token_count or 0,
+            "total_tokens": usage_metadata.total_token_count or 0,
+        }
+
+    async def generate(self, prompt: str, response_schema=None) -> LLMResponse:
+        try:
+            response = await self._generate_content(prompt, response_schema)
+        except genai_errors.ClientError as e:
+            # 4xx: chỉ 408/429 là lỗi tạm thời
+            raise LLMBackendError(str(e), retryable=e.code in (408, 429)) from e
+        except (genai_errors.ServerError, httpx.TransportError) as e:
+            raise LLMBackendError(str(e)) from e
+        return LLMResponse(text=response.text or "", usage=self._usage(response), backend=self.name)
+
+    async def generate_stream(self, prompt: str, response_schema=None) -> AsyncIterator[LLMResponse]:
+        try:
+            async for chunk in self._generate_content_stream(prompt, response_schema):
+                yield LLMResponse(text=chunk.text or "", usage=self._usage(chunk), backend=self.name)
+        except genai_errors.ClientError as e:
+            raise LLMBackendError(str(e), retryable=e.code in (408, 429)) from e
+        except (genai_errors.ServerError, httpx.TransportError) as e:
+            raise LLMBackendError(str(e)) from e
+
+
+def _fake_analysis(prompt: str) -> Dict:
+    # Điểm cố định theo nội dung prompt để kết quả lặp lại được
+    seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:4], "big")
+    rng = random.Random(seed)
+
+    def scores(model) -> Dict:
+        return {name: {"score": rng.randint(30, 90), "reason": "Đánh giá giả lập."} for name in model.model_fields}
+
+    return {
+        "overall_score": rng.randint(30, 90),
+        "level": rng.choice(["intern", "fresher", "junior", "mid", "senior"]),
+        "field": "Phát triển phần mềm",
+        "info": {"location": ""},
+        "core_scores": scores(CoreScores),
+        "bonus_scores": scores(BonusScores),
+        "credibility_issues": [],
+        "strengths": ["Điểm mạnh giả lập."],
+        "weaknesses": ["Điểm yếu giả lập."],
+        "suggestions": ["Gợi ý giả lập."],
+    }
+
+
+class FakeBackend(LLMBackend):
+    """Backend giả lập chạy local (không gọi network), dùng cho test và đo tail latency.
+
+    Latency ~ lognormal quanh `latency_ms`; với xác suất `slow_rate` request bị chậm
+    thêm `slow_ms`, với xác suất `error_rate` request lỗi (retryable).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: str = "fake",
+        latency_ms: float = 500.0,
+        slow_rate: float = 0.0,
+        slow_ms: float = 5000.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.name = name
+        self.model = model
+        self.latency_ms = latency_ms
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.error_rate = error_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    # Streaming: mảnh đầu tiên tới sau STREAM_FIRST_CHUNK_RATIO latency, phần còn lại rải đều
+    STREAM_CHUNKS = 20
+    STREAM_FIRST_CHUNK_RATIO = 0.2
+
+    def _sample(self) -> Tuple[float, bool]:
+        """(latency ms, có lỗi hay không) của một lần gọi."""
+        self.calls += 1
+        delay = self.latency_ms * self._rng.lognormvariate(0, 0.25)
+        if self._rng.random() < self.slow_rate:
+            delay += self.slow_ms
+        return delay, self._rng.random() < self.error_rate
+
+    @staticmethod
+    def _usage(prompt: str) -> Dict[str, int]:
+        prompt_tokens = (len(CV_ANALYSIS_SYSTEM_INSTRUCTION) + len(prompt)) // 4
+        return {"prompt_tokens": prompt_tokens, "cached_prompt_tokens": 0, "completion_tokens": 600, "total_tokens": prompt_tokens + 600}
+
+    async def generate(self, prompt: str, response_schema=None) -> LLMResponse:
+        delay, failed = self._sample()
+        await asyncio.sleep(delay / 1000)
+        if failed:
+            raise LLMBackendError(f"Fake backend {self.name} error")
+        return LLMResponse(text=json.dumps(_fake_analysis(prompt), ensure_ascii=False), usage=self._usage(prompt), backend=self.name)
+
+    async def generate_stream(self, prompt: str, response_schema=None) -> AsyncIterator[LLMResponse]:
+        delay, failed = self._sample()
+        await asyncio.sleep(delay * self.STREAM_FIRST_CHUNK_RATIO / 1000)
+        if failed:
+            raise LLMBackendError(f"Fake backend {self.name} error")
+        text = json.dumps(_fake_analysis(prompt), ensure_ascii=False)
+        size = -(-len(text) // self.STREAM_CHUNKS)
+        interval = delay * (1 - self.STREAM_FIRST_CHUNK_RATIO) / self.STREAM_CHUNKS / 1000
+        for start in range(0, len(text), size):
+            if start:
+                await asyncio.sleep(interval)
+            last = start + size >= len(text)
+            yield LLMResponse(text=text[start:start + size], usage=self._usage(prompt) if last else {}, backend=self.name)
+
+
+class CircuitBreaker:
+    """Mở sau `failure_threshold` lỗi liên tiếp. Sau `reset_seconds` chuyển half-open: chỉ một
+    request thử (probe) được gửi tại một thời điểm, thành công thì đóng, lỗi thì mở lại."""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        return not self.probing and time.monotonic() - self.opened_at >= self.reset_seconds
+
+    def acquire(self) -> Tuple[bool, bool]:
+        """Gọi ngay trước khi gửi request. Trả về (allowed, probe); request là probe phải gọi
+        release_probe() khi kết thúc (sau record_success/record_failure, hoặc khi bị hủy)."""
+        if not self.allow():
+            return False, False
+        if self.opened_at is None:
+            return True, False
+        self.probing = True
+        return True, True
+
+    def release_probe(self) -> None:
+        self.probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Latency của các request thành công gần nhất, dùng để tính delay hedge."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class BackendPool:
+    """Gọi LLM qua danh sách backend (ưu tiên theo thứ tự cấu hình).
+
+    - Mỗi request có deadline tổng và timeout cho từng lần gọi.
+    - Lỗi tạm thời được retry với jittered exponential backoff, lần retry chuyển sang
+      backend kế tiếp; backend có circuit breaker đang mở bị bỏ qua.
+    - Hedging: nếu lần gọi chưa xong sau p95 latency của backend, gửi thêm một request
+      tới backend kế tiếp (hoặc chính nó) và lấy kết quả về trước. Số hedge bị giới hạn
+      bởi `hedge_max_ratio` để không nhân đôi tải khi cả provider chậm.
+    """
+
+    def __init__(
+        self,
+        backends: List[LLMBackend],
+        deadline_seconds: float = 60.0,
+        attempt_timeout_seconds: float = 30.0,
+        max_retries: int = 2,
+        backoff_seconds: float = 0.5,
+        hedge_enabled: bool = True,
+        hedge_min_delay_seconds: float = 1.0,
+        hedge_max_ratio: float = 0.1,
+        breaker_failures: int = 5,
+        breaker_reset_seconds: float = 30.0,
+    ):
+        if not backends:
+            raise ValueError("At least one LLM backend is required")
+        self.backends = backends
+        self.deadline_seconds = deadline_seconds
+        self.attempt_timeout_seconds = attempt_timeout_seconds
+        self.max_retries = max(0, max_retries)
+        self.backoff_seconds = backoff_seconds
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay_seconds = hedge_min_delay_seconds
+        self.hedge_max_ratio = hedge_max_ratio
+        self.breakers = {b.name: CircuitBreaker(breaker_failures, breaker_reset_seconds) for b in backends}
+        self.latencies = {b.name: LatencyTracker() for b in backends}
+        self.requests = 0
+        self.hedges = 0
+
+    @property
+    def primary(self) -> LLMBackend:
+        return self.backends[0]
+
+    def warm_up(self) -> None:
+        for backend in self.backends:
+            backend.warm_up()
+
+    def _available(self) -> List[LLMBackend]:
+        return [b for b in self.backends if self.breakers[b.name].allow()]
+
+    def _hedge_delay(self, backend: LLMBackend) -> Optional[float]:
+        if not self.hedge_enabled or self.hedges >= self.hedge_max_ratio * self.requests:
+            return None
+        p95 = self.latencies[backend.name].percentile(0.95)
+        if p95 is None:
+            return None
+        return max(self.hedge_min_delay_seconds, p95)
+
+    async def _call(self, backend: LLMBackend, prompt: str, response_schema, timeout: float) -> LLMResponse:
+        breaker = self.breakers[backend.name]
+        # Task được tạo sau _available(): request khác có thể đã nhận probe half-open trong lúc đó
+        allowed, probe = breaker.acquire()
+        if not allowed:
+            raise LLMBackendError(f"{backend.name} circuit is open")
+        start = time.monotonic()
+        try:
+            response = await asyncio.wait_for(backend.generate(prompt, response_schema), timeout=timeout)
+        except asyncio.CancelledError:
+            LLM_BACKEND_CALLS.labels(backend.name, "cancelled").inc()
+            raise
+        except asyncio.TimeoutError:
+            LLM_BACKEND_CALLS.labels(backend.name, "timeout").inc()
+            breaker.record_failure()
+            raise LLMBackendError(f"{backend.name} timed out after {timeout:.1f}s")
+        except LLMBackendError as e:
+            LLM_BACKEND_CALLS.labels(backend.name, "error").inc()
+            if e.retryable:
+                breaker.record_failure()
+            raise
+        finally:
+            if probe:
+                breaker.release_probe()
+        LLM_BACKEND_CALLS.labels(backend.name, "success").inc()
+        breaker.record_success()
+        self.latencies[backend.name].observe(time.monotonic() - start)
+        return response
+
+    async def _attempt(self, primary: LLMBackend, hedge: LLMBackend, prompt: str, response_schema, deadline: float) -> LLMResponse:
+        timeout = min(self.attempt_timeout_seconds, deadline - time.monotonic())
+        tasks = [asyncio.create_task(self._call(primary, prompt, response_schema, timeout))]
+        try:
+            hedge_delay = self._hedge_delay(primary)
+            if hedge_delay is not None and hedge_delay < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done:
+                    self.hedges += 1
+                    LLM_HEDGED_REQUESTS.inc()
+                    hedge_timeout = min(self.attempt_timeout_seconds, deadline - time.monotonic())
+                    tasks.append(asyncio.create_task(self._call(hedge, prompt, response_schema, hedge_timeout)))
+
+            error: Optional[BaseException] = None
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    return await next_done
+                except LLMBackendError as e:
+                    # Còn request hedge đang chạy thì chờ nó
+                    error = e
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def generate(self, prompt: str, response_schema=None) -> LLMResponse:
+        self.requests += 1
+        deadline = time.monotonic() + self.deadline_seconds
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            if deadline - time.monotonic() <= 0:
+                break
+            available = self._available()
+            if not available:
+                raise LLMBackendError("All LLM backends are unavailable (circuit open)", retryable=False)
+            primary = available[attempt % len(available)]
+            hedge = available[(attempt + 1) % len(available)]
+            try:
+                return await self._attempt(primary, hedge, prompt, response_schema, deadline)
+            except LLMBackendError as e:
+                last_error = e
+                if not e.retryable:
+                    raise
+                logger.warning(f"LLM backend {primary.name} failed (attempt {attempt + 1}): {e}")
+
+            # Full jitter backoff, không vượt quá deadline
+            backoff = random.uniform(0, self.backoff_seconds * (2 ** attempt))
+            if time.monotonic() + backoff >= deadline:
+                break
+            await asyncio.sleep(backoff)
+        raise LLMBackendError(f"LLM request failed after retries: {last_error}", retryable=False)
+
+    async def generate_stream(self, prompt: str, response_schema=None) -> AsyncIterator[LLMResponse]:
+        """Như generate nhưng trả kết quả theo từng mảnh (LLMBackend.generate_stream).
+
+        Retry/failover chỉ xảy ra trước mảnh đầu tiên, khi caller chưa nhận gì; lỗi sau đó
+        được raise luôn. Không hedge. Mỗi mảnh phải tới trong attempt timeout và trước deadline.
+        """
+        self.requests += 1
+        deadline = time.monotonic() + self.deadline_seconds
+        last_error: Optional[LLMBackendError] = None
+        for attempt in range(self.max_retries + 1):
+            if deadline - time.monotonic() <= 0:
+                break
+            available = self._available()
+            if not available:
+                raise LLMBackendError("All LLM backends are unavailable (circuit open)", retryable=False)
+            backend = available[attempt % len(available)]
+            # Không có await từ _available() tới đây nên acquire luôn được cho qua
+            _, probe = self.breakers[backend.name].acquire()
+            stream = backend.generate_stream(prompt, response_schema)
+            started = False
+            try:
+                while True:
+                    timeout = max(0.0, min(self.attempt_timeout_seconds, deadline - time.monotonic()))
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        break
+                    started = True
+                    yield chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                # GeneratorExit: caller đóng stream giữa chừng (client ngắt kết nối)
+                LLM_BACKEND_CALLS.labels(backend.name, "cancelled").inc()
+                raise
+            except asyncio.TimeoutError:
+                LLM_BACKEND_CALLS.labels(backend.name, "timeout").inc()
+                self.breakers[backend.name].record_failure()
+                last_error = LLMBackendError(f"{backend.name} stream stalled for {timeout:.1f}s")
+            except LLMBackendError as e:
+                LLM_BACKEND_CALLS.labels(backend.name, "error").inc()
+                if e.retryable:
+                    self.breakers[backend.name].record_failure()
+                last_error = e
+            else:
+                LLM_BACKEND_CALLS.labels(backend.name, "success").inc()
+                self.breakers[backend.name].record_success()
+                return
+            finally:
+                await stream.aclose()
+                if probe:
+                    self.breakers[backend.name].release_probe()
+
+            if started or not last_error.retryable:
+                raise LLMBackendError(str(last_error), retryable=False)
+            logger.warning(f"LLM backend {backend.name} failed to start streaming (attempt {attempt + 1}): {last_error}")
+            backoff = random.uniform(0, self.backoff_seconds * (2 ** attempt))
+            if time.monotonic() + backoff >= deadline:
+                break
+            await asyncio.sleep(backoff)
+        raise LLMBackendError(f"LLM request failed after retries: {last_error}", retryable=False)
+
+
+def parse_backend_specs(spec: str) -> List[Dict[str, Optional[str]]]:
+    """Parse LLM_BACKENDS: danh sách `type:model[@base_url]` phân tách bằng dấu phẩy,
+    ví dụ `gemini:gemini-2.5-flash-lite,gemini:gemini-2.0-flash@https://proxy.example.com`."""
+    specs = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        kind, _, rest = item.partition(":")
+        model, _, base_url = rest.partition("@")
+        specs.append({"type": kind.strip().lower(), "model": model.strip() or None, "base_url": base_url.strip() or None})
+    return specs
+
+
+def create_backend(index: int, spec: Dict[str, Optional[str]]) -> LLMBackend:
+    kind = spec["type"]
+    if kind == "gemini":
+        model = spec["model"] or DEFAULT_GEMINI_MODEL
+        base_url = spec["base_url"] or config.GEMINI_BASE_URL
+        return GeminiBackend(f"{index}:gemini:{model}", model=model, base_url=base_url)
+    if kind == "fake":
+        return FakeBackend(
+            f"{index}:fake",
+            model=spec["model"] or "fake",
+            latency_ms=config.FAKE_LLM_LATENCY_MS,
+            slow_rate=config.FAKE_LLM_SLOW_RATE,
+            slow_ms=config.FAKE_LLM_SLOW_MS,
+            error_rate=config.FAKE_LLM_ERROR_RATE,
+            seed=None if config.FAKE_LLM_SEED is None else config.FAKE_LLM_SEED + index,
+        )
+    raise ValueError(f"Unknown LLM backend type: {kind}")
+
+
+def create_backend_pool() -> BackendPool:
+    specs = parse_backend_specs(config.LLM_BACKENDS) or [{"type": "gemini", "model": None, "base_url": None}]
+    return BackendPool(
+        [create_backend(i, spec) for i, spec in enumerate(specs)],
+        deadline_seconds=config.LLM_DEADLINE_SECONDS,
+        attempt_timeout_seconds=config.LLM_ATTEMPT_TIMEOUT_SECONDS,
+        max_retries=config.LLM_MAX_RETRIES,
+        backoff_seconds=config.LLM_RETRY_BACKOFF_SECONDS,
+        hedge_enabled=config.LLM_HEDGE_ENABLED,
+        hedge_min_delay_seconds=config.LLM_HEDGE_MIN_DELAY_SECONDS,
+        hedge_max_ratio=config.LLM_HEDGE_MAX_RATIO,
+        breaker_failures=config.LLM_BREAKER_FAILURES,
+        breaker_reset_seconds=config.LLM_BREAKER_RESET_SECONDS,
+    )
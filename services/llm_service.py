@@ -1,23 +1,38 @@
 import json
 import re
 import logging
-from typing import Dict
-from google import genai
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from pydantic import TypeAdapter, ValidationError, create_model
 from config import config
-from services.prompt_builder import build_cv_analysis_prompt
-from services.info_extractor import extract_info
+from models.schemas import LLMCVAnalysis
+from services.llm_backends import BackendPool, LLMResponse, create_backend_pool
+from services.scheduler import LLMOverloadedError, LLMScheduler, create_llm_scheduler
+from services.prompt_builder import PROMPT_VERSION, build_cv_analysis_user_prompt
+from services.info_extractor import INFO_EXTRACTOR_VERSION, extract_info
+from services.json_stream import IncrementalJSONObjectParser
+from services.metrics import ERRORS, observe_stage, stage
 from services.scoring import calculate_overall_score
+from services.text_compaction import CompactionStats, compact_cv_text, COMPACTION_VERSION
 
 logger = logging.getLogger(__name__)
 
 
 class LLMService:
-    def __init__(self):
-        if not config.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY is required")
-        
-        self.gemini_client = genai.Client()
-        self.gemini_model = "gemini-2.5-flash-lite"
+    def __init__(self, backend_pool: Optional[BackendPool] = None, scheduler: Optional[LLMScheduler] = None):
+        self.backend_pool = backend_pool or create_backend_pool()
+        # Giới hạn số request LLM đồng thời trong một process, phần vượt chờ theo lớp ưu tiên
+        self.scheduler = scheduler or create_llm_scheduler()
+
+    @property
+    def analysis_version(self) -> str:
+        """Phiên bản model + prompt, dùng để invalidate cache kết quả phân tích."""
+        # Cache theo model của backend chính; kết quả từ backend failover dùng chung version
+        version = f"{self.backend_pool.primary.model}:{PROMPT_VERSION}:{config.GEMINI_RESPONSE_MODE}:info{INFO_EXTRACTOR_VERSION}"
+        if config.PROMPT_COMPACTION_ENABLED:
+            version += f":compact{COMPACTION_VERSION}:{config.PROMPT_MAX_CV_TOKENS}"
+        return version
     
     def _extract_json_from_response(self, text: str) -> Dict:
         text = re.sub(r'```json\s*|```\s*', '', text).strip()
@@ -32,44 +47,163 @@ class LLMService:
         except json.JSONDecodeError as e:
             raise ValueError(f"Could not parse JSON from LLM response: {str(e)}")
     
-    async def analyze_cv_with_gemini(self, cv_text: str) -> Dict:
-        try:
-            prompt = build_cv_analysis_prompt(cv_text)
-            response = self.gemini_client.models.generate_content(
-                model=self.gemini_model,
-                contents=prompt
+    async def _generate(self, prompt: str, response_schema=None) -> LLMResponse:
+        return await self.backend_pool.generate(prompt, response_schema)
+
+    def _add_token_usage(self, totals: Dict, response: LLMResponse) -> None:
+        for key in totals:
+            totals[key] += response.usage.get(key, 0)
+
+    async def _parse_structured(self, prompt: str, text: str, usage_totals: Dict) -> Tuple[Dict, float, int]:
+        """Parse + validate response theo LLMCVAnalysis trong một bước.
+
+        Nếu một số trường không hợp lệ, chỉ yêu cầu Gemini trả lại các trường đó
+        (response_schema thu gọn) rồi ghép vào kết quả, thay vì retry toàn bộ.
+        Trả về (result, thời gian parse/validate tính bằng giây, số lần repair).
+        """
+        parse_seconds = 0.0
+        attempts = 0
+        data: Dict = {}
+        while True:
+            start = time.perf_counter()
+            try:
+                parsed = LLMCVAnalysis.model_validate_json(text) if not data else LLMCVAnalysis.model_validate(data)
+                parse_seconds += time.perf_counter() - start
+                return parsed.model_dump(), parse_seconds, attempts
+            except ValidationError as e:
+                errors = e.errors(include_url=False, include_input=False)
+                if not data:
+                    try:
+                        data = json.loads(text)
+                    except json.JSONDecodeError:
+                        data = {}
+                invalid_fields = {str(err["loc"][0]) for err in errors if err["loc"]}
+                if not isinstance(data, dict) or not invalid_fields:
+                    data = {}
+                    invalid_fields = set(LLMCVAnalysis.model_fields)
+                parse_seconds += time.perf_counter() - start
+
+            if attempts >= config.GEMINI_REPAIR_ATTEMPTS:
+                raise ValueError(f"LLM response failed validation for fields: {sorted(invalid_fields)}")
+            attempts += 1
+
+            field_names = [name for name in LLMCVAnalysis.model_fields if name in invalid_fields]
+            repair_model = create_model(
+                "LLMCVAnalysisRepair",
+                **{name: (LLMCVAnalysis.model_fields[name].annotation, LLMCVAnalysis.model_fields[name]) for name in field_names},
             )
-            
+            error_lines = "\n".join(f"- {'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in errors[:20])
+            repair_prompt = (
+                f"{prompt}\n\n"
+                f"Phản hồi trước có các trường không hợp lệ: {', '.join(field_names)}.\n"
+                f"Lỗi:\n{error_lines}\n"
+                f"CHỈ trả về JSON chứa các trường: {', '.join(field_names)}."
+            )
+            async with self.scheduler.slot():
+                response = await self._generate(repair_prompt, repair_model)
+            self._add_token_usage(usage_totals, response)
             if not response.text:
-                raise ValueError("Empty response from Gemini API")
-            
-            result = self._extract_json_from_response(response.text)
-            
+                raise ValueError("Empty repair response from Gemini API")
+
+            start = time.perf_counter()
             try:
-                usage = getattr(response, 'usage_metadata', None) or getattr(response, 'usage', None)
-                if usage:
-                    token_usage = {
-                        "prompt_tokens": getattr(usage, 'prompt_token_count', 0) or 0,
-                        "completion_tokens": getattr(usage, 'candidates_token_count', 0) or getattr(usage, 'completion_tokens', 0) or 0,
-                        "total_tokens": getattr(usage, 'total_token_count', 0) or getattr(usage, 'total_tokens', 0) or 0
-                    }
-                    if token_usage.get("total_tokens", 0) > 0:
-                        result["_token_usage"] = token_usage
-            except Exception:
-                pass
+                repaired = json.loads(response.text)
+            except json.JSONDecodeError:
+                repaired = {}
+            if isinstance(repaired, dict):
+                data.update({name: repaired[name] for name in field_names if name in repaired})
+            parse_seconds += time.perf_counter() - start
+    
+    def _build_prompt(self, cv_text: str) -> Tuple[str, Optional[CompactionStats]]:
+        compaction = None
+        if config.PROMPT_COMPACTION_ENABLED:
+            cv_text, compaction = compact_cv_text(cv_text, max_tokens=config.PROMPT_MAX_CV_TOKENS)
+        return build_cv_analysis_user_prompt(cv_text), compaction
+
+    async def _parse_response(self, prompt: str, text: str, structured: bool, usage_totals: Dict) -> Dict:
+        """Parse text trả về thành dict kết quả, kèm `_llm_parse`."""
+        if not text:
+            raise ValueError("Empty response from Gemini API")
+
+        if structured:
+            result, parse_seconds, repair_attempts = await self._parse_structured(prompt, text, usage_totals)
+        else:
+            start = time.perf_counter()
+            result = self._extract_json_from_response(text)
+            parse_seconds = time.perf_counter() - start
+            repair_attempts = 0
+
+        result["_llm_parse"] = {
+            "mode": "structured" if structured else "text",
+            "parse_time_ms": round(parse_seconds * 1000, 3),
+            "repair_attempts": repair_attempts,
+        }
+        return result
+
+    @staticmethod
+    def _attach_token_usage(result: Dict, usage_totals: Dict, compaction: Optional[CompactionStats]) -> None:
+        if usage_totals["total_tokens"] > 0:
+            token_usage = dict(usage_totals)
+            token_usage["fresh_prompt_tokens"] = max(0, token_usage["prompt_tokens"] - token_usage["cached_prompt_tokens"])
+            if compaction:
+                token_usage["prompt_tokens_saved"] = compaction.tokens_saved
+            result["_token_usage"] = token_usage
+
+    async def analyze_cv_with_gemini(self, cv_text: str) -> Dict:
+        try:
+            prompt, compaction = self._build_prompt(cv_text)
+            structured = config.GEMINI_RESPONSE_MODE == "structured"
+            usage_totals = _empty_usage()
+            
+            async with self.scheduler.slot():
+                response = await self._generate(prompt, LLMCVAnalysis if structured else None)
+            self._add_token_usage(usage_totals, response)
             
+            result = await self._parse_response(prompt, response.text, structured, usage_totals)
+            self._attach_token_usage(result, usage_totals, compaction)
             return result
         
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             raise Exception(f"Gemini API error: {str(e)}")
-    
-    async def analyze_cv(self, cv_text: str) -> Dict:
-        extracted_info = extract_info(cv_text)
-        
-        result = await self.analyze_cv_with_gemini(cv_text)
 
+    async def analyze_cv_with_gemini_stream(self, cv_text: str) -> AsyncIterator[Tuple[str, Any]]:
+        """Như analyze_cv_with_gemini nhưng dùng streaming generation: yield (tên trường, value)
+        cho từng trường trong STREAMED_FIELDS ngay khi model viết xong trường đó (đã validate),
+        cuối cùng yield ("result", kết quả đầy đủ như analyze_cv_with_gemini)."""
+        try:
+            prompt, compaction = self._build_prompt(cv_text)
+            structured = config.GEMINI_RESPONSE_MODE == "structured"
+            usage_totals = _empty_usage()
+            parser = IncrementalJSONObjectParser()
+            parts = []
+            usage: Dict = {}
+
+            stream = self.backend_pool.generate_stream(prompt, LLMCVAnalysis if structured else None)
+            async with self.scheduler.slot(), aclosing(stream):
+                async for chunk in stream:
+                    parts.append(chunk.text)
+                    usage = chunk.usage or usage
+                    for name, value in parser.feed(chunk.text):
+                        value = _validate_streamed_field(name, value)
+                        if value is not None:
+                            yield name, value
+            self._add_token_usage(usage_totals, LLMResponse(text="", usage=usage))
+
+            result = await self._parse_response(prompt, "".join(parts), structured, usage_totals)
+            self._attach_token_usage(result, usage_totals, compaction)
+        except LLMOverloadedError:
+            raise
+        except Exception as e:
+            raise Exception(f"Gemini API error: {str(e)}")
+        yield "result", result
+
+    def _finalize_analysis(self, result: Dict, extracted_info: Dict) -> Dict:
+        """Chuẩn hóa kết quả LLM: level, info trích xuất local (+ location từ LLM),
+        credibility_issues và overall_score tính lại bằng calculate_overall_score."""
         llm_level = result.get("level", "junior")
-        if not llm_level or llm_level not in ["intern", "fresher", "junior", "mid", "senior"]:
+        if not llm_level or llm_level not in LEVELS:
             llm_level = "junior"
 
         result["level"] = llm_level
@@ -88,12 +222,13 @@ class LLMService:
             core_scores = result.get("core_scores", {})
             bonus_scores = result.get("bonus_scores", {})
             if isinstance(core_scores, dict) and isinstance(bonus_scores, dict):
-                calculated_overall = calculate_overall_score(
-                    llm_level, 
-                    core_scores, 
-                    bonus_scores,
-                    credibility_issues=credibility_issues
-                )
+                with stage("scoring"):
+                    calculated_overall = calculate_overall_score(
+                        llm_level, 
+                        core_scores, 
+                        bonus_scores,
+                        credibility_issues=credibility_issues
+                    )
                 result["overall_score"] = calculated_overall
             else:
                 logger.warning(f"Missing core_scores or bonus_scores in LLM response. core_scores type: {type(core_scores)}, bonus_scores type: {type(bonus_scores)}")
@@ -103,6 +238,73 @@ class LLMService:
                 result["overall_score"] = 0
 
         return result
+    
+    async def analyze_cv(self, cv_text: str) -> Dict:
+        with stage("extract_info"):
+            extracted_info = extract_info(cv_text)
+        
+        with stage("llm"):
+            result = await self.analyze_cv_with_gemini(cv_text)
+
+        return self._finalize_analysis(result, extracted_info)
+
+    async def analyze_cv_stream(self, cv_text: str) -> AsyncIterator[Tuple[str, Any]]:
+        """Như analyze_cv nhưng trả kết quả dần: yield ("info", thông tin trích xuất local) ngay,
+        rồi từng trường LLM (xem analyze_cv_with_gemini_stream), cuối cùng ("result", kết quả
+        đầy đủ như analyze_cv, đã có overall_score tính ở backend)."""
+        with stage("extract_info"):
+            extracted_info = extract_info(cv_text)
+        yield "info", dict(extracted_info)
+
+        result = None
+        llm_seconds = 0.0
+        start = time.perf_counter()
+        try:
+            async with aclosing(self.analyze_cv_with_gemini_stream(cv_text)) as events:
+                async for name, value in events:
+                    if name == "result":
+                        result = value
+                        continue
+                    # Không tính thời gian client nhận event vào stage llm
+                    llm_seconds += time.perf_counter() - start
+                    yield name, value
+                    start = time.perf_counter()
+        except GeneratorExit:
+            # Caller đóng stream (client ngắt kết nối), không phải lỗi
+            raise
+        except BaseException as e:
+            ERRORS.labels("llm", type(e).__name__).inc()
+            raise
+        finally:
+            observe_stage("llm", llm_seconds + time.perf_counter() - start)
+
+        yield "result", self._finalize_analysis(result, extracted_info)
+
+
+def _empty_usage() -> Dict[str, int]:
+    return {"prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+
+LEVELS = ("intern", "fresher", "junior", "mid", "senior")
+# Các trường LLM được gửi dần cho client khi streaming, theo thứ tự trong LLMCVAnalysis.
+# overall_score của LLM bị tính lại ở backend, info chỉ có location nên không gửi riêng
+STREAMED_FIELDS = ("level", "field", "core_scores", "bonus_scores", "credibility_issues", "strengths", "weaknesses", "suggestions")
+_STREAMED_FIELD_ADAPTERS = {name: TypeAdapter(LLMCVAnalysis.model_fields[name].annotation) for name in STREAMED_FIELDS}
+
+
+def _validate_streamed_field(name: str, value: Any) -> Any:
+    """Value đã validate (dạng JSON) của một trường được stream, None nếu không gửi."""
+    adapter = _STREAMED_FIELD_ADAPTERS.get(name)
+    if adapter is None:
+        return None
+    try:
+        validated = adapter.validate_python(value)
+    except ValidationError:
+        # Trường lỗi sẽ được sửa (repair) khi parse toàn bộ response
+        return None
+    if name == "level" and validated not in LEVELS:
+        validated = "junior"
+    return adapter.dump_python(validated, mode="json")
 
 
 _llm_service_instance = None
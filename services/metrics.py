@@ -0,0 +1,146 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+STAGES = ("upload", "extraction", "ocr", "extract_info", "llm_queue", "llm", "scoring", "ranking", "total")
+
+STAGE_DURATION = Histogram(
+    "cv_stage_duration_seconds",
+    "Duration of each CV processing stage",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60),
+)
+REQUESTS = Counter("cv_http_requests_total", "HTTP requests by route and status code", ["route", "status"])
+IN_FLIGHT = Gauge("cv_http_requests_in_flight", "HTTP requests currently being processed", multiprocess_mode="livesum")
+ERRORS = Counter("cv_errors_total", "Errors raised inside a processing stage", ["stage", "type"])
+TOKENS = Counter("cv_llm_tokens_total", "LLM tokens used", ["kind"])
+CACHE_REQUESTS = Counter("cv_cache_requests_total", "Result cache lookups", ["cache", "result"])
+LLM_BACKEND_CALLS = Counter("cv_llm_backend_calls_total", "LLM backend calls by outcome", ["backend", "outcome"])
+OCR_PAGES = Counter("cv_ocr_pages_total", "PDF pages sent to OCR by outcome", ["outcome"])
+LLM_HEDGED_REQUESTS = Counter("cv_llm_hedged_requests_total", "Hedged (duplicate) LLM requests sent after the p95 delay")
+SINGLEFLIGHT_CALLS = Counter(
+    "cv_singleflight_calls_total",
+    "Analyses by single-flight outcome: leader (ran the work), coalesced (shared an in-flight call "
+    "in this process), waited (ran after another worker released the lock)",
+    ["result"],
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "cv_llm_queue_depth", "Analyses waiting for an LLM slot by priority class", ["priority"], multiprocess_mode="livesum"
+)
+LLM_SCHEDULER_DECISIONS = Counter(
+    "cv_llm_scheduler_total",
+    "LLM scheduler decisions by priority class: admitted, rejected (queue full), evicted (by higher priority), "
+    "expired (waited past its deadline), cancelled (client went away while queued)",
+    ["priority", "outcome"],
+)
+
+# Bind sẵn label cho các stage cố định để giảm overhead mỗi lần observe
+_stage_histograms = {name: STAGE_DURATION.labels(name) for name in STAGES}
+
+# Thời gian từng stage (ms) của request hiện tại, dùng cho Metadata.stages_ms
+_stage_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+def start_stage_timings() -> Dict[str, float]:
+    timings: Dict[str, float] = {}
+    _stage_timings.set(timings)
+    return timings
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    histogram = _stage_histograms.get(name)
+    if histogram is None:
+        histogram = _stage_histograms[name] = STAGE_DURATION.labels(name)
+    histogram.observe(seconds)
+    timings = _stage_timings.get()
+    if timings is not None:
+        timings[name] = round(timings.get(name, 0.0) + seconds * 1000, 3)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Đo thời gian một stage; lỗi trong stage được đếm theo loại exception."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        ERRORS.labels(name, type(e).__name__).inc()
+        raise
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def record_token_usage(token_usage) -> None:
+    TOKENS.labels("prompt").inc(token_usage.prompt_tokens)
+    TOKENS.labels("cached_prompt").inc(token_usage.cached_prompt_tokens)
+    TOKENS.labels("completion").inc(token_usage.completion_tokens)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_singleflight(result: str) -> None:
+    SINGLEFLIGHT_CALLS.labels(result).inc()
+
+
+def record_llm_queue_depth(priority: str, depth: int) -> None:
+    LLM_QUEUE_DEPTH.labels(priority).set(depth)
+
+
+def record_scheduler_decision(priority: str, outcome: str) -> None:
+    LLM_SCHEDULER_DECISIONS.labels(priority, outcome).inc()
+
+
+def render_metrics() -> bytes:
+    # Nhiều uvicorn worker: gom metrics của các process qua PROMETHEUS_MULTIPROC_DIR
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI middleware đếm request theo route/status và số request đang xử lý."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            route = scope.get("route")
+            REQUESTS.labels(getattr(route, "path", "unmatched"), str(status)).inc()
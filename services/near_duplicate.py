@@ -0,0 +1,311 @@
+"""Phát hiện CV gần trùng (bản chỉnh sửa nhẹ của CV đã chấm) bằng SimHash 64-bit.
+
+Exact-hash cache chỉ hit khi text giống hệt; ở đây mỗi CV được rút thành một
+fingerprint 64 bit, hai CV gần giống nhau có fingerprint chỉ khác vài bit.
+Fingerprint được giữ trong mảng numpy (vài chục byte/entry), kết quả phân tích nằm
+trong SQLite nên index được nạp lại sau khi restart và dùng chung giữa các worker.
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+# Tăng khi đổi cách tính fingerprint, entry cũ sẽ không còn được so khớp
+SIMHASH_VERSION = "1"
+
+_WORD = re.compile(r"\w+")
+_SHINGLE_SIZE = 2
+
+# Khoảng cách càng lớn thì block càng hẹp và số candidate mỗi lần tra càng nhiều
+MAX_SUPPORTED_DISTANCE = 8
+
+# Số lần add giữa hai lần xóa entry quá hạn/vượt giới hạn
+_PRUNE_EVERY = 1000
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(values)
+else:  # numpy < 2.0
+    _BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return _BYTE_POPCOUNT[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def simhash(cv_text: str) -> int:
+    """SimHash 64-bit của cv_text (chữ thường, bỏ dấu câu, shingle 2 từ)."""
+    words = _WORD.findall(cv_text.lower())
+    if len(words) < _SHINGLE_SIZE:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + _SHINGLE_SIZE]) for i in range(len(words) - _SHINGLE_SIZE + 1)]
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in set(shingles))
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(-1, FINGERPRINT_BITS)
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(bits)
+    return int(np.packbits(majority).view(">u8")[0])
+
+
+def _to_signed(fingerprint: int) -> int:
+    # SQLite INTEGER là int64 có dấu
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+def _block_layout(blocks: int) -> List[Tuple[np.uint64, np.uint64]]:
+    """(shift, mask) của từng block khi chia 64 bit thành `blocks` phần gần bằng nhau."""
+    layout = []
+    start = 0
+    for block in range(blocks):
+        width = FINGERPRINT_BITS // blocks + (1 if block >= blocks - FINGERPRINT_BITS % blocks else 0)
+        layout.append((np.uint64(start), np.uint64((1 << width) - 1)))
+        start += width
+    return layout
+
+
+class SimHashIndex:
+    """Index fingerprint trong bộ nhớ cho truy vấn khoảng cách Hamming <= max_distance.
+
+    Fingerprint được chia thành (ít nhất) max_distance + 1 block: hai fingerprint cách nhau không quá
+    max_distance bit chắc chắn trùng ít nhất một block. Mỗi block có một mảng key đã sort
+    + thứ tự entry tương ứng, tra bằng np.searchsorted rồi chỉ tính khoảng cách trên các
+    entry cùng block. Entry mới vào buffer (so sánh tuyến tính) và được merge khi buffer đầy.
+    """
+
+    def __init__(self, max_distance: int = 6, buffer_size: int = 4096):
+        self.max_distance = max_distance
+        # Ít nhất 4 block để mỗi block vừa uint16
+        self._layout = _block_layout(max(4, max_distance + 1))
+        self._fingerprints = np.empty(0, dtype=np.uint64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._block_keys: List[np.ndarray] = [np.empty(0, dtype=np.uint16) for _ in self._layout]
+        self._block_order: List[np.ndarray] = [np.empty(0, dtype=np.uint32) for _ in self._layout]
+        self._buffer_fingerprints = np.empty(buffer_size, dtype=np.uint64)
+        self._buffer_ids = np.empty(buffer_size, dtype=np.int64)
+        self._buffered = 0
+
+    def __len__(self) -> int:
+        return len(self._fingerprints) + self._buffered
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self._fingerprints, self._ids, self._buffer_fingerprints, self._buffer_ids]
+        return sum(a.nbytes for a in arrays + self._block_keys + self._block_order)
+
+    def add(self, fingerprint: int, entry_id: int) -> None:
+        if self._buffered == len(self._buffer_fingerprints):
+            self._merge()
+        self._buffer_fingerprints[self._buffered] = fingerprint
+        self._buffer_ids[self._buffered] = entry_id
+        self._buffered += 1
+
+    def add_many(self, fingerprints: np.ndarray, entry_ids: np.ndarray) -> None:
+        self._fingerprints = np.concatenate([self._fingerprints, fingerprints.astype(np.uint64, copy=False)])
+        self._ids = np.concatenate([self._ids, entry_ids.astype(np.int64, copy=False)])
+        self._merge()
+
+    def _merge(self) -> None:
+        if self._buffered:
+            self._fingerprints = np.concatenate([self._fingerprints, self._buffer_fingerprints[:self._buffered]])
+            self._ids = np.concatenate([self._ids, self._buffer_ids[:self._buffered]])
+            self._buffered = 0
+        for block, (shift, mask) in enumerate(self._layout):
+            keys = ((self._fingerprints >> shift) & mask).astype(np.uint16)
+            order = np.argsort(keys, kind="stable").astype(np.uint32)
+            self._block_keys[block] = keys[order]
+            self._block_order[block] = order
+
+    def search(self, fingerprint: int) -> List[Tuple[int, int]]:
+        """Các (entry_id, khoảng cách) có khoảng cách <= max_distance, gần nhất trước."""
+        query = np.uint64(fingerprint)
+        max_distance = self.max_distance
+        candidates = []
+        for block, (shift, mask) in enumerate(self._layout):
+            # Cùng dtype với mảng key, tránh numpy ép kiểu cả mảng mỗi lần tra
+            key = np.uint16((query >> shift) & mask)
+            keys = self._block_keys[block]
+            lo = np.searchsorted(keys, key, side="left")
+            hi = np.searchsorted(keys, key, side="right")
+            if hi > lo:
+                candidates.append(self._block_order[block][lo:hi])
+
+        matches: Dict[int, int] = {}
+        if candidates:
+            # Entry trùng nhiều block xuất hiện nhiều lần, dict bên dưới tự loại trùng
+            positions = np.concatenate(candidates)
+            distances = _popcount(self._fingerprints[positions] ^ query)
+            close = distances <= max_distance
+            matches.update(zip(self._ids[positions[close]].tolist(), distances[close].tolist()))
+        if self._buffered:
+            distances = _popcount(self._buffer_fingerprints[:self._buffered] ^ query)
+            close = np.flatnonzero(distances <= max_distance)
+            matches.update(zip(self._buffer_ids[close].tolist(), distances[close].tolist()))
+        return sorted(matches.items(), key=lambda item: (item[1], -item[0]))
+
+
+@dataclass
+class NearDuplicateMatch:
+    entry_id: int
+    distance: int
+    filename: str
+    scored_at: str
+    result: Dict
+    total_tokens: int
+
+    @property
+    def similarity(self) -> float:
+        return round(1 - self.distance / FINGERPRINT_BITS, 4)
+
+
+class NearDuplicateIndex:
+    """SimHashIndex + bảng SQLite lưu fingerprint và CVAnalysisData đã chấm.
+
+    Mỗi lần tra cứu nạp thêm các entry mới (id tăng dần) do worker khác ghi vào. Entry thuộc về
+    client đã upload CV và chỉ được so khớp cho chính client đó; `info` (thông tin liên hệ) không
+    được lưu. Entry cũ hơn `ttl_seconds` hoặc vượt `max_entries` (cũ nhất trước) bị xóa định kỳ,
+    0 = không giới hạn.
+    """
+
+    def __init__(self, path: str, max_distance: int = 6, ttl_seconds: float = 0, max_entries: int = 0):
+        if not 0 <= max_distance <= MAX_SUPPORTED_DISTANCE:
+            logger.warning(f"NEAR_DUPLICATE_MAX_DISTANCE={max_distance} is outside 0-{MAX_SUPPORTED_DISTANCE}, clamping")
+            max_distance = max(0, min(MAX_SUPPORTED_DISTANCE, max_distance))
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.index = SimHashIndex(max_distance)
+        self._loaded_id = 0
+        self._adds_since_prune = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._drop_unowned_entries()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS near_duplicates ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, client_id TEXT NOT NULL, fingerprint INTEGER NOT NULL, "
+            "version TEXT NOT NULL, filename TEXT NOT NULL, result TEXT NOT NULL, total_tokens INTEGER NOT NULL, "
+            "created_at TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_near_duplicates_created ON near_duplicates (created_at)")
+        self.prune()
+        self.refresh()
+
+    def _drop_unowned_entries(self) -> None:
+        """Bảng near_duplicates kiểu cũ (không có client_id) chứa kết quả kèm thông tin liên hệ của
+        CV không xác định được chủ, xóa đi thay vì trả cho client khác."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(near_duplicates)")}
+        if columns and "client_id" not in columns:
+            logger.warning("Dropping near-duplicate entries stored without a client id")
+            self._conn.execute("DROP TABLE near_duplicates")
+
+    def _cutoff(self) -> str:
+        return (datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)).isoformat()
+
+    def _load(self, index: SimHashIndex, after_id: int) -> Tuple[int, int]:
+        """Nạp các entry có id > after_id vào index. Trả về (số entry, id lớn nhất đã nạp)."""
+        rows = self._conn.execute(
+            "SELECT id, fingerprint FROM near_duplicates WHERE id > ? ORDER BY id", (after_id,)
+        ).fetchall()
+        if not rows:
+            return 0, after_id
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        fingerprints = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows)).view(np.uint64)
+        if len(rows) == 1:
+            index.add(int(fingerprints[0]), int(ids[0]))
+        else:
+            index.add_many(fingerprints, ids)
+        return len(rows), int(ids[-1])
+
+    def refresh(self) -> int:
+        """Nạp các entry chưa có trong bộ nhớ. Trả về số entry mới."""
+        with self._lock:
+            count, self._loaded_id = self._load(self.index, self._loaded_id)
+            return count
+
+    def prune(self) -> int:
+        """Xóa entry quá `ttl_seconds` và entry cũ nhất vượt `max_entries`. Trả về số entry đã xóa."""
+        with self._lock:
+            self._adds_since_prune = 0
+            deleted = 0
+            if self.ttl_seconds > 0:
+                deleted += self._conn.execute(
+                    "DELETE FROM near_duplicates WHERE created_at < ?", (self._cutoff(),)
+                ).rowcount
+            if self.max_entries > 0:
+                deleted += self._conn.execute(
+                    "DELETE FROM near_duplicates WHERE id <= "
+                    "(SELECT id FROM near_duplicates ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+            if deleted:
+                # Dựng lại index trong bộ nhớ từ các entry còn lại rồi mới thay index cũ
+                index = SimHashIndex(self.index.max_distance)
+                _, self._loaded_id = self._load(index, 0)
+                self.index = index
+                logger.info(f"Pruned {deleted} near-duplicate entries")
+            return deleted
+
+    def find(self, fingerprint: int, version: str, client_id: str) -> Optional[NearDuplicateMatch]:
+        """CV đã chấm gần nhất của `client_id` (cùng analysis version, chưa hết hạn) trong phạm vi max_distance."""
+        self.refresh()
+        cutoff = self._cutoff() if self.ttl_seconds > 0 else ""
+        for entry_id, distance in self.index.search(fingerprint):
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT version, filename, result, total_tokens, created_at FROM near_duplicates "
+                    "WHERE id = ? AND client_id = ?",
+                    (entry_id, client_id),
+                ).fetchone()
+            if row is not None and row[0] == f"{SIMHASH_VERSION}:{version}" and row[4] >= cutoff:
+                return NearDuplicateMatch(entry_id, distance, row[1], row[4], json.loads(row[2]), row[3])
+        return None
+
+    def add(self, fingerprint: int, version: str, client_id: str, filename: str, result: Dict, total_tokens: int = 0) -> int:
+        # Thông tin liên hệ luôn được trích xuất lại từ CV mới, không lưu
+        result = {key: value for key, value in result.items() if key != "info"}
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO near_duplicates (client_id, fingerprint, version, filename, result, total_tokens, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    client_id,
+                    _to_signed(fingerprint),
+                    f"{SIMHASH_VERSION}:{version}",
+                    filename,
+                    json.dumps(result, ensure_ascii=False),
+                    total_tokens,
+                    datetime.now(timezone.utc).isoformat(),
+                ),
+            )
+            self._adds_since_prune += 1
+            prune_due = self._adds_since_prune >= _PRUNE_EVERY
+        if prune_due:
+            self.prune()
+        self.refresh()
+        return cursor.lastrowid
+
+
+_near_duplicate_index_instance: Optional[NearDuplicateIndex] = None
+
+
+def get_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """Trả về None khi NEAR_DUPLICATE_ENABLED=false."""
+    global _near_duplicate_index_instance
+    if _near_duplicate_index_instance is None and config.NEAR_DUPLICATE_ENABLED:
+        _near_duplicate_index_instance = NearDuplicateIndex(
+            config.NEAR_DUPLICATE_PATH,
+            max_distance=config.NEAR_DUPLICATE_MAX_DISTANCE,
+            ttl_seconds=config.NEAR_DUPLICATE_TTL_DAYS * 86400,
+            max_entries=config.NEAR_DUPLICATE_MAX_ENTRIES,
+        )
+    return _near_duplicate_index_instance
@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import logging
+from typing import List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from fastapi import HTTPException
+
+from config import config
+from services.cache import get_result_cache
+from services.extraction_pool import ExtractionExecutor
+from services.metrics import OCR_PAGES
+
+logger = logging.getLogger(__name__)
+
+# Trang cần OCR: (số trang, hash nội dung trang, PDF chỉ chứa trang đó)
+PageImage = Tuple[int, str, bytes]
+
+
+# page_content_hash / extract_page chạy trong extraction worker (cùng document đang parse)
+def page_content_hash(document: fitz.Document, page: fitz.Page) -> str:
+    """Hash content stream và dữ liệu ảnh của trang, không phụ thuộc vị trí trang trong file."""
+    digest = hashlib.sha256(page.read_contents())
+    for image in page.get_images(full=True):
+        digest.update(document.xref_stream_raw(image[0]) or b"")
+    return digest.hexdigest()
+
+
+def extract_page(document: fitz.Document, page_number: int) -> bytes:
+    single = fitz.open()
+    try:
+        single.insert_pdf(document, from_page=page_number, to_page=page_number)
+        return single.tobytes(garbage=3, deflate=True)
+    finally:
+        single.close()
+
+
+# Chạy trong OCR worker, phải là hàm sync ở module level để pickle được
+def _ocr_page(page_pdf: bytes, language: str, dpi: int, tessdata: str) -> str:
+    document = fitz.open(stream=page_pdf, filetype="pdf")
+    try:
+        page = document[0]
+        textpage = page.get_textpage_ocr(language=language, dpi=dpi, full=True, tessdata=tessdata)
+        return page.get_text(textpage=textpage).strip()
+    finally:
+        document.close()
+
+
+class OCRService:
+    """OCR trang PDF chỉ có ảnh bằng Tesseract (PyMuPDF), trong pool riêng.
+
+    Pool OCR tách khỏi extraction executor và bị giới hạn bởi semaphore bằng số worker,
+    nên CV scan không chiếm worker của request thường; timeout tính cho từng trang.
+    Kết quả được cache theo hash nội dung trang (cùng một trang scan xuất hiện lại
+    trong file khác vẫn hit cache).
+    """
+
+    def __init__(self, executor: ExtractionExecutor, tessdata: str, language: str = "vie+eng", dpi: int = 200):
+        self.executor = executor
+        self.tessdata = tessdata
+        self.language = language
+        self.dpi = dpi
+        self._semaphore = asyncio.Semaphore(executor.max_workers)
+
+    def _cache_key(self, page_hash: str) -> str:
+        return f"ocr:{page_hash}:{self.language}:{self.dpi}"
+
+    async def ocr_page(self, page: PageImage) -> str:
+        """Text của trang, chuỗi rỗng nếu OCR lỗi/timeout hoặc trang không có chữ."""
+        page_number, page_hash, page_pdf = page
+        cache = get_result_cache()
+        if cache:
+            cached = cache.get_ocr_text(self._cache_key(page_hash))
+            if cached is not None:
+                OCR_PAGES.labels("cache_hit").inc()
+                return cached
+
+        async with self._semaphore:
+            try:
+                text = await self.executor.run(_ocr_page, page_pdf, self.language, self.dpi, self.tessdata)
+            except HTTPException as e:
+                OCR_PAGES.labels("failed").inc()
+                logger.warning(f"OCR failed for page {page_number + 1}: {e.detail}")
+                return ""
+
+        OCR_PAGES.labels("ok" if text else "empty").inc()
+        if cache:
+            cache.set_ocr_text(self._cache_key(page_hash), text)
+        return text
+
+    async def ocr_pages(self, pages: List[PageImage]) -> List[str]:
+        return list(await asyncio.gather(*(self.ocr_page(page) for page in pages)))
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
+
+
+_ocr_service_instance: Optional[OCRService] = None
+_ocr_unavailable = False
+
+
+def get_ocr_service() -> Optional[OCRService]:
+    """Trả về None khi OCR_ENABLED=false hoặc không tìm thấy Tesseract."""
+    global _ocr_service_instance, _ocr_unavailable
+    if _ocr_service_instance is None and config.OCR_ENABLED and not _ocr_unavailable:
+        try:
+            tessdata = fitz.get_tessdata(config.OCR_TESSDATA or None)
+        except Exception as e:
+            logger.warning(f"OCR disabled: Tesseract not found ({e})")
+            _ocr_unavailable = True
+            return None
+        executor = ExtractionExecutor(
+            mode=config.OCR_EXECUTOR,
+            max_workers=config.OCR_WORKERS,
+            timeout=config.OCR_PAGE_TIMEOUT_SECONDS,
+            max_jobs_per_worker=config.EXTRACTION_MAX_JOBS_PER_WORKER,
+        )
+        _ocr_service_instance = OCRService(executor, tessdata, language=config.OCR_LANGUAGES, dpi=config.OCR_DPI)
+    return _ocr_service_instance
+
+
+def shutdown_ocr_service() -> None:
+    global _ocr_service_instance
+    if _ocr_service_instance is not None:
+        _ocr_service_instance.shutdown()
+        _ocr_service_instance = None
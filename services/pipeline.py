@@ -0,0 +1,345 @@
+import hashlib
+import os
+import time
+from contextlib import aclosing
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from config import config
+from models.schemas import CVAnalysisResponse, CVAnalysisData, Metadata, TokenUsage, CacheStatus, LLMParseInfo, ExtractionInfo, NearDuplicateInfo
+from services.cache import get_result_cache
+from services.extraction import extract_text_with_stats, extraction_budget_tag
+from services.info_extractor import extract_info
+from services.llm_service import STREAMED_FIELDS, get_llm_service
+from services.metrics import (
+    observe_stage,
+    record_cache_lookup,
+    record_token_usage,
+    stage,
+    start_stage_timings,
+)
+from services.near_duplicate import get_near_duplicate_index, simhash
+from services.singleflight import get_single_flight
+from services.upload import file_too_large_error, validate_file_signature
+
+
+def validate_filename(filename: str) -> None:
+    file_ext = os.path.splitext(filename)[1].lower()
+    if file_ext not in config.ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file format. Allowed formats: {', '.join(config.ALLOWED_EXTENSIONS)}"
+        )
+
+
+def validate_file_size(file_size: int) -> None:
+    if file_size > config.MAX_UPLOAD_SIZE_BYTES:
+        raise file_too_large_error(config.MAX_UPLOAD_SIZE_BYTES)
+
+
+async def load_cv_text(
+    file_content: bytes,
+    filename: str,
+    cache_status: Optional[CacheStatus] = None,
+) -> Tuple[str, Optional[Dict]]:
+    """Kiểm tra file và trích xuất cv_text (qua cache text nếu bật).
+
+    Trả về (cv_text, extraction stats); cache_status.text được cập nhật nếu truyền vào."""
+    validate_filename(filename)
+    validate_file_size(len(file_content))
+    validate_file_signature(file_content[:1024], filename)
+
+    cache = get_result_cache()
+    cv_text = None
+    extraction_stats = None
+    if cache:
+        text_key = cache.text_key(file_content, extraction_budget_tag())
+        cached_text = cache.get_text(text_key)
+        record_cache_lookup("text", cached_text is not None)
+        if cached_text is not None:
+            cv_text, extraction_stats = cached_text
+            if cache_status is not None:
+                cache_status.text = "hit"
+    if cv_text is None:
+        with stage("extraction"):
+            cv_text, extraction_stats = await extract_text_with_stats(file_content, filename)
+        if cache:
+            cache.set_text(text_key, cv_text, extraction_stats)
+
+    if not cv_text or len(cv_text.strip()) < 50:
+        raise HTTPException(
+            status_code=400,
+            detail="CV text is too short or empty. Please ensure the file contains readable text."
+        )
+    return cv_text, extraction_stats
+
+
+async def analyze_cv_file(
+    file_content: bytes,
+    filename: str,
+    upload_time: Optional[str] = None,
+    start_time: Optional[float] = None,
+    timings: Optional[Dict[str, float]] = None,
+    force_rescore: bool = False,
+    client_id: Optional[str] = None,
+) -> CVAnalysisResponse:
+    """Toàn bộ luồng xử lý một CV: kiểm tra file, trích xuất text, gọi LLM (qua cache)
+    và dựng CVAnalysisResponse. Lỗi được raise dưới dạng HTTPException.
+
+    Nếu CV gần trùng với một CV đã chấm của cùng `client_id`, kết quả cũ được dùng lại
+    (metadata.near_duplicate); không có client_id thì không tra cứu/lưu near-duplicate.
+    force_rescore=True bỏ qua kết quả đã lưu và luôn gọi LLM.
+    Các request cùng nội dung file đang chạy đồng thời được gộp thành một lần xử lý
+    (metadata.cache.analysis = "coalesced" với các request đi sau)."""
+    if start_time is None:
+        start_time = time.time()
+    if upload_time is None:
+        upload_time = datetime.now(timezone.utc).isoformat()
+    # Caller truyền timings khi đã bắt đầu đo từ trước (ví dụ stage upload)
+    if timings is None:
+        timings = start_stage_timings()
+
+    single_flight = get_single_flight()
+    if single_flight is None:
+        return await _analyze_cv_file(file_content, filename, upload_time, start_time, timings, force_rescore, client_id)
+
+    response, shared = await single_flight.do(
+        _single_flight_key(file_content, force_rescore, client_id),
+        lambda: _analyze_cv_file(file_content, filename, upload_time, start_time, timings, force_rescore, client_id),
+    )
+    if not shared:
+        return response
+    return _coalesced_response(response, filename, upload_time, start_time, timings)
+
+
+def _single_flight_key(file_content: bytes, force_rescore: bool, client_id: Optional[str]) -> str:
+    # Cùng file nhưng khác phiên bản prompt/model hoặc budget trích xuất thì không gộp;
+    # khác client cũng không gộp vì kết quả near-duplicate tra theo client
+    digest = hashlib.sha256(file_content).hexdigest()
+    version = get_llm_service().analysis_version
+    return f"{version}:{extraction_budget_tag()}:{int(force_rescore)}:{client_id or ''}:{digest}"
+
+
+def _coalesced_response(
+    response: CVAnalysisResponse,
+    filename: str,
+    upload_time: str,
+    start_time: float,
+    timings: Dict[str, float],
+) -> CVAnalysisResponse:
+    """Kết quả của request khác cùng nội dung: dùng chung data, metadata theo request này.
+
+    Không tính token LLM (giống cache hit) để quota không bị trừ hai lần."""
+    metadata = response.metadata
+    if metadata.token_usage is not None:
+        saved_tokens = metadata.token_usage.total_tokens
+    else:
+        saved_tokens = metadata.cache.saved_tokens
+    processing_seconds = time.time() - start_time
+    observe_stage("total", processing_seconds)
+    return response.model_copy(update={"metadata": metadata.model_copy(update={
+        "filename": filename,
+        "upload_time": upload_time,
+        "processing_time_ms": int(processing_seconds * 1000),
+        "token_usage": None,
+        "cache": metadata.cache.model_copy(update={"analysis": "coalesced", "saved_tokens": saved_tokens}),
+        "stages_ms": dict(timings) if config.METADATA_STAGE_TIMINGS else None,
+    })})
+
+
+@dataclass
+class _StoredAnalysis:
+    """Kết quả tra cứu phân tích đã lưu (cache chính xác hoặc near-duplicate) của một cv_text."""
+
+    cache_status: CacheStatus
+    client_id: Optional[str] = None
+    analysis_key: Optional[str] = None
+    fingerprint: Optional[int] = None
+    result: Optional[Dict] = None
+    near_duplicate: Optional[NearDuplicateInfo] = None
+
+    @property
+    def scored(self) -> bool:
+        """True khi kết quả vừa được LLM chấm (cần lưu lại)."""
+        return self.cache_status.analysis != "hit" and self.near_duplicate is None
+
+
+def _find_stored_analysis(cv_text: str, cache_status: CacheStatus, force_rescore: bool, client_id: Optional[str]) -> _StoredAnalysis:
+    cache = get_result_cache()
+    llm_service = get_llm_service()
+    stored = _StoredAnalysis(cache_status, client_id)
+    if cache:
+        stored.analysis_key = cache.analysis_key(cv_text, llm_service.analysis_version)
+        if not force_rescore:
+            stored.result = cache.get_analysis(stored.analysis_key)
+            record_cache_lookup("analysis", stored.result is not None)
+
+    near_index = get_near_duplicate_index() if client_id else None
+    near_match = None
+    if near_index is not None and stored.result is None:
+        with stage("near_duplicate"):
+            stored.fingerprint = simhash(cv_text)
+            if not force_rescore:
+                near_match = near_index.find(stored.fingerprint, llm_service.analysis_version, client_id)
+        if not force_rescore:
+            record_cache_lookup("near_duplicate", near_match is not None)
+
+    if stored.result is not None:
+        cache_status.analysis = "hit"
+        cached_usage = stored.result.pop("_token_usage", None)
+        if cached_usage:
+            cache_status.saved_tokens = cached_usage.get("total_tokens", 0)
+    elif near_match is not None:
+        stored.result = near_match.result
+        # Index không lưu info: thông tin liên hệ luôn lấy từ CV mới, location (do LLM điền) để trống
+        stored.result["info"] = extract_info(cv_text)
+        cache_status.saved_tokens = near_match.total_tokens
+        stored.near_duplicate = NearDuplicateInfo(
+            distance=near_match.distance,
+            similarity=near_match.similarity,
+            filename=near_match.filename,
+            scored_at=near_match.scored_at,
+        )
+    return stored
+
+
+def _build_response(
+    filename: str,
+    upload_time: str,
+    start_time: float,
+    timings: Dict[str, float],
+    extraction_stats: Optional[Dict],
+    stored: _StoredAnalysis,
+) -> CVAnalysisResponse:
+    """Dựng CVAnalysisResponse từ kết quả phân tích (stored.result) và lưu kết quả vừa chấm
+    vào cache và near-duplicate index."""
+    analysis_result = stored.result
+    token_usage = None
+    llm_parse = None
+    if stored.scored:
+        token_usage_data = analysis_result.pop("_token_usage", None)
+        if token_usage_data:
+            token_usage = TokenUsage(**token_usage_data)
+            record_token_usage(token_usage)
+        llm_parse_data = analysis_result.pop("_llm_parse", None)
+        if llm_parse_data:
+            llm_parse = LLMParseInfo(**llm_parse_data)
+
+    processing_seconds = time.time() - start_time
+    processing_time_ms = int(processing_seconds * 1000)
+    observe_stage("total", processing_seconds)
+
+    cache = get_result_cache()
+    near_index = get_near_duplicate_index() if stored.client_id else None
+    cache_status = stored.cache_status
+    try:
+        data = CVAnalysisData(**analysis_result)
+        metadata = Metadata(
+            filename=filename,
+            upload_time=upload_time,
+            processing_time_ms=processing_time_ms,
+            token_usage=token_usage,
+            cache=cache_status,
+            llm_parse=llm_parse,
+            extraction=ExtractionInfo(**extraction_stats) if extraction_stats else None,
+            near_duplicate=stored.near_duplicate,
+            stages_ms=dict(timings) if config.METADATA_STAGE_TIMINGS else None
+        )
+        scored = stored.scored
+        # Dump một lần, dùng chung cho cache và near-duplicate index
+        dumped = data.model_dump() if scored and (cache or near_index is not None) else None
+        analysis_version = get_llm_service().analysis_version
+        if cache and scored:
+            cached_result = dict(dumped)
+            if token_usage:
+                cached_result["_token_usage"] = token_usage.model_dump()
+            cache.set_analysis(stored.analysis_key, cached_result)
+        if near_index is not None and scored:
+            near_index.add(
+                stored.fingerprint,
+                analysis_version,
+                stored.client_id,
+                filename,
+                dumped,
+                total_tokens=token_usage.total_tokens if token_usage else 0,
+            )
+        return CVAnalysisResponse(status="success", data=data, metadata=metadata)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Invalid response format from LLM: {str(e)}"
+        )
+
+
+def _new_cache_status() -> CacheStatus:
+    return CacheStatus() if get_result_cache() else CacheStatus(text="disabled", analysis="disabled")
+
+
+async def _analyze_cv_file(
+    file_content: bytes,
+    filename: str,
+    upload_time: str,
+    start_time: float,
+    timings: Dict[str, float],
+    force_rescore: bool,
+    client_id: Optional[str],
+) -> CVAnalysisResponse:
+    cache_status = _new_cache_status()
+    cv_text, extraction_stats = await load_cv_text(file_content, filename, cache_status)
+
+    stored = _find_stored_analysis(cv_text, cache_status, force_rescore, client_id)
+    if stored.result is None:
+        stored.result = await get_llm_service().analyze_cv(cv_text)
+    return _build_response(filename, upload_time, start_time, timings, extraction_stats, stored)
+
+
+async def analyze_cv_file_stream(
+    file_content: bytes,
+    filename: str,
+    upload_time: Optional[str] = None,
+    start_time: Optional[float] = None,
+    timings: Optional[Dict[str, float]] = None,
+    force_rescore: bool = False,
+    client_id: Optional[str] = None,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Như analyze_cv_file nhưng trả kết quả dần, dạng (event, data):
+
+    - "info": thông tin liên hệ trích xuất local, ngay sau bước trích xuất text;
+    - từng trường trong STREAMED_FIELDS khi LLM viết xong trường đó;
+    - "overall_score": điểm tổng tính ở backend;
+    - "result": CVAnalysisResponse đầy đủ.
+
+    Kết quả đã lưu (cache, near-duplicate) được gửi ngay theo cùng thứ tự. Lỗi trước event
+    đầu tiên được raise dưới dạng HTTPException như analyze_cv_file; request streaming không
+    được gộp single-flight."""
+    if start_time is None:
+        start_time = time.time()
+    if upload_time is None:
+        upload_time = datetime.now(timezone.utc).isoformat()
+    if timings is None:
+        timings = start_stage_timings()
+
+    cache_status = _new_cache_status()
+    cv_text, extraction_stats = await load_cv_text(file_content, filename, cache_status)
+
+    stored = _find_stored_analysis(cv_text, cache_status, force_rescore, client_id)
+    if stored.result is not None:
+        yield "info", stored.result.get("info", {})
+        for name in STREAMED_FIELDS:
+            if name in stored.result:
+                yield name, stored.result[name]
+    else:
+        # aclosing: client ngắt kết nối thì lời gọi LLM đang stream được hủy ngay
+        async with aclosing(get_llm_service().analyze_cv_stream(cv_text)) as events:
+            async for name, value in events:
+                if name == "result":
+                    stored.result = value
+                else:
+                    yield name, value
+
+    response = _build_response(filename, upload_time, start_time, timings, extraction_stats, stored)
+    yield "overall_score", response.data.overall_score
+    yield "result", response
@@ -1,10 +1,9 @@
-def build_cv_analysis_prompt(cv_text: str) -> str:
-    prompt = f"""Phân tích CV và trả về CHỈ JSON hợp lệ, KHÔNG markdown.
+import hashlib
+
 
-CV:
-{cv_text}
+_PROMPT_HEADER = "Phân tích CV và trả về CHỈ JSON hợp lệ, KHÔNG markdown."
 
-QUY TẮC:
+_PROMPT_RUBRIC = """QUY TẮC:
 - Mỗi score (0-100) kèm reason cụ thể từ CV.
 - Backend sẽ tính lại overall_score theo trọng số level.
 
@@ -29,33 +28,52 @@ strengths/weaknesses/suggestions: 3-5 mục, tiếng Việt, mỗi phần tử 1
 
 YÊU CẦU: TẤT CẢ nội dung TIẾNG VIỆT (trừ level và số điểm). CHỈ JSON, không escape, không xuống dòng trong arrays.
 
-{{
+{
   "overall_score": <0-100>,
   "level": "<intern|fresher|junior|mid|senior>",
   "field": "<tên lĩnh vực tiếng Việt>",
-  "info": {{
+  "info": {
     "location": "<địa chỉ/thành phố hoặc '' nếu không có>"
-  }},
-  "core_scores": {{
-    "format": {{"score": <0-100>, "reason": "<lý do cụ thể>"}},
-    "experience": {{"score": <0-100>, "reason": "<lý do cụ thể, impact, level>"}},
-    "skills": {{"score": <0-100>, "reason": "<lý do cụ thể, hard skills, mức độ>"}},
-    "soft_skills": {{"score": <0-100>, "reason": "<lý do cụ thể về kỹ năng mềm>"}},
-    "education": {{"score": <0-100>, "reason": "<lý do cụ thể, GPA/nơi học nếu có>"}},
-    "field_match": {{"score": <0-100>, "reason": "<lý do CV phù hợp/không phù hợp field>"}}
-  }},
-  "bonus_scores": {{
-    "portfolio": {{"score": <0-100>, "reason": "<lý do cụ thể, link/project>"}},
-    "certificates": {{"score": <0-100>, "reason": "<lý do cụ thể về chứng chỉ>"}},
-    "awards": {{"score": <0-100>, "reason": "<giải thưởng nếu có, nếu không có thì giải thích điểm trung lập>"}},
-    "scholarships": {{"score": <0-100>, "reason": "<học bổng nếu có, nếu không có thì giải thích điểm trung lập>"}},
-    "side_projects": {{"score": <0-100>, "reason": "<dự án cá nhân nếu có, nếu không có thì giải thích điểm trung lập>"}},
-    "community": {{"score": <0-100>, "reason": "<hoạt động cộng đồng/CLB nếu có, nếu không có thì giải thích điểm trung lập>"}}
-  }},
+  },
+  "core_scores": {
+    "format": {"score": <0-100>, "reason": "<lý do cụ thể>"},
+    "experience": {"score": <0-100>, "reason": "<lý do cụ thể, impact, level>"},
+    "skills": {"score": <0-100>, "reason": "<lý do cụ thể, hard skills, mức độ>"},
+    "soft_skills": {"score": <0-100>, "reason": "<lý do cụ thể về kỹ năng mềm>"},
+    "education": {"score": <0-100>, "reason": "<lý do cụ thể, GPA/nơi học nếu có>"},
+    "field_match": {"score": <0-100>, "reason": "<lý do CV phù hợp/không phù hợp field>"}
+  },
+  "bonus_scores": {
+    "portfolio": {"score": <0-100>, "reason": "<lý do cụ thể, link/project>"},
+    "certificates": {"score": <0-100>, "reason": "<lý do cụ thể về chứng chỉ>"},
+    "awards": {"score": <0-100>, "reason": "<giải thưởng nếu có, nếu không có thì giải thích điểm trung lập>"},
+    "scholarships": {"score": <0-100>, "reason": "<học bổng nếu có, nếu không có thì giải thích điểm trung lập>"},
+    "side_projects": {"score": <0-100>, "reason": "<dự án cá nhân nếu có, nếu không có thì giải thích điểm trung lập>"},
+    "community": {"score": <0-100>, "reason": "<hoạt động cộng đồng/CLB nếu có, nếu không có thì giải thích điểm trung lập>"}
+  },
   "credibility_issues": ["<vấn đề 1 nếu có>", "<vấn đề 2 nếu có>"],
   "strengths": ["<điểm mạnh 1>", "<điểm mạnh 2>", ...],
   "weaknesses": ["<điểm yếu 1>", "<điểm yếu 2>", ...],
   "suggestions": ["<gợi ý 1>", "<gợi ý 2>", ...]
-}}"""
+}"""
+
+# Phần tĩnh của prompt (rubric + JSON schema), gửi dưới dạng system instruction / context cache
+CV_ANALYSIS_SYSTEM_INSTRUCTION = f"{_PROMPT_HEADER}\n\n{_PROMPT_RUBRIC}"
+
+
+def build_cv_analysis_user_prompt(cv_text: str) -> str:
+    """Phần thay đổi theo từng CV, đi kèm CV_ANALYSIS_SYSTEM_INSTRUCTION."""
+    return f"CV:\n{cv_text}"
+
+
+def build_cv_analysis_prompt(cv_text: str) -> str:
+    """Prompt đầy đủ dạng một khối (rubric và CV trong cùng nội dung)."""
+    prompt = f"{_PROMPT_HEADER}\n\nCV:\n{cv_text}\n\n{_PROMPT_RUBRIC}"
     
     return prompt
+
+
+# Đổi khi nội dung prompt thay đổi, dùng làm một phần của cache key
+PROMPT_VERSION = hashlib.sha256(
+    (CV_ANALYSIS_SYSTEM_INSTRUCTION + build_cv_analysis_user_prompt("")).encode("utf-8")
+).hexdigest()[:12]
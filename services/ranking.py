@@ -0,0 +1,606 @@
+"""Xếp hạng CV theo job description (JD) bằng BM25 trên cv_text đã trích xuất.
+
+Mỗi CV gửi qua /rank/index được lưu trong SQLite cùng client đã gửi và kết quả phân tích
+nếu đã chấm; /rank chỉ tìm trong các CV của chính client đó. Inverted index nằm trong bộ nhớ dưới dạng các segment numpy (CSR) và
+được snapshot ra file .npz để khi restart không phải tokenize lại toàn bộ CV.
+Với một JD, top K lấy từ BM25 trong vài ms; chỉ shortlist được gửi qua
+LLMService.analyze_cv để chấm đầy đủ.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+from config import config
+from models.schemas import CVAnalysisData, RankedCV, RankResponse, TokenUsage
+from services.cache import get_result_cache, normalize_cv_text
+from services.llm_service import get_llm_service
+from services.metrics import record_cache_lookup, record_token_usage, stage
+
+logger = logging.getLogger(__name__)
+
+# Tăng khi đổi tokenizer hoặc định dạng snapshot, snapshot cũ sẽ bị bỏ qua và index được dựng lại
+INDEX_VERSION = "1"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD = re.compile(r"\w+")
+_MAX_TOKEN_LENGTH = 40
+_MAX_TF = int(np.iinfo(np.uint16).max)
+
+# (vị trí document trong index, term ids, term frequencies)
+_PendingDoc = Tuple[int, np.ndarray, np.ndarray]
+
+
+def tokenize(text: str) -> List[str]:
+    """Từ viết thường dài 2-40 ký tự (tiếng Việt tách theo âm tiết)."""
+    return [word for word in _WORD.findall(text.lower()) if 1 < len(word) <= _MAX_TOKEN_LENGTH]
+
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array), 1024), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class _Segment:
+    """Inverted index bất biến dạng CSR: postings của terms[i] là docs/tfs[offsets[i]:offsets[i + 1]],
+    sắp xếp theo vị trí document."""
+
+    def __init__(self, term_ids: np.ndarray, docs: np.ndarray, tfs: np.ndarray, doc_count: int):
+        # Mỗi cặp (term, document) là duy nhất, sort theo một key int64 nhanh hơn lexsort
+        order = np.argsort((term_ids.astype(np.int64) << 32) | docs.astype(np.int64))
+        term_ids = term_ids[order]
+        starts = np.flatnonzero(np.diff(term_ids, prepend=-1)) if len(term_ids) else np.empty(0, dtype=np.int64)
+        self.terms = term_ids[starts]
+        self.offsets = np.append(starts, len(term_ids)).astype(np.int64)
+        self.docs = docs[order]
+        self.tfs = tfs[order]
+        self.doc_count = doc_count
+
+    @classmethod
+    def from_docs(cls, docs: Sequence[_PendingDoc]) -> "_Segment":
+        lengths = [len(term_ids) for _, term_ids, _ in docs]
+        positions = np.repeat(np.array([position for position, _, _ in docs], dtype=np.uint32), lengths)
+        term_ids = np.concatenate([term_ids for _, term_ids, _ in docs])
+        tfs = np.concatenate([tfs for _, _, tfs in docs])
+        return cls(term_ids, positions, tfs, len(docs))
+
+    @classmethod
+    def merge(cls, segments: Sequence["_Segment"]) -> "_Segment":
+        return cls(
+            np.concatenate([np.repeat(s.terms, np.diff(s.offsets)) for s in segments]),
+            np.concatenate([s.docs for s in segments]),
+            np.concatenate([s.tfs for s in segments]),
+            sum(s.doc_count for s in segments),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.terms.nbytes + self.offsets.nbytes + self.docs.nbytes + self.tfs.nbytes
+
+
+class BM25Index:
+    """BM25 trên các segment bất biến + danh sách document chờ.
+
+    Document mới được gom thành segment ở lần search kế tiếp; khi số segment vượt
+    max_segments, hai segment nhỏ nhất được merge để chi phí search không tăng theo số lần thêm.
+    """
+
+    def __init__(self, max_segments: int = 8):
+        self.max_segments = max_segments
+        self.vocabulary: Dict[str, int] = {}
+        self._df = np.zeros(0, dtype=np.int32)
+        self._doc_len = np.zeros(0, dtype=np.float32)
+        self._doc_ids = np.zeros(0, dtype=np.int64)
+        self._count = 0
+        self._total_len = 0
+        self._segments: List[_Segment] = []
+        self._pending: List[_PendingDoc] = []
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def last_doc_id(self) -> int:
+        return int(self._doc_ids[self._count - 1]) if self._count else 0
+
+    @property
+    def nbytes(self) -> int:
+        arrays = self._df.nbytes + self._doc_len.nbytes + self._doc_ids.nbytes
+        return arrays + sum(segment.nbytes for segment in self._segments)
+
+    def add(self, doc_id: int, tokens: List[str]) -> None:
+        counts = Counter(tokens)
+        vocabulary = self.vocabulary
+        term_ids = np.fromiter(
+            (vocabulary.setdefault(term, len(vocabulary)) for term in counts), dtype=np.int32, count=len(counts)
+        )
+        tfs = np.fromiter((min(tf, _MAX_TF) for tf in counts.values()), dtype=np.uint16, count=len(counts))
+        self._df = _grow(self._df, len(vocabulary))
+        self._df[term_ids] += 1
+
+        position = self._count
+        self._doc_len = _grow(self._doc_len, position + 1)
+        self._doc_ids = _grow(self._doc_ids, position + 1)
+        self._doc_len[position] = len(tokens)
+        self._doc_ids[position] = doc_id
+        self._count += 1
+        self._total_len += len(tokens)
+        self._pending.append((position, term_ids, tfs))
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._segments.append(_Segment.from_docs(self._pending))
+            self._pending = []
+        while len(self._segments) > self.max_segments:
+            self._segments.sort(key=lambda segment: segment.doc_count)
+            self._segments[:2] = [_Segment.merge(self._segments[:2])]
+
+    def search(self, tokens: List[str], top_k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """(doc_id, điểm BM25) của top_k document có điểm > 0, điểm cao trước.
+
+        `allowed` (mask bool theo vị trí document) giới hạn kết quả trong một tập document;
+        document ngoài mask luôn có điểm 0. IDF vẫn tính trên toàn bộ index.
+
+        Kiểu MaxScore: term hiếm (idf cao) được tính trên toàn bộ postings trước. Khi tổng
+        điểm tối đa của các term còn lại nhỏ hơn điểm thứ top_k hiện tại, document chưa có
+        điểm không thể vào top_k nữa, các term phổ biến còn lại chỉ được tính cho những
+        document ứng viên. Kết quả giống hệt tính đầy đủ.
+        """
+        self._flush()
+        count = self._count
+        term_ids = list({self.vocabulary[token] for token in tokens if token in self.vocabulary})
+        if not count or not term_ids:
+            return []
+
+        terms = np.array(term_ids, dtype=np.int32)
+        df = self._df[terms].astype(np.float64)
+        idf = np.log1p((count - df + 0.5) / (df + 0.5)).astype(np.float32)
+        by_idf = np.argsort(-idf, kind="stable")
+        terms, idf = terms[by_idf], idf[by_idf]
+        # remaining[i]: điểm tối đa các term i.. có thể cộng thêm cho một document (tf -> vô cùng)
+        remaining = np.append(np.cumsum((idf * (BM25_K1 + 1))[::-1])[::-1], 0.0)
+
+        average_len = self._total_len / count or 1.0
+        norm = (BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len[:count] / average_len)).astype(np.float32)
+        if allowed is not None:
+            # tf / (norm + tf) = 0 với norm vô cùng: document ngoài mask không bao giờ có điểm
+            norm[~allowed[:count]] = np.inf
+        postings = [self._term_postings(segment, terms) for segment in self._segments]
+        scores = np.zeros(count, dtype=np.float32)
+
+        top_k = min(top_k, count)
+        candidates = None
+        threshold = 0.0
+        checkpoint = remaining[0]
+        split = len(terms)
+        for i, weight in enumerate(idf.tolist()):
+            # Điểm thứ top_k chỉ tăng dần, tính lại khi phần còn lại giảm một nửa
+            if i and remaining[i] < checkpoint:
+                threshold = self._kth_score(scores, top_k)
+                checkpoint = remaining[i] / 2
+            if remaining[i] < threshold:
+                split = i
+                break
+            for segment, (positions, present) in zip(self._segments, postings):
+                if present[i]:
+                    self._score_term(segment, positions[i], weight, scores, norm)
+
+        if split < len(terms):
+            candidates = np.flatnonzero(scores >= threshold - remaining[split])
+            candidate_mask = np.zeros(count, dtype=bool)
+            candidate_mask[candidates] = True
+            for i, weight in enumerate(idf[split:].tolist(), split):
+                # Loại dần ứng viên không còn khả năng vào top_k khi phần điểm còn lại giảm
+                candidates = candidates[scores[candidates] >= threshold - remaining[i]]
+                threshold = max(threshold, self._kth_score(scores[candidates], top_k))
+                for segment, (positions, present) in zip(self._segments, postings):
+                    if present[i]:
+                        self._score_term(segment, positions[i], weight, scores, norm, candidates, candidate_mask)
+
+        if candidates is None:
+            top = np.argpartition(scores, count - top_k)[count - top_k:]
+        else:
+            # Top k chắc chắn nằm trong tập ứng viên (có ít nhất top_k document đạt threshold)
+            top_k = min(top_k, len(candidates))
+            top = candidates[np.argpartition(scores[candidates], len(candidates) - top_k)[len(candidates) - top_k:]]
+        top = top[np.lexsort((top, -scores[top]))]
+        top = top[scores[top] > 0]
+        return list(zip(self._doc_ids[top].tolist(), scores[top].tolist()))
+
+    @staticmethod
+    def _term_postings(segment: _Segment, terms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Vị trí của từng term trong segment.terms và mask term có trong segment."""
+        if not len(segment.terms):
+            return np.zeros(len(terms), dtype=np.int64), np.zeros(len(terms), dtype=bool)
+        positions = np.minimum(np.searchsorted(segment.terms, terms), len(segment.terms) - 1)
+        return positions, segment.terms[positions] == terms
+
+    @staticmethod
+    def _kth_score(scores: np.ndarray, k: int) -> float:
+        positive = scores[scores > 0]
+        if len(positive) < k:
+            return 0.0
+        return float(np.partition(positive, len(positive) - k)[len(positive) - k])
+
+    @staticmethod
+    def _score_term(
+        segment: _Segment,
+        position: int,
+        weight: float,
+        scores: np.ndarray,
+        norm: np.ndarray,
+        candidates: Optional[np.ndarray] = None,
+        candidate_mask: Optional[np.ndarray] = None,
+    ) -> None:
+        start, end = segment.offsets[position], segment.offsets[position + 1]
+        docs = segment.docs[start:end]
+        tfs = segment.tfs[start:end]
+        if candidates is not None:
+            if len(candidates) * 16 < len(docs):
+                # Ít ứng viên: tra từng ứng viên bằng searchsorted (postings đã sort theo document)
+                found = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+                hit = docs[found] == candidates
+                docs, tfs = candidates[hit], tfs[found[hit]]
+            else:
+                # Mask có thể rộng hơn tập ứng viên hiện tại, chỉ tốn thêm phép tính
+                keep = candidate_mask[docs]
+                docs, tfs = docs[keep], tfs[keep]
+        # Index uint32 bị numpy đổi sang intp ở mỗi lần fancy indexing, đổi một lần ở đây
+        docs = docs.astype(np.intp)
+        tf = tfs.astype(np.float32)
+        denominator = norm.take(docs)
+        denominator += tf
+        np.divide(tf, denominator, out=tf)
+        tf *= np.float32(weight * (BM25_K1 + 1))
+        # Mỗi document xuất hiện tối đa một lần trong postings của một term
+        scores[docs] += tf
+
+    def save(self, path: str) -> None:
+        """Ghi index ra file .npz (gộp mọi segment thành một)."""
+        self._flush()
+        if len(self._segments) > 1:
+            self._segments = [_Segment.merge(self._segments)]
+        if self._segments:
+            segment = self._segments[0]
+        else:
+            segment = _Segment(np.empty(0, np.int32), np.empty(0, np.uint32), np.empty(0, np.uint16), 0)
+        # Term không chứa "\n" (chỉ gồm ký tự \w), thứ tự dict chính là term id
+        vocabulary = np.frombuffer("\n".join(self.vocabulary).encode("utf-8"), dtype=np.uint8)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                version=np.array(INDEX_VERSION),
+                vocabulary=vocabulary,
+                df=self._df[:len(self.vocabulary)],
+                doc_len=self._doc_len[:self._count],
+                doc_ids=self._doc_ids[:self._count],
+                total_len=np.array(self._total_len, dtype=np.int64),
+                terms=segment.terms,
+                offsets=segment.offsets,
+                docs=segment.docs,
+                tfs=segment.tfs,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, max_segments: int = 8) -> "BM25Index":
+        with np.load(path) as data:
+            if str(data["version"]) != INDEX_VERSION:
+                raise ValueError(f"index version {data['version']} != {INDEX_VERSION}")
+            index = cls(max_segments)
+            terms = data["vocabulary"].tobytes().decode("utf-8")
+            index.vocabulary = {term: term_id for term_id, term in enumerate(terms.split("\n"))} if terms else {}
+            index._df = data["df"].copy()
+            index._doc_len = data["doc_len"].copy()
+            index._doc_ids = data["doc_ids"].copy()
+            index._count = len(index._doc_ids)
+            index._total_len = int(data["total_len"])
+            segment = _Segment.__new__(_Segment)
+            segment.terms = data["terms"]
+            segment.offsets = data["offsets"]
+            segment.docs = data["docs"]
+            segment.tfs = data["tfs"]
+            segment.doc_count = index._count
+        if index._count:
+            index._segments = [segment]
+        return index
+
+
+class CVRankingIndex:
+    """BM25Index + bảng SQLite lưu cv_text, client sở hữu và CVAnalysisData của từng CV.
+
+    Giống NearDuplicateIndex, SQLite là dữ liệu gốc dùng chung giữa các worker và mỗi lần
+    search nạp thêm các CV mới (id tăng dần). Snapshot được ghi sau mỗi
+    `snapshot_every` CV mới và khi shutdown. Một index BM25 chung cho mọi client, search
+    chỉ trả về CV của client gọi (mask theo `_owners`).
+    """
+
+    def __init__(self, path: str, snapshot_every: int = 10000):
+        self.snapshot_path = f"{path}.bm25.npz"
+        self.snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._drop_unowned_documents()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cv_documents ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, client_id TEXT NOT NULL, text_hash TEXT NOT NULL, "
+            "filename TEXT NOT NULL, cv_text TEXT NOT NULL, created_at TEXT NOT NULL, "
+            "analysis TEXT, analysis_version TEXT, scored_at TEXT, UNIQUE (client_id, text_hash))"
+        )
+        # Client sở hữu document ở từng vị trí trong BM25Index (mã số nguyên, xem _owner_codes)
+        self._owner_codes: Dict[str, int] = {}
+        self._owners = np.zeros(0, dtype=np.int32)
+        self.index = self._load_snapshot()
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def count(self, client_id: str) -> int:
+        """Số CV đã index của một client."""
+        with self._lock:
+            code = self._owner_codes.get(client_id)
+            if code is None:
+                return 0
+            return int(np.count_nonzero(self._owners[:len(self.index)] == code))
+
+    def _drop_unowned_documents(self) -> None:
+        """Bảng cv_documents kiểu cũ (không có client_id) chứa CV không xác định được chủ, xóa đi
+        thay vì cho mọi client tìm thấy."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cv_documents)")}
+        if columns and "client_id" not in columns:
+            logger.warning("Dropping ranking documents indexed without a client id")
+            self._conn.execute("DROP TABLE cv_documents")
+            if os.path.exists(self.snapshot_path):
+                os.remove(self.snapshot_path)
+
+    def _owner_code(self, client_id: str) -> int:
+        return self._owner_codes.setdefault(client_id, len(self._owner_codes))
+
+    def _load_snapshot(self) -> BM25Index:
+        if os.path.exists(self.snapshot_path):
+            try:
+                index = BM25Index.load(self.snapshot_path)
+                last_id = self._conn.execute("SELECT MAX(id) FROM cv_documents").fetchone()[0] or 0
+                if index.last_doc_id <= last_id:
+                    owners = dict(self._conn.execute(
+                        "SELECT id, client_id FROM cv_documents WHERE id <= ?", (index.last_doc_id,)
+                    ))
+                    doc_ids = index._doc_ids[:len(index)].tolist()
+                    self._owners = np.fromiter(
+                        (self._owner_code(owners[doc_id]) for doc_id in doc_ids), dtype=np.int32, count=len(doc_ids)
+                    )
+                    return index
+                logger.warning(f"Ranking snapshot {self.snapshot_path} is ahead of the database, rebuilding")
+            except Exception as e:
+                logger.warning(f"Could not load ranking snapshot {self.snapshot_path}: {e}, rebuilding")
+        return BM25Index()
+
+    def refresh(self) -> int:
+        """Nạp các CV chưa có trong index. Trả về số CV mới."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT id, client_id, cv_text FROM cv_documents WHERE id > ? ORDER BY id", (self.index.last_doc_id,)
+            )
+            added = 0
+            for doc_id, client_id, cv_text in cursor:
+                position = len(self.index)
+                self._owners = _grow(self._owners, position + 1)
+                self._owners[position] = self._owner_code(client_id)
+                self.index.add(doc_id, tokenize(cv_text))
+                added += 1
+            self._unsaved += added
+            save = self._unsaved >= self.snapshot_every
+        if save:
+            self.save_snapshot()
+        return added
+
+    def save_snapshot(self) -> None:
+        with self._lock:
+            start = time.perf_counter()
+            self.index.save(self.snapshot_path)
+            self._unsaved = 0
+        logger.info(f"Ranking snapshot saved ({len(self.index)} CVs, {time.perf_counter() - start:.2f}s)")
+
+    def add(
+        self,
+        cv_text: str,
+        filename: str,
+        client_id: str,
+        analysis: Optional[Dict] = None,
+        analysis_version: Optional[str] = None,
+    ) -> int:
+        """Thêm CV của `client_id` (bỏ qua nếu client đã có cv_text này) và trả về cv_id.
+        Index được cập nhật ở lần search kế tiếp."""
+        text_hash = hashlib.sha256(normalize_cv_text(cv_text).encode("utf-8")).hexdigest()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO cv_documents (client_id, text_hash, filename, cv_text, created_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(client_id, text_hash) DO NOTHING",
+                (client_id, text_hash, filename, cv_text, datetime.now(timezone.utc).isoformat()),
+            )
+            doc_id = self._conn.execute(
+                "SELECT id FROM cv_documents WHERE client_id = ? AND text_hash = ?", (client_id, text_hash)
+            ).fetchone()[0]
+        if analysis is not None:
+            self.set_analysis(doc_id, analysis, analysis_version)
+        return doc_id
+
+    def set_analysis(self, doc_id: int, analysis: Dict, analysis_version: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE cv_documents SET analysis = ?, analysis_version = ?, scored_at = ? WHERE id = ?",
+                (json.dumps(analysis, ensure_ascii=False), analysis_version, datetime.now(timezone.utc).isoformat(), doc_id),
+            )
+
+    def search(self, job_description: str, top_k: int, client_id: str) -> List[Tuple[int, float]]:
+        """Top K trong các CV của `client_id`."""
+        self.refresh()
+        tokens = tokenize(job_description)
+        with self._lock:
+            code = self._owner_codes.get(client_id)
+            if code is None:
+                return []
+            return self.index.search(tokens, top_k, self._owners[:len(self.index)] == code)
+
+    def documents(self, doc_ids: List[int]) -> Dict[int, Dict]:
+        if not doc_ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, filename, cv_text, created_at, analysis, analysis_version FROM cv_documents "
+                f"WHERE id IN ({','.join('?' * len(doc_ids))})",
+                doc_ids,
+            ).fetchall()
+        return {
+            row[0]: {
+                "filename": row[1],
+                "cv_text": row[2],
+                "created_at": row[3],
+                "analysis": json.loads(row[4]) if row[4] else None,
+                "analysis_version": row[5],
+            }
+            for row in rows
+        }
+
+
+async def _score_shortlisted(index: CVRankingIndex, doc_id: int, cv_text: str) -> Tuple[CVAnalysisData, Optional[TokenUsage]]:
+    """Chấm một CV trong shortlist qua cache kết quả hoặc LLMService.analyze_cv."""
+    llm_service = get_llm_service()
+    version = llm_service.analysis_version
+    cache = get_result_cache()
+    if cache:
+        analysis_key = cache.analysis_key(cv_text, version)
+        cached = cache.get_analysis(analysis_key)
+        record_cache_lookup("analysis", cached is not None)
+        if cached is not None:
+            cached.pop("_token_usage", None)
+            index.set_analysis(doc_id, cached, version)
+            return CVAnalysisData(**cached), None
+
+    result = await llm_service.analyze_cv(cv_text)
+    usage = result.pop("_token_usage", None)
+    result.pop("_llm_parse", None)
+    data = CVAnalysisData(**result)
+    token_usage = TokenUsage(**usage) if usage else None
+    if token_usage:
+        record_token_usage(token_usage)
+
+    dumped = data.model_dump()
+    if cache:
+        cache.set_analysis(analysis_key, {**dumped, "_token_usage": usage} if usage else dumped)
+    index.set_analysis(doc_id, dumped, version)
+    return data, token_usage
+
+
+def _sum_token_usage(usages: List[TokenUsage]) -> Optional[TokenUsage]:
+    if not usages:
+        return None
+    return TokenUsage(
+        prompt_tokens=sum(u.prompt_tokens for u in usages),
+        cached_prompt_tokens=sum(u.cached_prompt_tokens for u in usages),
+        completion_tokens=sum(u.completion_tokens for u in usages),
+        total_tokens=sum(u.total_tokens for u in usages),
+    )
+
+
+async def rank_cvs(job_description: str, top_k: int, shortlist: int, client_id: str) -> RankResponse:
+    """Top K CV của `client_id` theo BM25; `shortlist` CV đầu tiên chưa có analysis được chấm bằng LLM."""
+    start_time = time.time()
+    index = get_ranking_index()
+    if index is None:
+        raise HTTPException(
+            status_code=503,
+            detail="CV ranking is disabled (RANKING_ENABLED=false)"
+        )
+
+    search_start = time.perf_counter()
+    with stage("ranking"):
+        # Có thể phải tokenize CV mới do worker khác thêm vào, không chạy trên event loop
+        hits = await asyncio.to_thread(index.search, job_description, top_k, client_id)
+    search_time_ms = round((time.perf_counter() - search_start) * 1000, 2)
+
+    documents = index.documents([doc_id for doc_id, _ in hits])
+    version = get_llm_service().analysis_version
+    results: List[RankedCV] = []
+    pending = []
+    for rank, (doc_id, relevance) in enumerate(hits, 1):
+        document = documents[doc_id]
+        stored = document["analysis"] if document["analysis_version"] == version else None
+        item = RankedCV(
+            rank=rank,
+            cv_id=doc_id,
+            filename=document["filename"],
+            relevance=round(relevance, 4),
+            indexed_at=document["created_at"],
+            analysis=CVAnalysisData(**stored) if stored else None,
+        )
+        results.append(item)
+        if stored is None and rank <= shortlist:
+            pending.append((item, _score_shortlisted(index, doc_id, document["cv_text"])))
+
+    usages = []
+    outcomes = await asyncio.gather(*(scoring for _, scoring in pending), return_exceptions=True)
+    for (item, _), outcome in zip(pending, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.warning(f"Could not score shortlisted CV {item.cv_id}: {outcome}")
+            item.error = outcome.detail if isinstance(outcome, HTTPException) else str(outcome)
+            continue
+        item.analysis, token_usage = outcome
+        item.rescored = True
+        if token_usage:
+            usages.append(token_usage)
+
+    return RankResponse(
+        results=results,
+        indexed=index.count(client_id),
+        search_time_ms=search_time_ms,
+        processing_time_ms=int((time.time() - start_time) * 1000),
+        token_usage=_sum_token_usage(usages),
+    )
+
+
+_ranking_index_instance: Optional[CVRankingIndex] = None
+
+
+def get_ranking_index() -> Optional[CVRankingIndex]:
+    """Trả về None khi RANKING_ENABLED=false."""
+    global _ranking_index_instance
+    if _ranking_index_instance is None and config.RANKING_ENABLED:
+        _ranking_index_instance = CVRankingIndex(
+            config.RANKING_INDEX_PATH,
+            snapshot_every=config.RANKING_SNAPSHOT_EVERY,
+        )
+    return _ranking_index_instance
+
+
+def shutdown_ranking_index() -> None:
+    """Ghi snapshot các CV chưa lưu để lần khởi động sau không phải tokenize lại."""
+    global _ranking_index_instance
+    index = _ranking_index_instance
+    _ranking_index_instance = None
+    if index is not None and index._unsaved:
+        try:
+            index.save_snapshot()
+        except Exception as e:
+            logger.warning(f"Could not save ranking snapshot: {e}")
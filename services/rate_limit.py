@@ -0,0 +1,192 @@
+import hashlib
+import logging
+import math
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class BucketBackend:
+    """Lưu trạng thái token bucket. Mỗi lần gọi `consume` là một thao tác nguyên tử."""
+
+    async def consume(self, key: str, capacity: float, refill_per_second: float, cost: float, allow_debt: bool = False) -> Tuple[bool, float]:
+        """Nạp lại bucket theo thời gian rồi trừ `cost`.
+
+        - cost > 0: chỉ trừ nếu còn đủ token (hoặc luôn trừ nếu allow_debt, cho phép âm).
+        - cost == 0: chỉ kiểm tra bucket còn dương.
+        Trả về (allowed, số token còn lại).
+        """
+        raise NotImplementedError
+
+
+def _refill_and_take(tokens: float, elapsed: float, capacity: float, rate: float, cost: float, allow_debt: bool) -> Tuple[bool, float]:
+    tokens = min(capacity, tokens + max(0.0, elapsed) * rate)
+    if allow_debt or (cost > 0 and tokens >= cost) or (cost == 0 and tokens > 0):
+        return True, tokens - cost
+    return False, tokens
+
+
+class MemoryBucketBackend(BucketBackend):
+    """Bucket trong memory, chỉ có hiệu lực trong một process."""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def consume(self, key: str, capacity: float, refill_per_second: float, cost: float, allow_debt: bool = False) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, last = self._buckets.get(key, (capacity, now))
+        allowed, tokens = _refill_and_take(tokens, now - last, capacity, refill_per_second, cost, allow_debt)
+        self._buckets[key] = (tokens, now)
+        return allowed, tokens
+
+
+# Chạy nguyên tử trên Redis; dùng TIME của server để các replica không lệch đồng hồ
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local allow_debt = ARGV[4] == "1"
+local t = redis.call("TIME")
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local data = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if allow_debt or (cost > 0 and tokens >= cost) or (cost == 0 and tokens > 0) then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil((capacity - tokens) / rate) + 60)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketBackend(BucketBackend):
+    """Bucket lưu trên Redis, dùng chung giữa các worker/container."""
+
+    def __init__(self, client, prefix: str = "cv:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    async def consume(self, key: str, capacity: float, refill_per_second: float, cost: float, allow_debt: bool = False) -> Tuple[bool, float]:
+        allowed, tokens = await self._script(
+            keys=[self.prefix + key],
+            args=[capacity, refill_per_second, cost, "1" if allow_debt else "0"],
+        )
+        return bool(int(allowed)), float(tokens)
+
+
+class RateLimiter:
+    """Token-bucket rate limit theo API key (header X-API-Key, nếu key nằm trong API_KEYS)
+    hoặc theo IP, cộng với quota token LLM trừ theo TokenUsage.total_tokens sau mỗi lần gọi."""
+
+    def __init__(
+        self,
+        backend: BucketBackend,
+        ip_per_minute: int,
+        api_key_per_minute: int,
+        ip_token_quota_per_hour: int = 0,
+        api_key_token_quota_per_hour: int = 0,
+        api_keys: Optional[set] = None,
+    ):
+        self.backend = backend
+        self.api_keys = api_keys or set()
+        self._request_limits = {"ip": ip_per_minute, "key": api_key_per_minute}
+        self._token_quotas = {"ip": ip_token_quota_per_hour, "key": api_key_token_quota_per_hour}
+
+    def identify(self, request: Request) -> str:
+        api_key = request.headers.get("x-api-key")
+        if api_key and api_key in self.api_keys:
+            return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+        host = request.client.host if request.client else "unknown"
+        return "ip:" + host
+
+    @staticmethod
+    def _kind(identity: str) -> str:
+        return identity.split(":", 1)[0]
+
+    async def _consume(self, key: str, capacity: float, rate: float, cost: float, allow_debt: bool = False) -> Tuple[bool, float]:
+        try:
+            return await self.backend.consume(key, capacity, rate, cost, allow_debt)
+        except Exception as e:
+            # Backend lỗi (ví dụ Redis down): không chặn request
+            logger.warning(f"Rate limit backend error, allowing request: {e}")
+            return True, capacity
+
+    async def check(self, identity: str) -> None:
+        kind = self._kind(identity)
+        per_minute = self._request_limits[kind]
+        if per_minute > 0:
+            rate = per_minute / 60
+            allowed, tokens = await self._consume(f"req:{identity}", per_minute, rate, 1)
+            if not allowed:
+                raise self._limit_error(f"Rate limit exceeded: {per_minute} per 1 minute", (1 - tokens) / rate)
+
+        quota = self._token_quotas[kind]
+        if quota > 0:
+            rate = quota / 3600
+            allowed, tokens = await self._consume(f"tok:{identity}", quota, rate, 0)
+            if not allowed:
+                raise self._limit_error(f"LLM token quota exceeded: {quota} tokens per hour", -tokens / rate + 1)
+
+    async def charge_tokens(self, identity: str, total_tokens: int) -> None:
+        quota = self._token_quotas[self._kind(identity)]
+        if quota > 0 and total_tokens > 0:
+            await self._consume(f"tok:{identity}", quota, quota / 3600, total_tokens, allow_debt=True)
+
+    @staticmethod
+    def _limit_error(detail: str, retry_after: float) -> HTTPException:
+        return HTTPException(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+_rate_limiter_instance: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _rate_limiter_instance
+    if _rate_limiter_instance is None:
+        if config.RATE_LIMIT_BACKEND == "redis":
+            from services.redis_client import get_redis
+
+            backend = RedisBucketBackend(get_redis())
+        else:
+            backend = MemoryBucketBackend()
+        _rate_limiter_instance = RateLimiter(
+            backend,
+            ip_per_minute=config.RATE_LIMIT_PER_MINUTE,
+            api_key_per_minute=config.API_KEY_RATE_LIMIT_PER_MINUTE,
+            ip_token_quota_per_hour=config.TOKEN_QUOTA_PER_HOUR,
+            api_key_token_quota_per_hour=config.API_KEY_TOKEN_QUOTA_PER_HOUR,
+            api_keys=config.API_KEYS,
+        )
+    return _rate_limiter_instance
+
+
+async def rate_limit(request: Request) -> str:
+    """FastAPI dependency: kiểm tra limit và trả về identity để trừ quota sau đó."""
+    limiter = get_rate_limiter()
+    identity = limiter.identify(request)
+    await limiter.check(identity)
+    return identity
+
+
+async def charge_token_usage(identity: Optional[str], response) -> None:
+    """Trừ quota theo token thực dùng của một CVAnalysisResponse hoặc RankResponse (cache hit không tốn token)."""
+    if identity is None:
+        return
+    metadata = getattr(response, "metadata", None)
+    token_usage = metadata.token_usage if metadata is not None else response.token_usage
+    if token_usage is not None:
+        await get_rate_limiter().charge_tokens(identity, token_usage.total_tokens)
@@ -0,0 +1,26 @@
+from typing import Optional
+
+from config import config
+
+_redis_instance = None
+
+
+def get_redis():
+    """Redis client (redis.asyncio) dùng chung, tạo từ REDIS_URL.
+
+    Mọi server nói Redis protocol đều dùng được (Redis, Valkey, KeyDB...).
+    """
+    global _redis_instance
+    if _redis_instance is None:
+        if not config.REDIS_URL:
+            raise ValueError("REDIS_URL is required for the redis backend")
+        import redis.asyncio as redis
+
+        _redis_instance = redis.from_url(config.REDIS_URL)
+    return _redis_instance
+
+
+def set_redis(client: Optional[object]) -> None:
+    """Thay client, ví dụ bằng fakeredis khi chạy local."""
+    global _redis_instance
+    _redis_instance = client
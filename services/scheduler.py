@@ -0,0 +1,201 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from config import config
+from services.metrics import observe_stage, record_llm_queue_depth, record_scheduler_decision
+
+# Lớp ưu tiên, số nhỏ hơn được cấp slot LLM trước
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_BACKFILL = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch", PRIORITY_BACKFILL: "backfill"}
+
+# Lớp ưu tiên của request/job hiện tại; task con (single-flight, batch item) kế thừa khi được tạo
+_llm_priority: ContextVar[int] = ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+def set_llm_priority(priority: int) -> None:
+    _llm_priority.set(priority)
+
+
+class LLMOverloadedError(HTTPException):
+    """503 khi hàng đợi LLM đầy hoặc chờ quá hạn; Retry-After ước lượng thời gian hàng đợi rút hết."""
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": str(retry_after)})
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("priority", "deadline", "future")
+
+    def __init__(self, priority: int, deadline: float, future: "asyncio.Future"):
+        self.priority = priority
+        self.deadline = deadline
+        self.future = future
+
+
+class LLMScheduler:
+    """Admission control cho stage LLM: tối đa `max_concurrency` lời gọi chạy cùng lúc, phần còn
+    lại chờ trong hàng đợi ưu tiên có giới hạn.
+
+    - Dequeue theo (lớp ưu tiên, deadline): interactive trước batch trước backfill, cùng lớp thì
+      request sắp hết hạn trước. Waiter đã bị hủy (client ngắt kết nối) hoặc đã quá deadline bị
+      bỏ qua khi dequeue, không chiếm slot.
+    - Hàng đợi đầy: request mới đẩy waiter kém ưu tiên nhất ra (503) nếu ưu tiên cao hơn, ngược lại
+      chính nó nhận 503.
+    - Retry-After = số request đang chờ phía trước / max_concurrency * thời gian giữ slot trung bình
+      (EWMA đo thực tế).
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int = 256,
+        max_wait_seconds: Optional[Dict[int, float]] = None,
+        latency_alpha: float = 0.2,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds or {priority: 60.0 for priority in PRIORITY_NAMES}
+        self.latency_alpha = latency_alpha
+        self.active = 0
+        self._heap: List[Tuple[int, float, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._queued: Dict[int, int] = {priority: 0 for priority in PRIORITY_NAMES}
+        self._slot_seconds: Optional[float] = None
+
+    @property
+    def queued(self) -> int:
+        return sum(self._queued.values())
+
+    @property
+    def slot_seconds(self) -> Optional[float]:
+        """Thời gian giữ slot trung bình (EWMA), None khi chưa có lời gọi nào."""
+        return self._slot_seconds
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[int] = None) -> AsyncIterator[None]:
+        """Chờ tới lượt rồi giữ một slot LLM trong khối `async with`.
+
+        Mặc định dùng lớp ưu tiên của context hiện tại (set_llm_priority). Thời gian chờ được ghi
+        vào stage `llm_queue`.
+        """
+        if priority is None:
+            priority = _llm_priority.get()
+        start = time.perf_counter()
+        await self._acquire(priority)
+        observe_stage("llm_queue", time.perf_counter() - start)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._observe_slot(time.perf_counter() - start)
+            self._release()
+
+    def retry_after(self, priority: int) -> int:
+        """Số giây (làm tròn lên, tối thiểu 1) tới khi request lớp `priority` đến sau có thể được phục vụ."""
+        ahead = sum(count for p, count in self._queued.items() if p <= priority) + 1
+        slot_seconds = self._slot_seconds or 1.0
+        return max(1, math.ceil(ahead / self.max_concurrency * slot_seconds))
+
+    async def _acquire(self, priority: int) -> None:
+        if self.active < self.max_concurrency and self.queued == 0:
+            self.active += 1
+            record_scheduler_decision(PRIORITY_NAMES[priority], "admitted")
+            return
+
+        if self.queued >= self.max_queue:
+            victim = self._lowest_priority_waiter()
+            if victim is None or victim.priority <= priority:
+                record_scheduler_decision(PRIORITY_NAMES[priority], "rejected")
+                raise self._overloaded("LLM queue is full", priority)
+            # Request mới ưu tiên cao hơn: nhường chỗ bằng cách loại waiter kém ưu tiên nhất
+            self._drop(victim, "evicted", "LLM queue is full")
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, time.monotonic() + self.max_wait_seconds[priority], loop.create_future())
+        heapq.heappush(self._heap, (priority, waiter.deadline, next(self._seq), waiter))
+        self._set_queued(priority, 1)
+        try:
+            done, _ = await asyncio.wait({waiter.future}, timeout=waiter.deadline - time.monotonic())
+        except asyncio.CancelledError:
+            self._abandon(waiter, "cancelled")
+            raise
+        if not done:
+            self._abandon(waiter, "expired")
+            raise self._overloaded("Timed out waiting for an LLM slot", priority)
+        # Bị loại khỏi hàng đợi (evicted/expired lúc dequeue) thì raise 503 tại đây
+        waiter.future.result()
+
+    def _release(self) -> None:
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        while self.active < self.max_concurrency and self._heap:
+            waiter = heapq.heappop(self._heap)[3]
+            if waiter.future.done():
+                # Đã hủy hoặc đã bị loại, không còn tính trong hàng đợi
+                continue
+            if waiter.deadline <= now:
+                self._drop(waiter, "expired", "Timed out waiting for an LLM slot")
+                continue
+            self._set_queued(waiter.priority, -1)
+            self.active += 1
+            waiter.future.set_result(None)
+            record_scheduler_decision(PRIORITY_NAMES[waiter.priority], "admitted")
+
+    def _drop(self, waiter: _Waiter, outcome: str, detail: str) -> None:
+        self._set_queued(waiter.priority, -1)
+        waiter.future.set_exception(self._overloaded(detail, waiter.priority))
+        record_scheduler_decision(PRIORITY_NAMES[waiter.priority], outcome)
+
+    def _abandon(self, waiter: _Waiter, outcome: str) -> None:
+        """Waiter tự rời hàng đợi (bị hủy hoặc hết hạn trong lúc chờ)."""
+        future = waiter.future
+        if not future.done():
+            future.cancel()
+            self._set_queued(waiter.priority, -1)
+            record_scheduler_decision(PRIORITY_NAMES[waiter.priority], outcome)
+        elif not future.cancelled() and future.exception() is None:
+            # Slot được cấp đúng lúc caller bị hủy: trả lại cho waiter tiếp theo
+            self._release()
+
+    def _lowest_priority_waiter(self) -> Optional[_Waiter]:
+        live = [entry for entry in self._heap if not entry[3].future.done()]
+        return max(live, key=lambda entry: entry[:3])[3] if live else None
+
+    def _set_queued(self, priority: int, delta: int) -> None:
+        self._queued[priority] += delta
+        record_llm_queue_depth(PRIORITY_NAMES[priority], self._queued[priority])
+
+    def _observe_slot(self, seconds: float) -> None:
+        if self._slot_seconds is None:
+            self._slot_seconds = seconds
+        else:
+            self._slot_seconds += self.latency_alpha * (seconds - self._slot_seconds)
+
+    def _overloaded(self, detail: str, priority: int) -> LLMOverloadedError:
+        return LLMOverloadedError(detail, self.retry_after(priority))
+
+
+def create_llm_scheduler() -> LLMScheduler:
+    return LLMScheduler(
+        config.LLM_MAX_CONCURRENCY,
+        max_queue=config.LLM_QUEUE_MAX,
+        max_wait_seconds={
+            PRIORITY_INTERACTIVE: config.LLM_QUEUE_WAIT_INTERACTIVE_SECONDS,
+            PRIORITY_BATCH: config.LLM_QUEUE_WAIT_BATCH_SECONDS,
+            PRIORITY_BACKFILL: config.LLM_QUEUE_WAIT_BACKFILL_SECONDS,
+        },
+    )
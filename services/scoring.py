@@ -1,5 +1,6 @@
 from typing import Dict, Any
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +23,10 @@ BONUS_KEYS = {
     "community",
 }
 
+# Thứ tự cố định khi cộng dồn, để kết quả giống hệt đường vectorized (services/bulk_scoring.py)
+CORE_KEY_ORDER = ("format", "experience", "skills", "soft_skills", "education", "field_match")
+BONUS_KEY_ORDER = ("portfolio", "certificates", "awards", "scholarships", "side_projects", "community")
+
 NEUTRAL_BONUS_SCORE = 35
 
 BONUS_CAP: Dict[str, float] = {
@@ -91,6 +96,11 @@ def _normalize_level(level: str) -> str:
     return "junior"
 
 
+_FUTURE_DATE_ISSUE = re.compile(r"tương lai|future|chưa đến|sắp tới")
+_SEVERE_ISSUE = re.compile(r"nhiều|multiple")
+_INCONSISTENT_ISSUE = re.compile(r"không nhất quán|inconsistent|mâu thuẫn")
+
+
 def apply_credibility_penalty(credibility_issues: list) -> int:
     """
     Áp dụng penalty cho các vấn đề về độ tin cậy của CV.
@@ -107,9 +117,9 @@ def apply_credibility_penalty(credibility_issues: list) -> int:
     penalty = 0
     for issue in credibility_issues:
         issue_lower = str(issue).lower()
-        if any(keyword in issue_lower for keyword in ["tương lai", "future", "chưa đến", "sắp tới"]):
-            penalty -= 7 if any(severe in issue_lower for severe in ["nhiều", "multiple", "nhiều mốc"]) else 3
-        elif any(keyword in issue_lower for keyword in ["không nhất quán", "inconsistent", "mâu thuẫn"]):
+        if _FUTURE_DATE_ISSUE.search(issue_lower):
+            penalty -= 7 if _SEVERE_ISSUE.search(issue_lower) else 3
+        elif _INCONSISTENT_ISSUE.search(issue_lower):
             penalty -= 5
         else:
             penalty -= 2
@@ -135,7 +145,7 @@ def calculate_overall_score(
     total_core_weight = 0.0
     missing_core = []
     
-    for key in CORE_KEYS:
+    for key in CORE_KEY_ORDER:
         weight = core_weights.get(key, 0)
         if weight <= 0:
             continue
@@ -164,7 +174,7 @@ def calculate_overall_score(
     bonus_count = 0
     missing_bonus = []
     
-    for key in BONUS_KEYS:
+    for key in BONUS_KEY_ORDER:
         comp = bonus_scores.get(key)
         if comp and isinstance(comp, dict):
             try:
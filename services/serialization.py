@@ -0,0 +1,61 @@
+"""Serialize response model trực tiếp bằng pydantic-core.
+
+Trả về Response thay vì model object để FastAPI không validate lại theo response_model
+và không chạy jsonable_encoder + json.dumps: model đã được validate một lần khi tạo,
+model_dump_json serialize thẳng ra bytes.
+"""
+from typing import Any, Dict, Mapping, Optional
+
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+from models.schemas import BonusScores, CoreScores
+
+# Compact mode: bỏ `reason` của từng ScoreWithReason (phần lớn dung lượng response)
+_REASONS: Dict[str, Any] = {
+    "core_scores": {name: {"reason"} for name in CoreScores.model_fields},
+    "bonus_scores": {name: {"reason"} for name in BonusScores.model_fields},
+}
+COMPACT_ANALYSIS_EXCLUDE: Dict[str, Any] = {"data": _REASONS}
+COMPACT_JOB_EXCLUDE: Dict[str, Any] = {"result": COMPACT_ANALYSIS_EXCLUDE}
+COMPACT_RANK_EXCLUDE: Dict[str, Any] = {"results": {"__all__": {"analysis": _REASONS}}}
+
+
+def response_exclude(compact: bool) -> Optional[Dict[str, Any]]:
+    """`exclude` cho CVAnalysisResponse.model_dump_json."""
+    return COMPACT_ANALYSIS_EXCLUDE if compact else None
+
+
+def dump_response(model: BaseModel, compact: bool = False) -> str:
+    return model.model_dump_json(exclude=response_exclude(compact))
+
+
+class ModelResponse(Response):
+    """JSON response cho một Pydantic model đã validate."""
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: BaseModel,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        exclude: Optional[Dict[str, Any]] = None,
+        background: Optional[BackgroundTask] = None,
+    ):
+        self._exclude = exclude
+        super().__init__(content, status_code=status_code, headers=headers, background=background)
+
+    def render(self, content: BaseModel) -> bytes:
+        return content.model_dump_json(exclude=self._exclude).encode("utf-8")
+
+
+def compact_scores(scores: Dict[str, Any]) -> Dict[str, Any]:
+    """core_scores/bonus_scores (dạng dict) không kèm `reason`, cho event streaming ở compact mode."""
+    return {name: {"score": value.get("score")} for name, value in scores.items()}
+
+
+def sse_event(event: str, data: str) -> str:
+    """Một event Server-Sent Events; `data` là JSON một dòng (model_dump_json/json.dumps không xuống dòng)."""
+    return f"event: {event}\ndata: {data}\n\n"
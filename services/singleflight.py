@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config import config
+from services.metrics import record_singleflight
+
+logger = logging.getLogger(__name__)
+
+
+class LockBackend:
+    """Lock có TTL theo key, dùng để chỉ một worker xử lý một key tại một thời điểm."""
+
+    async def acquire(self, key: str, ttl_seconds: float) -> Optional[str]:
+        """Trả về token nếu lấy được lock, None nếu worker khác đang giữ."""
+        raise NotImplementedError
+
+    async def release(self, key: str, token: str) -> None:
+        """Chỉ nhả lock nếu vẫn do `token` giữ (lock có thể đã hết hạn và bị lấy lại)."""
+        raise NotImplementedError
+
+
+class MemoryLockBackend(LockBackend):
+    """Lock trong memory, chỉ có hiệu lực trong một process (thay cho Redis khi chạy local)."""
+
+    def __init__(self):
+        self._locks: Dict[str, Tuple[str, float]] = {}
+
+    async def acquire(self, key: str, ttl_seconds: float) -> Optional[str]:
+        now = time.monotonic()
+        current = self._locks.get(key)
+        if current is not None and current[1] > now:
+            return None
+        token = uuid.uuid4().hex
+        self._locks[key] = (token, now + ttl_seconds)
+        return token
+
+    async def release(self, key: str, token: str) -> None:
+        current = self._locks.get(key)
+        if current is not None and current[0] == token:
+            del self._locks[key]
+
+
+# So sánh token rồi xóa trong một thao tác nguyên tử
+_RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+  return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLockBackend(LockBackend):
+    """Lock trên Redis (SET NX PX), dùng chung giữa các worker/container."""
+
+    def __init__(self, client, prefix: str = "cv:singleflight:"):
+        self.client = client
+        self.prefix = prefix
+        self._release_script = client.register_script(_RELEASE_SCRIPT)
+
+    async def acquire(self, key: str, ttl_seconds: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        acquired = await self.client.set(self.prefix + key, token, nx=True, px=max(1, int(ttl_seconds * 1000)))
+        return token if acquired else None
+
+    async def release(self, key: str, token: str) -> None:
+        await self._release_script(keys=[self.prefix + key], args=[token])
+
+
+class _Flight:
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Gộp các lời gọi trùng key đang chạy đồng thời thành một.
+
+    Trong một process, caller đến sau chờ chung future của caller đầu tiên và nhận cùng kết quả
+    hoặc cùng exception. Giữa các worker, lock backend bảo đảm chỉ một worker chạy key đó; worker
+    khác chờ lock được nhả (tối đa `lock_ttl_seconds`) rồi mới chạy, khi đó kết quả thường đã có
+    trong cache dùng chung. Lời gọi chung chỉ bị hủy khi mọi caller đang chờ đều bị hủy.
+    """
+
+    def __init__(self, lock_backend: Optional[LockBackend] = None, lock_ttl_seconds: float = 120, poll_seconds: float = 0.2):
+        self.lock_backend = lock_backend
+        self.lock_ttl_seconds = lock_ttl_seconds
+        self.poll_seconds = poll_seconds
+        self._flights: Dict[str, _Flight] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Chạy `fn` (hoặc chờ lời gọi đang chạy cùng key). Trả về (kết quả, shared);
+        shared=True khi kết quả là của lời gọi do caller khác khởi chạy."""
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(self._run(key, fn)))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, flight=flight: self._forget(key, flight))
+        else:
+            record_singleflight("coalesced")
+
+        flight.waiters += 1
+        try:
+            # shield: một caller bị hủy (client ngắt kết nối) không làm hủy kết quả của caller khác
+            return await asyncio.shield(flight.task), shared
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Caller mới đến sau lúc này phải tạo lời gọi mới, không nhận CancelledError của lời gọi cũ
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Lấy exception để asyncio không log "exception was never retrieved" khi mọi caller đã hủy
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    async def _run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        token = await self._acquire(key)
+        try:
+            return await fn()
+        finally:
+            if token is not None:
+                try:
+                    await self.lock_backend.release(key, token)
+                except Exception as e:
+                    logger.warning(f"Single-flight lock release failed for {key}: {e}")
+
+    async def _acquire(self, key: str) -> Optional[str]:
+        if self.lock_backend is None:
+            record_singleflight("leader")
+            return None
+        deadline = time.monotonic() + self.lock_ttl_seconds
+        waited = False
+        while True:
+            try:
+                token = await self.lock_backend.acquire(key, self.lock_ttl_seconds)
+            except Exception as e:
+                # Backend lỗi (ví dụ Redis down): chạy luôn thay vì chặn request
+                logger.warning(f"Single-flight lock backend error, running without lock: {e}")
+                token = None
+                break
+            if token is not None or time.monotonic() >= deadline:
+                break
+            waited = True
+            await asyncio.sleep(self.poll_seconds)
+        record_singleflight("waited" if waited else "leader")
+        return token
+
+
+_single_flight_instance: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> Optional[SingleFlight]:
+    """Trả về None khi SINGLEFLIGHT_BACKEND=none."""
+    global _single_flight_instance
+    if _single_flight_instance is None and config.SINGLEFLIGHT_BACKEND != "none":
+        if config.SINGLEFLIGHT_BACKEND == "redis":
+            from services.redis_client import get_redis
+
+            lock_backend: LockBackend = RedisLockBackend(get_redis())
+        else:
+            lock_backend = MemoryLockBackend()
+        _single_flight_instance = SingleFlight(
+            lock_backend,
+            lock_ttl_seconds=config.SINGLEFLIGHT_LOCK_TTL_SECONDS,
+            poll_seconds=config.SINGLEFLIGHT_POLL_SECONDS,
+        )
+    return _single_flight_instance
@@ -0,0 +1,222 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import List, Tuple
+
+# Ký tự ngắt trang do extraction chèn giữa các trang PDF
+PAGE_BREAK = "\f"
+
+# Ước lượng thô số token từ số ký tự (không có tokenizer của Gemini ở local)
+CHARS_PER_TOKEN = 4
+
+# Tăng khi thay đổi thuật toán để invalidate cache kết quả phân tích
+COMPACTION_VERSION = "2"
+
+_WHITESPACE_RUN = re.compile(r"[ \t\u00a0\u2000-\u200b\u3000]+")
+_DIGITS = re.compile(r"\d+")
+_PAGE_NUMBER = re.compile(
+    r"^(?:page|trang|p\.)?\s*[-–—]?\s*\d{1,3}\s*(?:(?:/|of|trên)\s*\d{1,3})?\s*[-–—]?$",
+    re.IGNORECASE,
+)
+_CELL_SEPARATOR = " | "
+
+# Chỉ dedupe dòng lặp không liền kề ở đầu/cuối trang và đủ dài, tránh xóa các dòng ngắn hợp lệ (ví dụ "Python")
+_MIN_DEDUPE_LINE_LENGTH = 25
+# Số dòng đầu/cuối mỗi trang được xét là header/footer
+_EDGE_LINES = 2
+_MAX_HEADING_LENGTH = 40
+
+# (pattern, priority): section có priority thấp bị cắt trước khi vượt token budget
+_SECTION_HEADINGS: List[Tuple[re.Pattern, int]] = [
+    (re.compile(r"kinh nghiệm|experience|employment|work history|quá trình làm việc|công việc", re.IGNORECASE), 90),
+    (re.compile(r"kỹ năng|kĩ năng|skills?|technolog|công nghệ", re.IGNORECASE), 85),
+    (re.compile(r"dự án|projects?", re.IGNORECASE), 75),
+    (re.compile(r"học vấn|học tập|education|academic", re.IGNORECASE), 70),
+    (re.compile(r"mục tiêu|giới thiệu|tóm tắt|summary|objective|profile|about", re.IGNORECASE), 60),
+    (re.compile(r"chứng chỉ|certificat", re.IGNORECASE), 50),
+    (re.compile(r"giải thưởng|thành tích|awards?|achievements?|học bổng|scholarships?", re.IGNORECASE), 45),
+    (re.compile(r"hoạt động|activit|volunteer|tình nguyện|ngoại ngữ|languages?", re.IGNORECASE), 40),
+    (re.compile(r"sở thích|hobbies|interests", re.IGNORECASE), 10),
+    (re.compile(r"người tham chiếu|tham khảo|references?", re.IGNORECASE), 5),
+]
+_UNKNOWN_SECTION_PRIORITY = 30
+_HEADER_SECTION_PRIORITY = 100
+
+TRUNCATION_MARKER = "[...]"
+
+
+@dataclass
+class CompactionStats:
+    original_chars: int
+    compacted_chars: int
+    truncated: bool = False
+
+    @property
+    def original_tokens(self) -> int:
+        return estimate_tokens_from_chars(self.original_chars)
+
+    @property
+    def compacted_tokens(self) -> int:
+        return estimate_tokens_from_chars(self.compacted_chars)
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.original_tokens - self.compacted_tokens)
+
+
+def estimate_tokens_from_chars(chars: int) -> int:
+    return (chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _clean_line(line: str) -> str:
+    return _WHITESPACE_RUN.sub(" ", line).strip()
+
+
+def _edge_key(line: str) -> str:
+    # "Trang 1/3" và "Trang 2/3" cùng một key
+    return _DIGITS.sub("#", line.lower())
+
+
+def _strip_headers_footers(pages: List[List[str]]) -> List[List[str]]:
+    """Xóa số trang và các dòng lặp lại ở đầu/cuối phần lớn các trang.
+
+    Text chỉ có một trang (DOCX, PDF một trang) được giữ nguyên: dòng chỉ có số ở đó
+    thường là nội dung (năm, số năm kinh nghiệm), không phải số trang."""
+    if len(pages) < 2:
+        return pages
+    header_counts = {}
+    footer_counts = {}
+    for lines in pages:
+        for key in {_edge_key(line) for line in lines[:_EDGE_LINES]}:
+            header_counts[key] = header_counts.get(key, 0) + 1
+        for key in {_edge_key(line) for line in lines[-_EDGE_LINES:]}:
+            footer_counts[key] = footer_counts.get(key, 0) + 1
+    threshold = max(2, (len(pages) + 1) // 2)
+    headers = {key for key, count in header_counts.items() if count >= threshold}
+    footers = {key for key, count in footer_counts.items() if count >= threshold}
+
+    result = []
+    for lines in pages:
+        n = len(lines)
+        kept = []
+        for i, line in enumerate(lines):
+            is_header = i < _EDGE_LINES
+            is_footer = i >= n - _EDGE_LINES
+            if is_header or is_footer:
+                key = _edge_key(line)
+                if (
+                    _PAGE_NUMBER.match(line)
+                    or (is_header and key in headers)
+                    or (is_footer and key in footers)
+                ):
+                    continue
+            kept.append(line)
+        result.append(kept)
+    return result
+
+
+def _dedupe_cells(line: str) -> str:
+    # Ô merge trong bảng DOCX bị lặp lại một lần cho mỗi cột nó chiếm
+    cells = line.split(_CELL_SEPARATOR)
+    unique = []
+    for cell in cells:
+        if cell and cell not in unique:
+            unique.append(cell)
+    return _CELL_SEPARATOR.join(unique)
+
+
+def _dedupe_lines(pages: List[List[str]]) -> List[str]:
+    """Nối các trang, bỏ dòng trùng liền kề và ô bảng lặp lại.
+
+    Dòng trùng không liền kề chỉ bị bỏ khi nằm ở đầu/cuối trang và đã xuất hiện ở đầu/cuối
+    một trang trước (header/footer chưa đủ ngưỡng của _strip_headers_footers); trong thân CV
+    cùng một câu có thể lặp lại hợp lệ ở nhiều mục (ví dụ mô tả công việc ở hai dự án)."""
+    seen_edges = set()
+    result = []
+    previous = None
+    for lines in pages:
+        n = len(lines)
+        for i, line in enumerate(lines):
+            if _CELL_SEPARATOR in line:
+                line = _dedupe_cells(line)
+            key = line.lower()
+            if key == previous:
+                continue
+            if (i < _EDGE_LINES or i >= n - _EDGE_LINES) and len(line) >= _MIN_DEDUPE_LINE_LENGTH:
+                if key in seen_edges:
+                    continue
+                seen_edges.add(key)
+            result.append(line)
+            previous = key
+    return result
+
+
+def _heading_priority(line: str) -> int:
+    """Trả về priority nếu dòng là tiêu đề section, ngược lại 0."""
+    if len(line) > _MAX_HEADING_LENGTH or _CELL_SEPARATOR in line:
+        return 0
+    for pattern, priority in _SECTION_HEADINGS:
+        if pattern.search(line):
+            return priority
+    return 0
+
+
+def _split_sections(lines: List[str]) -> List[Tuple[int, List[str]]]:
+    sections: List[Tuple[int, List[str]]] = [(_HEADER_SECTION_PRIORITY, [])]
+    for line in lines:
+        priority = _heading_priority(line)
+        if priority:
+            sections.append((priority, [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(priority, section) for priority, section in sections if section]
+
+
+def _truncate_to_budget(lines: List[str], max_chars: int) -> Tuple[List[str], bool]:
+    """Cắt bớt theo section: section priority thấp (và nằm sau) bị cắt từ cuối lên trước."""
+    total = sum(len(line) + 1 for line in lines)
+    if total <= max_chars:
+        return lines, False
+
+    sections = _split_sections(lines)
+    order = sorted(range(len(sections)), key=lambda i: (sections[i][0], -i))
+    truncated = set()
+    for index in order:
+        if total <= max_chars:
+            break
+        _, section = sections[index]
+        while section and total > max_chars:
+            total -= len(section.pop()) + 1
+            truncated.add(index)
+
+    result = []
+    for index, (_, section) in enumerate(sections):
+        result.extend(section)
+        if index in truncated and section:
+            result.append(TRUNCATION_MARKER)
+    return result, True
+
+
+def compact_cv_text(cv_text: str, max_tokens: int = 0) -> Tuple[str, CompactionStats]:
+    """Rút gọn cv_text trước khi đưa vào prompt: chuẩn hóa whitespace, bỏ header/footer
+    và số trang lặp lại giữa các trang PDF, bỏ dòng/ô bảng trùng lặp, rồi cắt theo
+    section nếu vượt `max_tokens` (0 = không giới hạn)."""
+    text = unicodedata.normalize("NFC", cv_text)
+    pages = []
+    for page in text.split(PAGE_BREAK):
+        lines = [_clean_line(line) for line in page.splitlines()]
+        pages.append([line for line in lines if line])
+
+    pages = _strip_headers_footers(pages)
+    lines = _dedupe_lines(pages)
+
+    truncated = False
+    if max_tokens > 0:
+        lines, truncated = _truncate_to_budget(lines, max_tokens * CHARS_PER_TOKEN)
+
+    compacted = "\n".join(lines)
+    return compacted, CompactionStats(
+        original_chars=len(cv_text),
+        compacted_chars=len(compacted),
+        truncated=truncated,
+    )
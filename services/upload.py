@@ -0,0 +1,132 @@
+import asyncio
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse
+
+from config import config
+
+CHUNK_SIZE = 64 * 1024
+
+T = TypeVar("T")
+
+PDF_MAGIC = b"%PDF-"
+# DOCX (và ZIP) là file zip
+ZIP_MAGIC = b"PK\x03\x04"
+
+_MAGIC_BY_EXTENSION = {
+    ".pdf": PDF_MAGIC,
+    ".docx": ZIP_MAGIC,
+    ".zip": ZIP_MAGIC,
+}
+
+
+def file_too_large_error(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"File size exceeds maximum allowed size of {max_bytes // (1024 * 1024)}MB"
+    )
+
+
+def validate_file_signature(head: bytes, filename: str) -> None:
+    """Kiểm tra magic bytes khớp với phần mở rộng trước khi parse file."""
+    ext = "." + filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    magic = _MAGIC_BY_EXTENSION.get(ext)
+    if magic is None:
+        return
+    # Một số PDF có vài byte rác trước header, PDF spec cho phép header nằm trong 1024 byte đầu
+    found = head[:1024].find(magic) >= 0 if magic == PDF_MAGIC else head.startswith(magic)
+    if not found:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File content does not match its extension ({ext}). Please upload a valid {ext[1:].upper()} file."
+        )
+
+
+async def read_upload(file: UploadFile, max_bytes: Optional[int] = None) -> bytes:
+    """Đọc UploadFile theo từng chunk, dừng ngay khi vượt quá `max_bytes`.
+
+    Starlette đã spool file upload (memory → temp file trên đĩa), nên file quá lớn
+    bị từ chối mà không cần nạp toàn bộ vào memory.
+    """
+    if max_bytes is None:
+        max_bytes = config.MAX_UPLOAD_SIZE_BYTES
+    if file.size is not None and file.size > max_bytes:
+        raise file_too_large_error(max_bytes)
+
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if not chunks:
+            validate_file_signature(chunk, file.filename or "")
+        total += len(chunk)
+        if total > max_bytes:
+            raise file_too_large_error(max_bytes)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """Chờ `awaitable`, hủy nó nếu client ngắt kết nối (kiểm tra mỗi CLIENT_DISCONNECT_POLL_SECONDS).
+
+    Request đang chờ slot LLM được rút khỏi hàng đợi thay vì tốn một lời gọi LLM không ai nhận.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=config.CLIENT_DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        task.cancel()
+
+
+class RequestSizeLimitMiddleware:
+    """ASGI middleware từ chối request body quá lớn trước khi multipart parser đọc hết.
+
+    Dựa vào Content-Length nếu có, và đếm số byte thực nhận với chunked transfer.
+    """
+
+    # Dành cho multipart boundary, header và các form field nhỏ
+    OVERHEAD_BYTES = 1024 * 1024
+
+    def __init__(self, app, max_bytes: int, path_limits: Optional[dict] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.path_limits.get(scope["path"], self.max_bytes) + self.OVERHEAD_BYTES
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    break
+                if content_length > limit:
+                    response = JSONResponse(status_code=413, content={"detail": "Request body too large"})
+                    await response(scope, receive, send)
+                    return
+                break
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,79 @@
+import logging
+import time
+from typing import Dict
+
+from services.cache import get_result_cache
+from services.extraction import warm_up_extraction
+from services.extraction_pool import get_extraction_executor
+from services.info_extractor import extract_info
+from services.llm_service import get_llm_service
+from services.near_duplicate import get_near_duplicate_index
+from services.ranking import get_ranking_index
+from services.rate_limit import get_rate_limiter
+from services.text_compaction import compact_cv_text
+
+logger = logging.getLogger(__name__)
+
+_SAMPLE_CV_TEXT = (
+    "Nguyễn Văn A\n"
+    "Email: nguyenvana@example.com | Phone: 0912345678\n"
+    "Kinh nghiệm làm việc\n"
+    "Backend Developer - Công ty ABC (2021 - 2024)\n"
+    "Kỹ năng: Python, FastAPI, PostgreSQL\n"
+    "Học vấn: Đại học Bách Khoa Hà Nội\n"
+)
+
+
+async def prewarm_services() -> Dict[str, float]:
+    """Khởi tạo trước các singleton và pool trước khi app nhận traffic.
+
+    Không gọi network (Gemini); lỗi ở từng bước chỉ được log để app vẫn khởi động.
+    Trả về thời gian (ms) của từng bước.
+    """
+    timings: Dict[str, float] = {}
+
+    def _timed(name: str, start: float) -> None:
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    start = time.perf_counter()
+    try:
+        get_llm_service().backend_pool.warm_up()
+    except Exception as e:
+        logger.warning(f"Could not prewarm LLM service: {e}")
+    _timed("llm_service", start)
+
+    start = time.perf_counter()
+    try:
+        workers = await get_extraction_executor().warm_up(warm_up_extraction)
+        logger.info(f"Extraction executor warmed up ({workers} worker processes)")
+    except Exception as e:
+        logger.warning(f"Could not prewarm extraction executor: {e}")
+    _timed("extraction", start)
+
+    start = time.perf_counter()
+    # Chạy một lượt các hàm dùng regex để compile sẵn pattern
+    extract_info(_SAMPLE_CV_TEXT)
+    compact_cv_text(_SAMPLE_CV_TEXT, max_tokens=16)
+    get_result_cache()
+    get_rate_limiter()
+    _timed("text", start)
+
+    start = time.perf_counter()
+    try:
+        index = get_near_duplicate_index()
+        if index is not None:
+            logger.info(f"Near-duplicate index loaded ({len(index.index)} entries)")
+    except Exception as e:
+        logger.warning(f"Could not load near-duplicate index: {e}")
+    _timed("near_duplicate", start)
+
+    start = time.perf_counter()
+    try:
+        ranking_index = get_ranking_index()
+        if ranking_index is not None:
+            logger.info(f"Ranking index loaded ({len(ranking_index)} CVs)")
+    except Exception as e:
+        logger.warning(f"Could not load ranking index: {e}")
+    _timed("ranking", start)
+
+    return timings
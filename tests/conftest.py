@@ -0,0 +1,18 @@
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_client(redis_server):
+    # fakeredis[lua] chạy được script Lua (EVALSHA) như Redis thật
+    return fakeredis.FakeAsyncRedis(server=redis_server)
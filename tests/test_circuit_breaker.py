@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+import services.llm_backends as llm_backends
+from services.llm_backends import BackendPool, CircuitBreaker, LLMBackend, LLMBackendError, LLMResponse
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_backends.time, "monotonic", clock)
+    return clock
+
+
+def _open_breaker(clock) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.allow()
+    clock.now += 30
+    return breaker
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = _open_breaker(clock)
+    assert breaker.acquire() == (True, True)
+    assert not breaker.allow()
+    assert breaker.acquire() == (False, False)
+
+
+def test_probe_success_closes_circuit(clock):
+    breaker = _open_breaker(clock)
+    breaker.acquire()
+    breaker.record_success()
+    breaker.release_probe()
+    assert [breaker.acquire() for _ in range(3)] == [(True, False)] * 3
+
+
+def test_probe_failure_reopens_circuit(clock):
+    breaker = _open_breaker(clock)
+    breaker.acquire()
+    breaker.record_failure()
+    breaker.release_probe()
+    assert breaker.acquire() == (False, False)
+    clock.now += 30
+    assert breaker.acquire() == (True, True)
+
+
+def test_cancelled_probe_lets_next_request_probe(clock):
+    breaker = _open_breaker(clock)
+    breaker.acquire()
+    breaker.release_probe()
+    assert breaker.acquire() == (True, True)
+
+
+class SlowBackend(LLMBackend):
+    def __init__(self, name: str, delay: float = 0.05):
+        self.name = name
+        self.delay = delay
+        self.calls = 0
+
+    async def generate(self, prompt: str, response_schema=None) -> LLMResponse:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return LLMResponse(text=prompt, backend=self.name)
+
+
+@pytest.mark.anyio
+async def test_pool_sends_one_probe_to_half_open_backend():
+    primary, fallback = SlowBackend("primary"), SlowBackend("fallback")
+    pool = BackendPool([primary, fallback], max_retries=1, backoff_seconds=0, hedge_enabled=False, breaker_failures=1)
+    breaker = pool.breakers["primary"]
+    breaker.record_failure()
+    breaker.opened_at -= breaker.reset_seconds
+
+    responses = await asyncio.gather(*(pool.generate(str(i)) for i in range(10)))
+
+    assert primary.calls == 1
+    assert fallback.calls == 9
+    assert sorted(r.backend for r in responses).count("primary") == 1
+    assert breaker.allow() and breaker.opened_at is None
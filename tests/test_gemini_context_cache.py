@@ -0,0 +1,96 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors as genai_errors
+
+from config import config
+from services.llm_backends import GeminiBackend, LLMBackendError
+
+pytestmark = pytest.mark.anyio
+
+
+def _client_error(code: int, message: str) -> genai_errors.ClientError:
+    return genai_errors.ClientError(code, {"error": {"code": code, "message": message, "status": ""}})
+
+
+class FakeCaches:
+    def __init__(self):
+        self.created = 0
+        self.deleted = []
+        self.update_error = None
+
+    async def create(self, model, config):
+        self.created += 1
+        return SimpleNamespace(name=f"cachedContents/{self.created}", expire_time=None)
+
+    async def update(self, name, config):
+        if self.update_error is not None:
+            raise self.update_error
+        return SimpleNamespace(name=name, expire_time=None)
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+
+class FakeModels:
+    def __init__(self):
+        self.calls = []
+        self.errors = []
+
+    async def generate_content(self, model, contents, config):
+        self.calls.append(config.cached_content)
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(text="{}", usage_metadata=None)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    monkeypatch.setattr(config, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(config, "GEMINI_CONTEXT_CACHE_ENABLED", True)
+    backend = GeminiBackend("0:gemini:test", model="test")
+    caches, models = FakeCaches(), FakeModels()
+    fake_client = SimpleNamespace(aio=SimpleNamespace(caches=caches, models=models))
+    backend.client = fake_client
+    backend.rubric_cache.client = fake_client
+    return backend
+
+
+@pytest.mark.parametrize("code", [400, 429])
+async def test_unrelated_client_errors_are_not_retried_without_cache(backend, code):
+    models = backend.client.aio.models
+    models.errors = [_client_error(code, "Resource has been exhausted")]
+
+    with pytest.raises(LLMBackendError) as exc:
+        await backend.generate("prompt")
+
+    assert exc.value.retryable is (code == 429)
+    assert models.calls == ["cachedContents/1"]
+    # Cache vẫn dùng được cho request sau
+    await backend.generate("prompt")
+    assert models.calls[-1] == "cachedContents/1"
+    assert backend.client.aio.caches.created == 1
+
+
+@pytest.mark.parametrize("code, message", [(404, "Not found"), (403, "CachedContent not found (or permission denied)")])
+async def test_missing_cache_falls_back_to_system_instruction(backend, code, message):
+    models = backend.client.aio.models
+    models.errors = [_client_error(code, message)]
+
+    response = await backend.generate("prompt")
+
+    assert response.text == "{}"
+    assert models.calls == ["cachedContents/1", None]
+    assert backend.rubric_cache.name is None
+
+
+async def test_stale_cache_is_deleted_when_refresh_fails(backend):
+    cache = backend.rubric_cache
+    assert await cache.get_name() == "cachedContents/1"
+    # Cache còn hạn nhưng đã tới lúc gia hạn
+    cache.expires_at = time.time() + cache.refresh_margin_seconds - 1
+    backend.client.aio.caches.update_error = RuntimeError("update failed")
+
+    assert await cache.get_name() is None
+    assert backend.client.aio.caches.deleted == ["cachedContents/1"]
@@ -0,0 +1,154 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import services.jobs as jobs
+from config import config
+from services.jobs import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JobManager, SQLiteJobStore, validate_callback_url
+from services.scheduler import LLMOverloadedError
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def _reclaim(store: SQLiteJobStore, job_id: str, owner: str) -> None:
+    # Giả lập lease hết hạn và worker khác nhận lại job
+    store._execute("UPDATE jobs SET lease_until = ? WHERE id = ?", (time.time() - 1, job_id))
+    assert store.claim(job_id, owner, 60)
+
+
+def test_stale_owner_cannot_overwrite_result(store):
+    store.create("j1", "a.pdf", b"x", None)
+    assert store.claim("j1", "w1", 60)
+    _reclaim(store, "j1", "w2")
+
+    assert not store.mark_failed("j1", "w1", 500, "stale")
+    assert store.mark_succeeded("j1", "w2", '{"status": "success"}')
+    assert not store.mark_succeeded("j1", "w1", '{"status": "stale"}')
+    record = store.get("j1")
+    assert record["status"] == JOB_SUCCEEDED
+    assert record["result"] == '{"status": "success"}'
+
+
+def test_finished_job_cannot_be_marked_again(store):
+    store.create("j1", "a.pdf", b"x", None)
+    assert store.claim("j1", "w1", 60)
+    assert store.mark_failed("j1", "w1", 400, "bad file")
+    assert not store.mark_succeeded("j1", "w1", "{}")
+    assert store.get("j1")["status"] == JOB_FAILED
+
+
+@pytest.mark.anyio
+async def test_lost_lease_cancels_running_job(store, monkeypatch):
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def analyze_cv_file(*args, **kwargs):
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    monkeypatch.setattr(jobs, "analyze_cv_file", analyze_cv_file)
+    manager = JobManager(store, workers=1, lease_seconds=0.3)
+    await manager.start()
+    try:
+        job_id = manager.submit(b"x", "a.pdf", callback_url="http://example.invalid/hook")
+        await asyncio.wait_for(started.wait(), 5)
+        _reclaim(store, job_id, "other-worker")
+
+        await asyncio.wait_for(cancelled.wait(), 5)
+        await asyncio.sleep(0.05)
+        record = store._execute("SELECT status, lease_owner FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        assert tuple(record) == (JOB_RUNNING, "other-worker")
+        assert not manager._callbacks
+    finally:
+        await manager.stop()
+
+
+@pytest.mark.anyio
+async def test_overloaded_job_is_returned_to_queue(store, monkeypatch):
+    calls = 0
+
+    async def analyze_cv_file(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        raise LLMOverloadedError("LLM queue is full", 1)
+
+    monkeypatch.setattr(jobs, "analyze_cv_file", analyze_cv_file)
+    monkeypatch.setattr(config, "JOB_OVERLOAD_RETRIES", 1)
+    manager = JobManager(store, workers=1, lease_seconds=60)
+    await manager.start()
+    try:
+        job_id = manager.submit(b"x", "a.pdf")
+        for _ in range(50):
+            await asyncio.sleep(0.1)
+            if calls == 2 and store.get(job_id)["status"] == JOB_QUEUED:
+                break
+        assert calls == 2
+        assert store.get(job_id)["status"] == JOB_QUEUED
+    finally:
+        await manager.stop()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8000/hook",
+    "http://localhost/hook",
+    "http://10.0.0.5/hook",
+    "http://192.168.1.1/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/hook",
+    "http://[::ffff:127.0.0.1]/hook",
+    "http://0.0.0.0/hook",
+    "ftp://8.8.8.8/hook",
+    "http:///hook",
+    "http://8.8.8.8:99999/hook",
+])
+async def test_callback_url_to_internal_address_is_rejected(url):
+    with pytest.raises(HTTPException) as exc:
+        await validate_callback_url(url)
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_callback_url_to_public_address_is_accepted():
+    await validate_callback_url("https://8.8.8.8/hook")
+
+
+@pytest.mark.anyio
+async def test_callback_allow_list(monkeypatch):
+    monkeypatch.setattr(config, "JOB_CALLBACK_ALLOWED_HOSTS", {".example.com", "10.0.0.5"})
+    await validate_callback_url("https://hooks.example.com/cv")
+    # Host nội bộ được cho phép tường minh
+    await validate_callback_url("http://10.0.0.5/hook")
+    with pytest.raises(HTTPException):
+        await validate_callback_url("https://8.8.8.8/hook")
+    with pytest.raises(HTTPException):
+        await validate_callback_url("https://evilexample.com/hook")
+
+
+@pytest.mark.anyio
+async def test_callback_does_not_sleep_after_last_attempt(store, monkeypatch):
+    posts = []
+
+    def handler(request):
+        posts.append(request)
+        return httpx.Response(500)
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(jobs.httpx, "AsyncClient", lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs))
+    monkeypatch.setattr(config, "JOB_CALLBACK_RETRIES", 1)
+
+    start = time.monotonic()
+    await JobManager(store)._send_callback("j1", "https://8.8.8.8/hook", "{}")
+
+    assert len(posts) == 1
+    assert time.monotonic() - start < 1
@@ -0,0 +1,124 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import services.pipeline as pipeline
+from services.llm_backends import _fake_analysis
+from services.near_duplicate import NearDuplicateIndex
+
+FINGERPRINT = 0x0123456789ABCDEF
+RESULT = {"overall_score": 70, "info": {"name": "Nguyễn Văn A", "email": "a@example.com", "location": "Hà Nội"}}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "near.sqlite3")
+
+
+def test_matches_are_scoped_to_client(path):
+    index = NearDuplicateIndex(path)
+    index.add(FINGERPRINT, "v1", "client-a", "a.pdf", RESULT)
+
+    assert index.find(FINGERPRINT ^ 0b101, "v1", "client-a").filename == "a.pdf"
+    assert index.find(FINGERPRINT, "v1", "client-b") is None
+    assert index.find(FINGERPRINT, "v2", "client-a") is None
+
+
+def test_contact_info_is_not_stored(path):
+    index = NearDuplicateIndex(path)
+    index.add(FINGERPRINT, "v1", "client-a", "a.pdf", RESULT)
+
+    assert index.find(FINGERPRINT, "v1", "client-a").result == {"overall_score": 70}
+    stored = sqlite3.connect(path).execute("SELECT result FROM near_duplicates").fetchone()[0]
+    assert "a@example.com" not in stored and "Hà Nội" not in stored
+
+
+def test_expired_entries_are_not_matched_and_pruned(path):
+    index = NearDuplicateIndex(path, ttl_seconds=3600)
+    entry_id = index.add(FINGERPRINT, "v1", "client-a", "a.pdf", RESULT)
+    old = (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()
+    index._conn.execute("UPDATE near_duplicates SET created_at = ? WHERE id = ?", (old, entry_id))
+
+    assert index.find(FINGERPRINT, "v1", "client-a") is None
+    assert index.prune() == 1
+    assert len(index.index) == 0
+
+
+def test_oldest_entries_beyond_max_are_pruned(path):
+    index = NearDuplicateIndex(path, max_entries=2)
+    # Mỗi fingerprint khác nhau 16 bit, không khớp lẫn nhau
+    fingerprints = [FINGERPRINT ^ (0xFFFF << (16 * i)) for i in range(4)]
+    for i, fingerprint in enumerate(fingerprints):
+        index.add(fingerprint, "v1", "client-a", f"{i}.pdf", RESULT)
+
+    assert index.prune() == 2
+    assert len(index.index) == 2
+    assert index.find(fingerprints[0], "v1", "client-a") is None
+    assert index.find(fingerprints[3], "v1", "client-a").filename == "3.pdf"
+    # Nạp lại sau restart cũng chỉ còn 2 entry
+    assert len(NearDuplicateIndex(path, max_entries=2).index) == 2
+
+
+def test_legacy_table_without_client_is_dropped(path):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE near_duplicates (id INTEGER PRIMARY KEY AUTOINCREMENT, fingerprint INTEGER NOT NULL, "
+        "version TEXT NOT NULL, filename TEXT NOT NULL, result TEXT NOT NULL, total_tokens INTEGER NOT NULL, "
+        "created_at TEXT NOT NULL)"
+    )
+    conn.execute("INSERT INTO near_duplicates VALUES (1, 5, '1:v1', 'old.pdf', '{}', 0, '2024-01-01')")
+    conn.commit()
+    conn.close()
+
+    index = NearDuplicateIndex(path)
+    assert len(index.index) == 0
+    assert index.find(5, "v1", "client-a") is None
+
+
+class StubLLMService:
+    analysis_version = "test"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def analyze_cv(self, cv_text: str):
+        self.calls += 1
+        return {**_fake_analysis(cv_text), "info": {"location": "Hà Nội"}}
+
+
+@pytest.fixture
+def llm(monkeypatch, path):
+    async def load_cv_text(file_content, filename, cache_status=None):
+        return file_content.decode("utf-8"), None
+
+    llm = StubLLMService()
+    index = NearDuplicateIndex(path)
+    monkeypatch.setattr(pipeline, "load_cv_text", load_cv_text)
+    monkeypatch.setattr(pipeline, "get_llm_service", lambda: llm)
+    monkeypatch.setattr(pipeline, "get_single_flight", lambda: None)
+    monkeypatch.setattr(pipeline, "get_result_cache", lambda: None)
+    monkeypatch.setattr(pipeline, "get_near_duplicate_index", lambda: index)
+    return llm
+
+
+CV_BODY = "\n".join(f"Dự án {i}: xây dựng hệ thống quản lý đơn hàng bằng Python và FastAPI" for i in range(20))
+
+
+@pytest.mark.anyio
+async def test_pipeline_reuses_result_only_for_same_client_with_new_contact_info(llm):
+    first = await pipeline.analyze_cv_file(f"Nguyễn Văn A\na@example.com\n{CV_BODY}".encode(), "a.pdf", client_id="client-a")
+    assert first.data.info.location == "Hà Nội"
+
+    edited = f"Nguyễn Văn A\nnew@example.com\n{CV_BODY}".encode()
+    reused = await pipeline.analyze_cv_file(edited, "a2.pdf", client_id="client-a")
+    assert llm.calls == 1
+    assert reused.metadata.near_duplicate.filename == "a.pdf"
+    assert reused.data.info.email == "new@example.com"
+    assert reused.data.info.location == ""
+
+    await pipeline.analyze_cv_file(edited, "b.pdf", client_id="client-b")
+    assert llm.calls == 2
+    # Không có client thì không tra cứu near-duplicate
+    await pipeline.analyze_cv_file(edited, "c.pdf")
+    assert llm.calls == 3
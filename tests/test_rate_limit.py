@@ -0,0 +1,148 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import services.rate_limit as rate_limit
+from services.rate_limit import MemoryBucketBackend, RateLimiter, RedisBucketBackend, _refill_and_take
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, redis_client):
+    if request.param == "memory":
+        return MemoryBucketBackend()
+    return RedisBucketBackend(redis_client)
+
+
+def test_refill_is_capped_at_capacity():
+    assert _refill_and_take(2.0, 100.0, 5.0, 1.0, 1.0, False) == (True, 4.0)
+
+
+def test_refill_adds_elapsed_times_rate():
+    assert _refill_and_take(0.0, 3.0, 10.0, 0.5, 1.0, False) == (True, 0.5)
+
+
+def test_refill_ignores_clock_going_backwards():
+    assert _refill_and_take(0.5, -10.0, 10.0, 1.0, 1.0, False) == (False, 0.5)
+
+
+def test_zero_cost_only_checks_bucket_is_positive():
+    assert _refill_and_take(0.5, 0.0, 10.0, 1.0, 0.0, False) == (True, 0.5)
+    assert _refill_and_take(-3.0, 0.0, 10.0, 1.0, 0.0, False) == (False, -3.0)
+
+
+def test_debt_is_always_taken():
+    assert _refill_and_take(1.0, 0.0, 10.0, 1.0, 5.0, True) == (True, -4.0)
+
+
+async def test_bucket_allows_capacity_then_denies(backend):
+    # Rate rất nhỏ để refill trong lúc test không đáng kể với cả TIME của Redis
+    results = [await backend.consume("k", 3, 0.0001, 1) for _ in range(4)]
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert results[2][1] == pytest.approx(0.0, abs=0.01)
+
+
+async def test_buckets_are_independent_per_key(backend):
+    for _ in range(2):
+        await backend.consume("a", 2, 0.0001, 1)
+    assert (await backend.consume("a", 2, 0.0001, 1))[0] is False
+    assert (await backend.consume("b", 2, 0.0001, 1))[0] is True
+
+
+async def test_debt_blocks_until_repaid(backend):
+    assert (await backend.consume("tok", 100, 0.0001, 250, allow_debt=True)) == (True, pytest.approx(-150, abs=0.1))
+    allowed, tokens = await backend.consume("tok", 100, 0.0001, 0)
+    assert allowed is False
+    assert tokens == pytest.approx(-150, abs=0.1)
+
+
+async def test_memory_bucket_refills_over_time(clock):
+    backend = MemoryBucketBackend()
+    for _ in range(2):
+        await backend.consume("k", 2, 0.5, 1)
+    assert (await backend.consume("k", 2, 0.5, 1))[0] is False
+    clock.now += 1.0
+    assert await backend.consume("k", 2, 0.5, 1) == (False, 0.5)
+    clock.now += 1.0
+    assert await backend.consume("k", 2, 0.5, 1) == (True, 0.0)
+    clock.now += 60.0
+    assert await backend.consume("k", 2, 0.5, 0) == (True, 2.0)
+
+
+async def test_redis_script_refills_from_stored_timestamp(redis_client):
+    backend = RedisBucketBackend(redis_client, prefix="t:")
+    assert (await backend.consume("k", 10, 0.5, 10)) == (True, pytest.approx(0.0, abs=0.01))
+    # Lùi ts 4 giây: script phải nạp 4 * 0.5 = 2 token theo TIME của server
+    await redis_client.hset("t:k", "ts", str(time.time() - 4))
+    allowed, tokens = await backend.consume("k", 10, 0.5, 1)
+    assert allowed is True
+    assert tokens == pytest.approx(1.0, abs=0.05)
+    # Refill không vượt capacity
+    await redis_client.hset("t:k", "ts", str(time.time() - 3600))
+    assert (await backend.consume("k", 10, 0.5, 0)) == (True, pytest.approx(10.0, abs=0.01))
+
+
+async def test_redis_script_sets_expiry_for_refill_time(redis_client):
+    backend = RedisBucketBackend(redis_client, prefix="t:")
+    await backend.consume("k", 10, 1.0, 10)
+    ttl = await redis_client.ttl("t:k")
+    assert 60 < ttl <= 70
+
+
+def _limiter(backend, **kwargs) -> RateLimiter:
+    return RateLimiter(backend, ip_per_minute=kwargs.pop("ip_per_minute", 2), api_key_per_minute=10, **kwargs)
+
+
+async def test_check_raises_429_with_retry_after(clock):
+    limiter = _limiter(MemoryBucketBackend())
+    await limiter.check("ip:1.2.3.4")
+    await limiter.check("ip:1.2.3.4")
+    with pytest.raises(HTTPException) as exc:
+        await limiter.check("ip:1.2.3.4")
+    assert exc.value.status_code == 429
+    # Thiếu 1 token, nạp 2 token/phút -> 30 giây
+    assert exc.value.headers["Retry-After"] == "30"
+    await limiter.check("ip:5.6.7.8")
+
+
+async def test_token_quota_blocks_after_charge(clock):
+    limiter = _limiter(MemoryBucketBackend(), ip_per_minute=0, ip_token_quota_per_hour=3600)
+    await limiter.check("ip:1")
+    await limiter.charge_tokens("ip:1", 3700)
+    with pytest.raises(HTTPException) as exc:
+        await limiter.check("ip:1")
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "101"
+    clock.now += 101
+    await limiter.check("ip:1")
+
+
+async def test_redis_outage_falls_back_to_allowing(redis_server, redis_client):
+    limiter = _limiter(RedisBucketBackend(redis_client), ip_per_minute=1)
+    await limiter.check("ip:1")
+    with pytest.raises(HTTPException):
+        await limiter.check("ip:1")
+    redis_server.connected = False
+    # Redis down: không chặn request, charge_tokens cũng không raise
+    await limiter.check("ip:1")
+    await limiter.charge_tokens("ip:1", 10)
+    redis_server.connected = True
+    with pytest.raises(HTTPException):
+        await limiter.check("ip:1")
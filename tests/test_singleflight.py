@@ -0,0 +1,173 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import services.pipeline as pipeline
+from services.llm_backends import _fake_analysis
+from services.singleflight import MemoryLockBackend, RedisLockBackend, SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+N_CALLERS = 10
+
+
+class StubLLMService:
+    """Đếm số lần gọi LLM; giữ lời gọi đủ lâu để các caller đồng thời chồng lên nhau."""
+
+    analysis_version = "test"
+
+    def __init__(self, delay: float = 0.05, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def analyze_cv(self, cv_text: str):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return _fake_analysis(cv_text)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def lock_backend(request, redis_client):
+    if request.param == "memory":
+        return MemoryLockBackend()
+    return RedisLockBackend(redis_client, prefix="t:sf:")
+
+
+@pytest.fixture
+def single_flight(lock_backend):
+    return SingleFlight(lock_backend, lock_ttl_seconds=5, poll_seconds=0.01)
+
+
+@pytest.fixture
+def llm(monkeypatch, single_flight):
+    async def load_cv_text(file_content, filename, cache_status=None):
+        return file_content.decode("utf-8"), None
+
+    llm = StubLLMService()
+    monkeypatch.setattr(pipeline, "load_cv_text", load_cv_text)
+    monkeypatch.setattr(pipeline, "get_llm_service", lambda: llm)
+    monkeypatch.setattr(pipeline, "get_single_flight", lambda: single_flight)
+    monkeypatch.setattr(pipeline, "get_result_cache", lambda: None)
+    monkeypatch.setattr(pipeline, "get_near_duplicate_index", lambda: None)
+    return llm
+
+
+def _cv(name: str) -> bytes:
+    return f"CV của {name}: Python developer, 3 năm kinh nghiệm FastAPI và PostgreSQL.".encode("utf-8")
+
+
+def _return(value):
+    async def fn():
+        return value
+
+    return fn
+
+
+async def _analyze_concurrently(content: bytes, count: int = N_CALLERS):
+    return await asyncio.gather(
+        *(pipeline.analyze_cv_file(content, f"cv{i}.pdf") for i in range(count)),
+        return_exceptions=True,
+    )
+
+
+async def test_identical_analyses_call_llm_once(llm, single_flight):
+    responses = await _analyze_concurrently(_cv("A"))
+
+    assert llm.calls == 1
+    assert all(not isinstance(r, BaseException) for r in responses)
+    assert len({r.data.model_dump_json() for r in responses}) == 1
+    statuses = sorted(r.metadata.cache.analysis for r in responses)
+    assert statuses.count("coalesced") == N_CALLERS - 1
+    # Metadata theo từng request, không copy của leader
+    assert [r.metadata.filename for r in responses] == [f"cv{i}.pdf" for i in range(N_CALLERS)]
+    assert single_flight.in_flight == 0
+
+
+async def test_different_files_are_not_coalesced(llm):
+    await asyncio.gather(pipeline.analyze_cv_file(_cv("A"), "a.pdf"), pipeline.analyze_cv_file(_cv("B"), "b.pdf"))
+    assert llm.calls == 2
+
+
+async def test_leader_failure_propagates_to_all_callers(llm, single_flight):
+    llm.error = HTTPException(status_code=502, detail="LLM backend failed")
+    errors = await _analyze_concurrently(_cv("A"))
+
+    assert llm.calls == 1
+    assert all(e is llm.error for e in errors)
+    assert single_flight.in_flight == 0
+
+    # Lỗi không được giữ lại: lần gọi sau chạy lại LLM
+    llm.error = None
+    await pipeline.analyze_cv_file(_cv("A"), "a.pdf")
+    assert llm.calls == 2
+
+
+async def test_cancelled_caller_does_not_cancel_the_shared_call(llm):
+    content = _cv("A")
+    leader = asyncio.ensure_future(pipeline.analyze_cv_file(content, "a.pdf"))
+    follower = asyncio.ensure_future(pipeline.analyze_cv_file(content, "b.pdf"))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    response = await follower
+    assert response.status == "success"
+    assert leader.cancelled()
+    assert llm.calls == 1
+
+
+async def test_workers_sharing_a_lock_run_one_at_a_time(lock_backend):
+    # Hai SingleFlight dùng chung lock backend, như hai worker dùng chung Redis
+    workers = [SingleFlight(lock_backend, lock_ttl_seconds=5, poll_seconds=0.01) for _ in range(2)]
+    events = []
+
+    async def work(name: str):
+        events.append(f"{name} start")
+        await asyncio.sleep(0.05)
+        events.append(f"{name} end")
+        return name
+
+    results = await asyncio.gather(workers[0].do("k", lambda: work("w0")), workers[1].do("k", lambda: work("w1")))
+
+    assert results == [("w0", False), ("w1", False)]
+    assert events == ["w0 start", "w0 end", "w1 start", "w1 end"]
+
+
+async def test_lock_of_crashed_worker_expires(lock_backend):
+    # Worker giữ lock rồi chết, không nhả: lock tự hết hạn sau TTL
+    assert await lock_backend.acquire("k", 0.2) is not None
+    assert await lock_backend.acquire("k", 0.2) is None
+
+    start = time.monotonic()
+    result, _ = await SingleFlight(lock_backend, lock_ttl_seconds=5, poll_seconds=0.01).do("k", _return("ok"))
+
+    assert result == "ok"
+    assert 0.15 <= time.monotonic() - start < 2
+
+
+async def test_waiter_gives_up_on_lock_after_ttl(lock_backend):
+    # Lock còn hạn lâu hơn lock_ttl_seconds của waiter: waiter chạy không lock thay vì chờ mãi
+    assert await lock_backend.acquire("k", 60) is not None
+
+    start = time.monotonic()
+    result, _ = await SingleFlight(lock_backend, lock_ttl_seconds=0.2, poll_seconds=0.01).do("k", _return("ok"))
+
+    assert result == "ok"
+    assert 0.15 <= time.monotonic() - start < 2
+
+
+async def test_expired_token_cannot_release_new_holder(lock_backend):
+    stale = await lock_backend.acquire("k", 0.1)
+    await asyncio.sleep(0.2)
+    current = await lock_backend.acquire("k", 60)
+    assert current is not None
+
+    await lock_backend.release("k", stale)
+    assert await lock_backend.acquire("k", 60) is None
+
+    await lock_backend.release("k", current)
+    assert await lock_backend.acquire("k", 60) is not None
@@ -0,0 +1,54 @@
+from services.text_compaction import PAGE_BREAK, TRUNCATION_MARKER, compact_cv_text
+
+
+def _compact(*pages: str, max_tokens: int = 0) -> list:
+    text, _ = compact_cv_text(PAGE_BREAK.join(pages), max_tokens)
+    return text.splitlines()
+
+
+def test_single_page_keeps_number_only_lines():
+    # Một trang: "2" và "2019" ở đầu/cuối là nội dung, không phải số trang
+    assert _compact("2\nnăm kinh nghiệm Python\nTốt nghiệp\n2019") == ["2", "năm kinh nghiệm Python", "Tốt nghiệp", "2019"]
+
+
+def test_single_page_keeps_page_like_footer():
+    assert _compact("Nguyễn Văn A\nKỹ năng: Python\nPage 1") == ["Nguyễn Văn A", "Kỹ năng: Python", "Page 1"]
+
+
+def test_multi_page_strips_page_numbers():
+    pages = ["Nguyễn Văn A\nKinh nghiệm\nCông ty X\n1", "Dự án\nHệ thống Y\nTrang 2/2"]
+    assert _compact(*pages) == ["Nguyễn Văn A", "Kinh nghiệm", "Công ty X", "Dự án", "Hệ thống Y"]
+
+
+def test_multi_page_strips_repeated_header():
+    header = "Nguyễn Văn A - Backend Developer"
+    pages = [f"{header}\nKinh nghiệm\nCông ty X", f"{header}\nDự án\nHệ thống Y", f"{header}\nHọc vấn\nĐại học Z"]
+    assert _compact(*pages) == ["Kinh nghiệm", "Công ty X", "Dự án", "Hệ thống Y", "Học vấn", "Đại học Z"]
+
+
+def test_repeated_body_line_is_kept():
+    repeated = "Phát triển REST API bằng FastAPI và PostgreSQL"
+    page = f"Kinh nghiệm\nCông ty X\n{repeated}\nBackend\nCông ty Y\n{repeated}\nFrontend\nKỹ năng\nPython"
+    assert _compact(page).count(repeated) == 2
+
+
+def test_repeated_body_line_across_pages_is_kept():
+    repeated = "Phát triển REST API bằng FastAPI và PostgreSQL"
+    pages = [f"Kinh nghiệm\nCông ty X\n{repeated}\nBackend\nHết trang", f"Dự án\nHệ thống Y\n{repeated}\nFrontend\nKỹ năng"]
+    assert _compact(*pages).count(repeated) == 2
+
+
+def test_repeated_edge_line_below_header_threshold_is_deduped():
+    # Dòng lặp ở đầu 2/5 trang không đủ ngưỡng header nhưng vẫn là header bị lặp
+    header = "Nguyễn Văn A - Backend Developer"
+    pages = [f"{header}\nA1\nA2\nA3\nA4", "B1\nB2\nB3\nB4", f"{header}\nC1\nC2\nC3\nC4", "D1\nD2\nD3\nD4", "E1\nE2\nE3\nE4"]
+    assert _compact(*pages).count(header) == 1
+
+
+def test_adjacent_duplicates_and_table_cells_are_deduped():
+    assert _compact("Python\nPython\nKỹ năng | Kỹ năng | Python") == ["Python", "Kỹ năng | Python"]
+
+
+def test_truncates_low_priority_sections_first():
+    lines = _compact("Kinh nghiệm\n" + "x" * 200 + "\nSở thích\n" + "y" * 200, max_tokens=60)
+    assert lines == ["Kinh nghiệm", "x" * 200, "Sở thích", TRUNCATION_MARKER]